@@ -1,180 +1,177 @@
 import os
-import os
-from flask import Flask, render_template, session, redirect, url_for, request, jsonify
+import atexit
+from flask import Flask, render_template, session, redirect, url_for
 from flask_cors import CORS
 from dotenv import load_dotenv
-from database import Database
-from routes import auth_bp, profile_bp, avatar_bp, chat_bp, mood_bp, demo_bp
 
-# 加载环境变量
+# 加载环境变量（必须在导入项目模块之前：utils.dates 等模块在导入时读取 APP_TIMEZONE 等配置）
 load_dotenv()
 
-# 创建 Flask 应用
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB 最大上传大小
-
-# Session 配置（支持移动端和跨设备访问）
-app.config['SESSION_COOKIE_NAME'] = 'mindmate_session'  # 自定义 Cookie 名称
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # 改为 Lax 更安全
-app.config['SESSION_COOKIE_SECURE'] = False  # HTTP 环境
-app.config['SESSION_COOKIE_HTTPONLY'] = True  # 防止 XSS 攻击
-app.config['SESSION_COOKIE_DOMAIN'] = None  # 不限制域名
-app.config['SESSION_COOKIE_PATH'] = '/'  # 所有路径
-app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24小时
-app.config['SESSION_REFRESH_EACH_REQUEST'] = True  # 每次请求刷新
-app.config['SESSION_TYPE'] = 'filesystem'  # 使用文件系统存储 session
-
-# 启用 CORS（完全开放配置）
-CORS(app, 
-     supports_credentials=True,
-     resources={r"/*": {"origins": "*"}},
-     allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     expose_headers=["Set-Cookie"])
-
-# 初始化数据库
-db = Database(os.getenv('DATABASE_PATH', 'mindmate.db'))
-
-# 运行数据库迁移（确保表结构是最新的）
-try:
-    from migrate_avatars_table import migrate_avatars_table
-    migrate_avatars_table(os.getenv('DATABASE_PATH', 'mindmate.db'))
-except Exception as e:
-    print(f"数据库迁移警告: {e}")
-
-# 注册蓝图（API 路由）
-app.register_blueprint(auth_bp)
-app.register_blueprint(profile_bp)
-app.register_blueprint(avatar_bp)
-app.register_blueprint(chat_bp)
-app.register_blueprint(mood_bp)
-app.register_blueprint(demo_bp)
-
-# Token 认证中间件
-@app.before_request
-def check_token_auth():
-    """在每个请求前检查 token 认证"""
-    from routes.auth import get_token_from_request, verify_token
+from extensions import services, db, session_store
+from utils.auth import register_auth, public, login_required, current_user_id
+from utils.serialization import JSONProvider
+from utils.compression import register_compression, render_page
+from utils.assets import register_assets
+
+def create_app():
+    """应用工厂：创建并配置 Flask 应用"""
+    app = Flask(__name__)
+    app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
+    # 签名 token 用 SECRET_KEY 计算 HMAC：未配置时的默认值是公开的，任何人都能伪造 token，所以启动时直接报错
+    if os.getenv('TOKEN_BACKEND', 'sqlite') == 'signed' and not os.getenv('SECRET_KEY'):
+        raise RuntimeError("TOKEN_BACKEND=signed 需要在环境变量或 .env 中配置 SECRET_KEY")
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB 最大上传大小
     
-    # 跳过公开路由（不包括需要认证的页面）
-    public_routes = ['/login', '/register', '/api/auth/login', '/api/auth/register', '/api/demo', '/static', '/test-login', '/test', '/demo', '/']
-    if any(request.path.startswith(route) for route in public_routes):
-        # 但 / 需要特殊处理，不能直接跳过
-        if request.path == '/':
-            pass  # 让 index() 函数自己处理重定向
-        else:
-            return
+    # JSON 序列化（安装了 orjson 时使用 orjson）
+    app.json = JSONProvider(app)
+    app.config['DATABASE_PATH'] = os.getenv('DATABASE_PATH', 'mindmate.db')
     
-    # 先检查 session（优先级更高）
-    if 'user_id' in session:
-        return
+    # Session 配置（支持移动端和跨设备访问）
+    app.config['SESSION_COOKIE_NAME'] = 'mindmate_session'  # 自定义 Cookie 名称
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # 改为 Lax 更安全
+    app.config['SESSION_COOKIE_SECURE'] = False  # HTTP 环境
+    app.config['SESSION_COOKIE_HTTPONLY'] = True  # 防止 XSS 攻击
+    app.config['SESSION_COOKIE_DOMAIN'] = None  # 不限制域名
+    app.config['SESSION_COOKIE_PATH'] = '/'  # 所有路径
+    app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24小时
+    app.config['SESSION_REFRESH_EACH_REQUEST'] = False  # 只在 session 变化时下发 Cookie
     
-    # 检查 token
-    token = get_token_from_request()
-    if token:
-        user_id = verify_token(token)
-        if user_id:
-            # 将 user_id 设置到 session 中（向后兼容）
-            session['user_id'] = user_id
-            session.permanent = True  # 设置为永久 session
-            return
+    # 服务端 session：Cookie 只保存 session id，内容存在 Sessions 表（SESSION_BACKEND=cookie 时使用 Flask 默认的签名 Cookie）
+    if os.getenv('SESSION_BACKEND', 'sqlite') == 'sqlite':
+        from utils.session_store import SQLiteSessionInterface
+        app.session_interface = SQLiteSessionInterface(session_store)
     
-    # 对于 API 请求，返回 401
-    if request.path.startswith('/api/'):
-        return jsonify({"success": False, "error": "未授权"}), 401
+    # 启用 CORS（完全开放配置）
+    CORS(app, 
+         supports_credentials=True,
+         resources={r"/*": {"origins": "*"}},
+         allow_headers=["Content-Type", "Authorization"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+         expose_headers=["Set-Cookie"])
     
-    # 对于页面请求，重定向到登录页
-    return redirect(url_for('login'))
-
-# 页面路由
-@app.route('/')
-def index():
-    """首页 - 重定向到登录或主页"""
-    if 'user_id' in session:
-        return redirect(url_for('home'))
-    return redirect(url_for('login'))
-
-@app.route('/login')
-def login():
-    """登录页面"""
-    if 'user_id' in session:
-        return redirect(url_for('home'))
-    return render_template('login.html', show_nav=False)
-
-@app.route('/register')
-def register():
-    """注册页面"""
-    if 'user_id' in session:
-        return redirect(url_for('home'))
-    return render_template('register.html', show_nav=False)
-
-@app.route('/home')
-def home():
-    """主页"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    return render_template('home.html', show_nav=True, active_page='home')
-
-@app.route('/profile')
-def profile():
-    """个人资料页面"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
+    # 注册服务容器（Database / GPTService 在首次使用时才创建，每个进程只创建一次）
+    services.init_app(app)
     
-    from models import UserProfile
-    profile_model = UserProfile(db)
-    user_profile = profile_model.get_profile(session['user_id'])
+    # 注册蓝图（API 路由）
+    from routes import auth_bp, profile_bp, avatar_bp, chat_bp, mood_bp, demo_bp, media_bp, assets_bp
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(profile_bp)
+    app.register_blueprint(avatar_bp)
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(mood_bp)
+    app.register_blueprint(demo_bp)
+    app.register_blueprint(media_bp)
+    app.register_blueprint(assets_bp)
     
-    return render_template('profile.html', 
-                         show_nav=True, 
-                         active_page='profile',
-                         profile=user_profile or {})
-
-@app.route('/avatar')
-def avatar():
-    """Avatar 列表页面"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    return render_template('avatars.html', show_nav=True, active_page='avatar')
-
-@app.route('/chat')
-def chat():
-    """聊天页面"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    return render_template('chat.html', show_nav=True, active_page='chat')
+    register_pages(app)
+    register_error_handlers(app)
+    
+    # 响应压缩（gzip / brotli），启动时预压缩静态文件
+    register_compression(app)
+    
+    # 构建带内容哈希的 JS / CSS / 图片（模板中使用 asset_url()）
+    register_assets(app)
+    
+    # 认证表在所有路由注册完成后编译
+    register_auth(app)
+    
+    return app
 
-@app.route('/calendar')
-def calendar():
-    """日历页面"""
-    if 'user_id' not in session:
+# 页面路由
+def register_pages(app):
+    @app.route('/')
+    @public
+    def index():
+        """首页 - 重定向到登录或主页"""
+        if 'user_id' in session:
+            return redirect(url_for('home'))
         return redirect(url_for('login'))
-    return render_template('calendar.html', show_nav=True, active_page='calendar')
 
-@app.route('/demo')
-def demo():
-    """演示模式登录页面"""
-    return render_template('demo.html')
+    @app.route('/login')
+    @public
+    def login():
+        """登录页面"""
+        if 'user_id' in session:
+            return redirect(url_for('home'))
+        return render_page('login.html', show_nav=False)
+
+    @app.route('/register')
+    @public
+    def register():
+        """注册页面"""
+        if 'user_id' in session:
+            return redirect(url_for('home'))
+        return render_page('register.html', show_nav=False)
+
+    @app.route('/home')
+    @login_required
+    def home():
+        """主页"""
+        return render_page('home.html', show_nav=True, active_page='home')
+
+    @app.route('/profile')
+    @login_required
+    def profile():
+        """个人资料页面"""
+        from models import UserProfile
+        profile_model = UserProfile(db)
+        user_profile = profile_model.get_profile(current_user_id())
+    
+        return render_template('profile.html', 
+                             show_nav=True, 
+                             active_page='profile',
+                             profile=user_profile or {})
+
+    @app.route('/avatar')
+    @login_required
+    def avatar():
+        """Avatar 列表页面"""
+        return render_page('avatars.html', show_nav=True, active_page='avatar')
+
+    @app.route('/chat')
+    @login_required
+    def chat():
+        """聊天页面"""
+        return render_page('chat.html', show_nav=True, active_page='chat')
+
+    @app.route('/calendar')
+    @login_required
+    def calendar():
+        """日历页面"""
+        return render_page('calendar.html', show_nav=True, active_page='calendar')
+
+    @app.route('/demo')
+    @public
+    def demo():
+        """演示模式登录页面"""
+        return render_page('demo.html')
+
+    @app.route('/test-login')
+    @public
+    def test_login():
+        """测试登录页面（用于调试）"""
+        return render_page('test_login.html')
+
+    @app.route('/test')
+    @public
+    def test():
+        """简单测试页面（无需登录）"""
+        return render_page('test.html')
 
-@app.route('/test-login')
-def test_login():
-    """测试登录页面（用于调试）"""
-    return render_template('test_login.html')
+# 错误处理
+def register_error_handlers(app):
+    @app.errorhandler(404)
+    def not_found(e):
+        return render_template('404.html'), 404
 
-@app.route('/test')
-def test():
-    """简单测试页面（无需登录）"""
-    return render_template('test.html')
+    @app.errorhandler(500)
+    def server_error(e):
+        return render_template('500.html'), 500
 
-# 错误处理
-@app.errorhandler(404)
-def not_found(e):
-    return render_template('404.html'), 404
+app = create_app()
 
-@app.errorhandler(500)
-def server_error(e):
-    return render_template('500.html'), 500
+# 进程退出时关闭连接池等服务
+atexit.register(services.shutdown)
 
 if __name__ == '__main__':
     # 确保上传目录存在
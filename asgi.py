@@ -0,0 +1,254 @@
+"""
+ASGI 入口（异步模式）
+- /api/chat/send 和 /api/chat/stream 在事件循环上原生处理：等待模型回复时不占用线程，
+  一个进程可以同时挂起成千上万个进行中的 LLM 调用
+- 认证、校验和 models/ 中的 SQLite 读写放到有上限的线程池里执行（DB_THREADS，默认与连接池大小相同）
+- 其余所有路由原样交给 Flask 应用（通过 asgiref 的 WsgiToAsgi 适配），在有上限的线程池里并发执行
+  （WSGI_THREADS，默认 32）：asgiref 默认把所有 WSGI 请求放到同一个线程里排队执行
+
+启动:
+    uvicorn asgi:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import request, jsonify
+
+from app import app as flask_app
+from extensions import services
+from utils.auth import current_user_id
+from routes.chat import chat_model, prepare_chat_turn, finish_chat_turn, sse_event
+from utils.compression import MIN_SIZE, StreamCompressor, choose_encoding, compress
+
+DB_THREADS = int(os.getenv('DB_THREADS') or os.getenv('DB_POOL_SIZE', 8))
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', 32))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='db')
+wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    # asgiref 用 @sync_to_async（thread_sensitive=True）包装 run_wsgi_app，所有请求都在同一个线程里串行执行；
+    # 这里改为在 wsgi_executor 中并发执行
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.__dict__['run_wsgi_app'].func,
+        thread_sensitive=False,
+        executor=wsgi_executor
+    )
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi 的线程池版本：多个 Flask 请求可以同时执行（最多 WSGI_THREADS 个）"""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+wsgi_app = PooledWsgiToAsgi(flask_app)
+
+# 原生异步处理的路由: path -> 是否流式返回
+ASYNC_CHAT_ROUTES = {
+    '/api/chat/send': False,
+    '/api/chat/stream': True,
+}
+
+
+def build_environ(scope, body):
+    """把 ASGI scope 和请求体转换成 WSGI environ，供 Flask 的请求上下文使用"""
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'] = server[0]
+    environ['SERVER_PORT'] = str(server[1])
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    # 请求体已完整读入内存，长度以实际内容为准（分块上传时客户端不会带 Content-Length）
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def prepare_turn_sync(environ):
+    """
+    在线程池中执行：走 Flask 的 before_request 认证、登录检查，校验请求并加载对话上下文
+
+    Returns:
+        (response, turn)：失败时 turn 为 None，response 是完整的错误响应；
+        成功时 response 只用来携带 after_request 产生的响应头（Set-Cookie、CORS 等）
+    """
+    with flask_app.request_context(environ):
+        turn = None
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    if current_user_id() is None:
+                        rv = (jsonify({"success": False, "error": "未登录"}), 401)
+                    else:
+                        rv, turn = prepare_chat_turn(current_user_id(), request.get_json())
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+
+            response = flask_app.make_response(rv if rv is not None else ('', 200))
+            response = flask_app.process_response(response)
+        except Exception as e:
+            turn = None
+            response = flask_app.handle_exception(e)
+
+        return response, turn
+
+
+def response_headers(response, content_type):
+    """复用 Flask 响应头（Cookie、CORS），替换内容类型"""
+    headers = [
+        (name.lower().encode('latin1'), value.encode('latin1'))
+        for name, value in response.headers.items()
+        if name.lower() not in ('content-type', 'content-length')
+    ]
+    headers.append((b'content-type', content_type.encode('latin1')))
+    return headers
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def chat_endpoint(scope, receive, send, stream):
+    loop = asyncio.get_running_loop()
+    environ = build_environ(scope, await read_body(receive))
+    response, turn = await loop.run_in_executor(db_executor, prepare_turn_sync, environ)
+
+    if turn is None:
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers(response, response.content_type or 'text/plain'),
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+        return
+
+    encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+    gpt_service = services.get('gpt_service')
+    args = (turn['user_message'], turn['chat_history'], turn['system_prompt'],
+            turn['user_profile'], turn['prompt_cache_key'])
+
+    if not stream:
+        result = await gpt_service.agenerate_response(*args)
+        if result['success']:
+            ai_message = result['message']
+        else:
+            ai_message = result.get('message', result.get('error', '抱歉，我现在无法回复。'))
+
+        payload = await loop.run_in_executor(db_executor, finish_chat_turn, turn, ai_message, result.get('usage'))
+        body = flask_app.json.response(payload).get_data()
+        headers = response_headers(response, 'application/json')
+        if encoding and len(body) >= MIN_SIZE:
+            body = compress(body, encoding)
+            headers.append((b'content-encoding', encoding.encode('latin1')))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+
+    headers = response_headers(response, 'text/event-stream; charset=utf-8')
+    headers += [(b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]
+    compressor = StreamCompressor(encoding) if encoding else None
+    if compressor:
+        headers.append((b'content-encoding', encoding.encode('latin1')))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+    async def send_event(data, event=None):
+        body = sse_event(data, event).encode('utf-8')
+        await send({
+            'type': 'http.response.body',
+            'body': compressor.compress(body) if compressor else body,
+            'more_body': True,
+        })
+
+    parts = []
+    deltas = gpt_service.astream_response(*args)
+    try:
+        await send_event({"success": True}, event='start')
+        async for delta in deltas:
+            parts.append(delta)
+            await send_event({"delta": delta})
+    except (asyncio.CancelledError, OSError):
+        # 客户端中途断开：与 WSGI 路径一致，仍然保存用户消息和已生成的部分回复
+        # （没有人等待结果：提交到线程池后不等待，也不等待写缓冲提交）
+        db_executor.submit(chat_model.save_turn, turn['user_id'], turn['avatar_id'],
+                           turn['user_message'], "".join(parts), wait=False)
+        raise
+    finally:
+        # 关闭上游的流式请求，断开后不再继续生成
+        await deltas.aclose()
+
+    # 流结束后只保存一次完整的一轮对话
+    payload = await loop.run_in_executor(db_executor, finish_chat_turn, turn, "".join(parts))
+    await send_event(payload, event='done')
+    await send({'type': 'http.response.body', 'body': compressor.finish() if compressor else b''})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            gpt_service = services.peek('gpt_service')
+            if gpt_service is not None:
+                await gpt_service.aclose()
+            db_executor.shutdown(wait=True)
+            wsgi_executor.shutdown(wait=True)
+            services.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI 应用"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] in ASYNC_CHAT_ROUTES:
+        await chat_endpoint(scope, receive, send, ASYNC_CHAT_ROUTES[scope['path']])
+        return
+
+    await wsgi_app(scope, receive, send)
@@ -1,4 +1,6 @@
 # database/__init__.py
 from .db_manager import Database
+from .pool import ConnectionPool
+from .write_buffer import WriteBuffer
 
-__all__ = ['Database']
+__all__ = ['Database', 'ConnectionPool', 'WriteBuffer']
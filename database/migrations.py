@@ -0,0 +1,448 @@
+"""
+数据库迁移
+- schema_version 表记录已执行的迁移版本
+- 迁移按版本号顺序执行，每一步在一个独立事务中完成
+- 表重建使用 INSERT ... SELECT 集合操作，不在 Python 中逐行复制
+
+命令行用法:
+    python -m database.migrations status [--db mindmate.db]
+    python -m database.migrations upgrade [--db mindmate.db] [--target N]
+"""
+
+import argparse
+import os
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """注册一个迁移步骤"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+DEFAULT_PERSONAS = [
+    (
+        "Serene Soul",
+        "You are a calm, peaceful, and gentle companion. You speak in a soothing manner, offering wisdom and tranquility. You help users find inner peace and balance in their lives.",
+        "Calm, gentle, and wise companion"
+    ),
+    (
+        "Happy Mind",
+        "You are an optimistic, cheerful, and energetic companion. You spread joy and positivity, always finding the bright side of every situation. You encourage users to embrace happiness.",
+        "Optimistic, cheerful, energetic companion"
+    ),
+    (
+        "Joyful Vision",
+        "You are an enthusiastic, creative, and inspiring companion. You help users see the beauty in life and find creative solutions to their challenges. You celebrate every small victory.",
+        "Enthusiastic, creative, inspiring companion"
+    ),
+    (
+        "Dream Chaser",
+        "You are an ambitious, motivating, and supportive companion. You push users to pursue their dreams and achieve their goals. You believe in their potential and help them overcome obstacles.",
+        "Ambitious, motivating, supportive companion"
+    ),
+    (
+        "User-defined",
+        "You are a customizable companion. Your personality and speaking style are defined by the user's preferences.",
+        "User-defined companion"
+    )
+]
+
+
+@migration(1, "初始表结构和预设 Personas")
+def _initial_schema(conn):
+    # Users 表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            hashed_password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # UserProfiles 表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS UserProfiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            name TEXT,
+            gender TEXT,
+            user_avatar_path TEXT,
+            date_birth TEXT,
+            goal TEXT,
+            self_description TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES Users(id)
+        )
+    ''')
+
+    # Personas 表（预设的 Avatar 内核）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Personas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            system_prompt TEXT NOT NULL,
+            description TEXT
+        )
+    ''')
+
+    # Avatars 表（单 Avatar 版本，由迁移 3 升级为多 Avatar）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Avatars (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            appearance_type TEXT NOT NULL,
+            custom_image_path TEXT,
+            persona_id INTEGER NOT NULL,
+            custom_persona TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES Users(id),
+            FOREIGN KEY (persona_id) REFERENCES Personas(id)
+        )
+    ''')
+
+    # ChatHistory 表（persona_id 版本，由迁移 3 升级为 avatar_id）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ChatHistory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            persona_id INTEGER NOT NULL DEFAULT 1,
+            sender TEXT NOT NULL,
+            message TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES Users(id),
+            FOREIGN KEY (persona_id) REFERENCES Personas(id)
+        )
+    ''')
+
+    # MoodCalendar 表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS MoodCalendar (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            mood_emoji TEXT NOT NULL,
+            source TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, date),
+            FOREIGN KEY (user_id) REFERENCES Users(id)
+        )
+    ''')
+
+    # 插入预设的 Personas
+    conn.executemany(
+        "INSERT OR IGNORE INTO Personas (name, system_prompt, description) VALUES (?, ?, ?)",
+        DEFAULT_PERSONAS
+    )
+
+
+@migration(2, "UserProfiles 增加 gender / user_avatar_path，ChatHistory 增加 persona_id")
+def _profile_columns(conn):
+    # 只对非常早期的数据库生效，新库在迁移 1 中已经包含这些字段
+    profile_columns = _columns(conn, 'UserProfiles')
+    if 'gender' not in profile_columns:
+        conn.execute("ALTER TABLE UserProfiles ADD COLUMN gender TEXT")
+    if 'user_avatar_path' not in profile_columns:
+        conn.execute("ALTER TABLE UserProfiles ADD COLUMN user_avatar_path TEXT")
+        if 'avatar_path' in profile_columns:
+            # 迁移旧的 avatar_path 数据
+            conn.execute("UPDATE UserProfiles SET user_avatar_path = avatar_path WHERE avatar_path IS NOT NULL")
+
+    chat_columns = _columns(conn, 'ChatHistory')
+    if 'persona_id' not in chat_columns and 'avatar_id' not in chat_columns:
+        conn.execute("ALTER TABLE ChatHistory ADD COLUMN persona_id INTEGER NOT NULL DEFAULT 1")
+
+
+@migration(3, "多 Avatar 支持：Avatars 增加 avatar_name，ChatHistory 改用 avatar_id")
+def _multi_avatar(conn):
+    # 1. 重建 Avatars 表（移除 user_id UNIQUE 约束，保留原 id 以便映射聊天记录）
+    if 'avatar_name' not in _columns(conn, 'Avatars'):
+        conn.execute('''
+            CREATE TABLE Avatars_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                avatar_name TEXT NOT NULL,
+                appearance_type TEXT NOT NULL,
+                custom_image_path TEXT,
+                persona_id INTEGER NOT NULL,
+                custom_persona TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES Users(id),
+                FOREIGN KEY (persona_id) REFERENCES Personas(id)
+            )
+        ''')
+        # 使用 Persona 名称作为默认的 Avatar 名称
+        conn.execute('''
+            INSERT INTO Avatars_new
+                (id, user_id, avatar_name, appearance_type, custom_image_path,
+                 persona_id, custom_persona, updated_at)
+            SELECT a.id, a.user_id, COALESCE(p.name, 'My Avatar'), a.appearance_type,
+                   a.custom_image_path, a.persona_id, a.custom_persona, a.updated_at
+            FROM Avatars a
+            LEFT JOIN Personas p ON a.persona_id = p.id
+        ''')
+        conn.execute("DROP TABLE Avatars")
+        conn.execute("ALTER TABLE Avatars_new RENAME TO Avatars")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_avatars_user ON Avatars(user_id)")
+
+    # 2. 重建 ChatHistory 表（persona_id -> avatar_id）
+    if 'avatar_id' not in _columns(conn, 'ChatHistory'):
+        conn.execute('''
+            CREATE TABLE ChatHistory_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                avatar_id INTEGER,
+                sender TEXT NOT NULL,
+                message TEXT NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES Users(id),
+                FOREIGN KEY (avatar_id) REFERENCES Avatars(id)
+            )
+        ''')
+        # 优先映射到同 Persona 的 Avatar，否则映射到用户的第一个 Avatar
+        conn.execute('''
+            INSERT INTO ChatHistory_new (id, user_id, avatar_id, sender, message, timestamp)
+            SELECT c.id, c.user_id,
+                   COALESCE(
+                       (SELECT a.id FROM Avatars a
+                        WHERE a.user_id = c.user_id AND a.persona_id = c.persona_id
+                        ORDER BY a.id LIMIT 1),
+                       (SELECT a.id FROM Avatars a
+                        WHERE a.user_id = c.user_id
+                        ORDER BY a.id LIMIT 1)
+                   ),
+                   c.sender, c.message, c.timestamp
+            FROM ChatHistory c
+        ''')
+        conn.execute("DROP TABLE ChatHistory")
+        conn.execute("ALTER TABLE ChatHistory_new RENAME TO ChatHistory")
+
+
+@migration(4, "ChatHistory 复合索引（按 Avatar 分页 / 按时间查询）")
+def _chat_history_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chathistory_user_avatar_id ON ChatHistory(user_id, avatar_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chathistory_user_timestamp ON ChatHistory(user_id, timestamp)")
+
+
+@migration(5, "ChatHistory 增加 day 日期分桶列及索引（心情分析按天查询）")
+def _chat_history_day(conn):
+    from datetime import datetime, timezone
+    from utils.dates import utc_offset_seconds
+
+    if 'day' not in _columns(conn, 'ChatHistory'):
+        conn.execute("ALTER TABLE ChatHistory ADD COLUMN day TEXT")
+
+    # 按应用时区回填历史消息的日期：时区偏移只按小时计算一次（不同的小时数远少于消息数），
+    # 回填本身是一条集合 UPDATE，由 SQLite 的 date() 完成，不对每行调用 Python 函数
+    conn.execute("CREATE TEMP TABLE day_offsets (hour TEXT PRIMARY KEY, modifier TEXT NOT NULL)")
+    hours = conn.execute(
+        "SELECT DISTINCT substr(timestamp, 1, 13) FROM ChatHistory WHERE day IS NULL AND timestamp IS NOT NULL"
+    ).fetchall()
+    offsets = []
+    for (hour,) in hours:
+        try:
+            moment = datetime.strptime(hour, '%Y-%m-%d %H').replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+        offsets.append((hour, f"{utc_offset_seconds(moment):+d} seconds"))
+    conn.executemany("INSERT INTO day_offsets (hour, modifier) VALUES (?, ?)", offsets)
+
+    conn.execute("""
+        UPDATE ChatHistory
+        SET day = date(timestamp, (SELECT modifier FROM day_offsets WHERE hour = substr(ChatHistory.timestamp, 1, 13)))
+        WHERE day IS NULL
+    """)
+    conn.execute("DROP TABLE temp.day_offsets")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chathistory_user_day ON ChatHistory(user_id, day)")
+
+
+@migration(6, "后台任务队列 Jobs 表")
+def _jobs_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            dedupe_key TEXT UNIQUE,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON Jobs(status, id)")
+
+
+@migration(7, "缓存失效日志 CacheInvalidations 表（多进程缓存同步）")
+def _cache_invalidations_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS CacheInvalidations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cache_key TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+@migration(8, "登录 token 表 AuthTokens")
+def _auth_tokens_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS AuthTokens (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES Users(id)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_authtokens_expires ON AuthTokens(expires_at)")
+
+
+@migration(9, "服务端 session 表 Sessions")
+def _sessions_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Sessions (
+            sid_hash TEXT PRIMARY KEY,
+            user_id INTEGER,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON Sessions(expires_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON Sessions(user_id)")
+
+
+@migration(10, "按内容寻址的图片引用计数表 Images")
+def _images_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Images (
+            path TEXT PRIMARY KEY,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            uploaded_at REAL NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_images_orphans ON Images(ref_count, uploaded_at)")
+
+
+@migration(11, "签名 token 吊销表 RevokedTokens")
+def _revoked_tokens_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS RevokedTokens (
+            signature TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_revokedtokens_expires ON RevokedTokens(expires_at)")
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def current_version(conn):
+    """返回数据库当前的表结构版本（未迁移过返回 0）"""
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def upgrade(conn, target=None):
+    """
+    执行所有待处理的迁移
+
+    每个迁移步骤在一个 BEGIN IMMEDIATE 事务中执行并记录版本号，
+    失败时回滚该步骤并抛出异常。多个进程同时启动时，后拿到写锁的进程
+    会在事务内重新检查版本，不会重复执行。
+
+    Returns:
+        本次执行的迁移版本号列表
+    """
+    target = LATEST_VERSION if target is None else target
+    applied = []
+
+    for version, description, func in MIGRATIONS:
+        if version > target:
+            break
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= version:
+                conn.rollback()
+                continue
+            func(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+        applied.append(version)
+        print(f"✅ 迁移 {version}: {description}")
+
+    return applied
+
+
+def status(conn):
+    """返回 [(version, description, applied_at 或 None)]"""
+    _ensure_version_table(conn)
+    applied = dict(conn.execute("SELECT version, applied_at FROM schema_version").fetchall())
+    return [(version, description, applied.get(version)) for version, description, _ in MIGRATIONS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MindMate 数据库迁移工具")
+    parser.add_argument('command', choices=['status', 'upgrade'], help="status: 查看迁移状态；upgrade: 执行待处理的迁移")
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'mindmate.db'), help="数据库文件路径")
+    parser.add_argument('--target', type=int, default=None, help="迁移到指定版本（默认最新）")
+    args = parser.parse_args(argv)
+
+    from .db_manager import Database
+
+    db = Database(args.db)
+    try:
+        with db.get_connection() as conn:
+            if args.command == 'status':
+                version = current_version(conn)
+                print(f"数据库: {args.db}")
+                print(f"当前版本: {version} / 最新版本: {LATEST_VERSION}")
+                for number, description, applied_at in status(conn):
+                    mark = f"✅ {applied_at}" if applied_at else "⏳ 待执行"
+                    print(f"  {number:>3}  {description}  {mark}")
+            else:
+                applied = upgrade(conn, args.target)
+                if applied:
+                    print(f"✅ 已执行 {len(applied)} 个迁移，当前版本 {current_version(conn)}")
+                else:
+                    print(f"✅ 数据库已是最新版本 ({current_version(conn)})")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+组提交写缓冲（可选，DB_WRITE_BUFFER=True 时启用）
+- 各请求线程提交的 INSERT 先进入内存队列，由一个后台线程合并到同一个写事务中
+- 上一批提交期间到达的写入自然组成下一批；可通过 DB_WRITE_BUFFER_MS 让第一条写入到达后
+  再额外等待几毫秒攒批，攒够 DB_WRITE_BUFFER_ROWS 行则立即刷盘
+- 一次提交（一次 fsync）确认一整批写入，吞吐量不再受磁盘同步速度限制
+- submit() 返回 WriteTicket，需要持久化确认（或需要自增 id）的调用方 wait() 即可；
+  不关心结果的调用方可以直接返回
+- 关闭时（进程退出）会先把队列中剩余的写入刷盘
+
+用法:
+    ticket = db.write_buffer.submit("INSERT INTO ChatHistory (...) VALUES (?, ?)", [(1, 'a'), (2, 'b')])
+    ids = ticket.wait()  # 提交成功后返回每行的 rowid
+"""
+
+import threading
+import time
+
+
+class WriteTicket:
+    """一次 submit 的结果，wait() 在所属批次提交后返回"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._ids = None
+        self._error = None
+
+    def _resolve(self, ids=None, error=None):
+        self._ids = ids
+        self._error = error
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        等待写入提交
+
+        Returns:
+            每行插入后的 rowid 列表
+        Raises:
+            TimeoutError: 超时仍未提交
+            写入失败时抛出数据库返回的异常
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("等待写缓冲提交超时")
+        if self._error is not None:
+            raise self._error
+        return self._ids
+
+
+class WriteBuffer:
+    def __init__(self, db, interval_ms=0, max_rows=256):
+        self.db = db
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+
+        self._pending = []  # [(sql, rows, ticket)]
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, rows):
+        """加入一组写入（同一条 SQL 的多行参数），同一次 submit 的行保证在同一个事务中"""
+        ticket = WriteTicket()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("写缓冲已关闭")
+            self._pending.append((sql, list(rows), ticket))
+            self._pending_rows += len(rows)
+            self._cond.notify()
+        return ticket
+
+    def close(self):
+        """停止后台线程，剩余写入刷盘后返回"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return  # 已关闭且队列为空
+
+                # 配置了攒批时间时，第一条写入到达后再等一小段时间，让并发请求合并进同一个事务
+                deadline = time.monotonic() + self.interval
+                while self._pending_rows < self.max_rows and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending
+                self._pending = []
+                self._pending_rows = 0
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        """把一批写入放在同一个事务中执行；单个 submit 失败只回滚它自己"""
+        results = []
+        try:
+            with self.db.get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for sql, rows, ticket in batch:
+                    conn.execute("SAVEPOINT buffered_write")
+                    try:
+                        # 逐行执行以拿到每行的 rowid（同一事务内没有额外的 fsync）
+                        ids = [conn.execute(sql, row).lastrowid for row in rows]
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO buffered_write")
+                        conn.execute("RELEASE buffered_write")
+                        results.append((ticket, None, e))
+                    else:
+                        conn.execute("RELEASE buffered_write")
+                        results.append((ticket, ids, None))
+        except Exception as e:
+            # 提交本身失败：整批都没有落盘
+            print(f"[ERROR] 写缓冲提交失败: {e}")
+            for _, _, ticket in batch:
+                ticket._resolve(error=e)
+            return
+
+        for ticket, ids, error in results:
+            ticket._resolve(ids, error)
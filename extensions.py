@@ -0,0 +1,142 @@
+"""
+应用级服务容器
+- 每个进程只创建一个 Database / GPTService / JobQueue / TokenStore / SessionStore / ImageStore 实例
+- 服务在第一次使用时才初始化（延迟加载），表结构初始化也只执行一次
+- 路由和模型通过 services.proxy() 拿到代理对象，模块导入时不会触发任何 IO
+"""
+
+import os
+import threading
+from werkzeug.local import LocalProxy
+
+
+class ServiceRegistry:
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+        self.config = {}
+
+    def init_app(self, app):
+        """绑定 Flask 应用，读取应用配置"""
+        self.config = app.config
+        app.extensions['mindmate'] = self
+
+    def register(self, name, factory):
+        """注册服务工厂，factory(config) 返回服务实例"""
+        self._factories[name] = factory
+
+    def get(self, name):
+        """获取服务实例（首次调用时创建）"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"未注册的服务: {name}")
+                self._instances[name] = self._factories[name](self.config)
+            return self._instances[name]
+
+    def peek(self, name):
+        """获取已创建的服务实例，尚未创建时返回 None（不会触发初始化）"""
+        return self._instances.get(name)
+
+    def proxy(self, name):
+        """返回一个延迟解析的代理对象，可在模块级别安全使用"""
+        return LocalProxy(lambda: self.get(name))
+
+    def shutdown(self):
+        """关闭所有已创建的服务"""
+        with self._lock:
+            # 按创建的逆序关闭（后创建的服务可能依赖先创建的服务）
+            for instance in reversed(list(self._instances.values())):
+                close = getattr(instance, 'close', None)
+                if callable(close):
+                    close()
+            self._instances.clear()
+
+
+def _create_database(config):
+    from database import Database
+
+    db_path = config.get('DATABASE_PATH') or os.getenv('DATABASE_PATH', 'mindmate.db')
+    db = Database(db_path)
+    # 单次版本检查，必要时执行待处理的迁移
+    db.init_db()
+    return db
+
+
+def _create_gpt_service(config):
+    from utils import GPTService
+
+    return GPTService()
+
+
+def _create_job_queue(config):
+    from utils.job_queue import JobQueue
+
+    queue = JobQueue(
+        services.get('db'),
+        workers=int(config.get('JOB_WORKERS') or os.getenv('JOB_WORKERS', 2))
+    )
+    queue.start()
+    return queue
+
+
+def _create_token_store(config):
+    from utils.token_store import SignedTokenStore, SQLiteTokenStore
+
+    backend = config.get('TOKEN_BACKEND') or os.getenv('TOKEN_BACKEND', 'sqlite')
+    if backend == 'signed':
+        store = SignedTokenStore(services.get('db'), os.getenv('SECRET_KEY') or config.get('SECRET_KEY'))
+    else:
+        store = SQLiteTokenStore(services.get('db'))
+    store.start()
+    return store
+
+
+def _create_session_store(config):
+    from utils.session_store import SessionStore
+
+    store = SessionStore(services.get('db'))
+    store.start()
+    return store
+
+
+def _create_image_store(config):
+    from utils.image_store import ImageStore
+
+    store = ImageStore(services.get('db'))
+    store.start()
+    return store
+
+
+def _create_password_hasher(config):
+    from utils.password_hasher import PasswordHasher
+
+    return PasswordHasher(
+        workers=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+        max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32)),
+        method=os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    )
+
+
+services = ServiceRegistry()
+services.register('db', _create_database)
+services.register('gpt_service', _create_gpt_service)
+services.register('job_queue', _create_job_queue)
+services.register('token_store', _create_token_store)
+services.register('session_store', _create_session_store)
+services.register('image_store', _create_image_store)
+services.register('password_hasher', _create_password_hasher)
+
+# 模块级代理，供路由和页面使用
+db = services.proxy('db')
+gpt_service = services.proxy('gpt_service')
+job_queue = services.proxy('job_queue')
+token_store = services.proxy('token_store')
+session_store = services.proxy('session_store')
+image_store = services.proxy('image_store')
+password_hasher = services.proxy('password_hasher')
@@ -3,5 +3,6 @@ from .profile import UserProfile
 from .avatar import Avatar
 from .chat import Chat
 from .mood import Mood
+from .cache import EntityCache, get_cache
 
-__all__ = ['User', 'UserProfile', 'Avatar', 'Chat', 'Mood']
+__all__ = ['User', 'UserProfile', 'Avatar', 'Chat', 'Mood', 'EntityCache', 'get_cache']
@@ -1,107 +1,135 @@
 from database.db_manager import Database
+from utils.image_pipeline import image_urls
+from .cache import get_cache
+from extensions import image_store
 
 class Avatar:
     def __init__(self, db: Database):
         self.db = db
-    
+
+    @property
+    def cache(self):
+        return get_cache(self.db)
+
     def get_personas(self):
-        """获取所有预设的 Persona"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM Personas")
-        personas = cursor.fetchall()
-        conn.close()
-        
+        """获取所有预设的 Persona（读穿透缓存）"""
+        return self.cache.get_or_load(('personas',), self._load_personas)
+
+    def _load_personas(self):
+        with self.db.get_connection() as conn:
+            personas = conn.execute("SELECT * FROM Personas").fetchall()
+
         return [dict(p) for p in personas]
-    
+
+    @staticmethod
+    def _to_dict(row):
+        """数据库行 -> Avatar 字典（附带自定义头像各尺寸的 URL）"""
+        avatar = dict(row)
+        avatar['image_urls'] = image_urls(avatar.get('custom_image_path'))
+        return avatar
+
+    def personas_version(self, user_id=None):
+        """Persona 列表的版本（条件 GET 用）"""
+        with self.db.get_connection() as conn:
+            row = conn.execute("SELECT COUNT(*), MAX(id) FROM Personas").fetchone()
+        return tuple(row), None
+
+    def avatars_version(self, user_id):
+        """用户 Avatar 列表的版本：增删改都会改变 (数量, 最大 id, 最近修改时间)"""
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), MAX(id), MAX(updated_at) FROM Avatars WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        return tuple(row), row[2]
+
+    def avatar_version(self, avatar_id, user_id):
+        """单个 Avatar 的版本"""
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT updated_at FROM Avatars WHERE id = ? AND user_id = ?",
+                (avatar_id, user_id)
+            ).fetchone()
+        updated_at = row['updated_at'] if row else None
+        return (avatar_id, updated_at), updated_at
+
     def get_all_avatars(self, user_id):
-        """获取用户的所有 Avatar"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """SELECT a.*, p.name as persona_name, p.system_prompt, p.description 
-               FROM Avatars a 
-               LEFT JOIN Personas p ON a.persona_id = p.id 
-               WHERE a.user_id = ?
-               ORDER BY a.created_at DESC""",
-            (user_id,)
-        )
-        avatars = cursor.fetchall()
-        conn.close()
-        
-        return [dict(a) for a in avatars]
-    
+        """获取用户的所有 Avatar（读穿透缓存）"""
+        return self.cache.get_or_load(('avatars', user_id), lambda: self._load_all_avatars(user_id))
+
+    def _load_all_avatars(self, user_id):
+        with self.db.get_connection() as conn:
+            avatars = conn.execute(
+                """SELECT a.*, p.name as persona_name, p.system_prompt, p.description
+                   FROM Avatars a
+                   LEFT JOIN Personas p ON a.persona_id = p.id
+                   WHERE a.user_id = ?
+                   ORDER BY a.created_at DESC""",
+                (user_id,)
+            ).fetchall()
+
+        return [self._to_dict(a) for a in avatars]
+
     def get_avatar_by_id(self, avatar_id, user_id=None):
-        """根据 ID 获取 Avatar（可选验证 user_id）"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        if user_id:
-            cursor.execute(
-                """SELECT a.*, p.name as persona_name, p.system_prompt, p.description 
-                   FROM Avatars a 
-                   LEFT JOIN Personas p ON a.persona_id = p.id 
-                   WHERE a.id = ? AND a.user_id = ?""",
-                (avatar_id, user_id)
-            )
-        else:
-            cursor.execute(
-                """SELECT a.*, p.name as persona_name, p.system_prompt, p.description 
-                   FROM Avatars a 
-                   LEFT JOIN Personas p ON a.persona_id = p.id 
+        """根据 ID 获取 Avatar（可选验证 user_id，读穿透缓存）"""
+        try:
+            avatar_id = int(avatar_id)  # 统一键类型，请求里的 avatar_id 可能是字符串
+        except (TypeError, ValueError):
+            return None
+
+        avatar = self.cache.get_or_load(('avatar', avatar_id), lambda: self._load_avatar(avatar_id))
+
+        if avatar and user_id and avatar['user_id'] != int(user_id):
+            return None
+        return avatar
+
+    def _load_avatar(self, avatar_id):
+        with self.db.get_connection() as conn:
+            avatar = conn.execute(
+                """SELECT a.*, p.name as persona_name, p.system_prompt, p.description
+                   FROM Avatars a
+                   LEFT JOIN Personas p ON a.persona_id = p.id
                    WHERE a.id = ?""",
                 (avatar_id,)
-            )
-        
-        avatar = cursor.fetchone()
-        conn.close()
-        
+            ).fetchone()
+
         if avatar:
-            return dict(avatar)
+            return self._to_dict(avatar)
         return None
-    
+
+    def invalidate(self, user_id, *avatar_ids):
+        """Avatar 变化后清除相关缓存（该用户的列表和指定的 Avatar）"""
+        keys = [('avatars', user_id)] + [('avatar', int(avatar_id)) for avatar_id in avatar_ids]
+        self.cache.invalidate(*keys)
+
     def get_avatar(self, user_id):
         """获取用户的默认 Avatar（兼容旧 API）"""
         avatars = self.get_all_avatars(user_id)
         return avatars[0] if avatars else None
-    
-    def create_avatar(self, user_id, avatar_name, appearance_type, 
+
+    def create_avatar(self, user_id, avatar_name, appearance_type,
                      custom_image_path, persona_id, custom_persona=None):
         """创建新的 Avatar"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """INSERT INTO Avatars 
-               (user_id, avatar_name, appearance_type, custom_image_path, persona_id, custom_persona) 
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (user_id, avatar_name, appearance_type, custom_image_path, persona_id, custom_persona)
-        )
-        
-        avatar_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
+        with self.db.get_connection() as conn:
+            cursor = conn.execute(
+                """INSERT INTO Avatars
+                   (user_id, avatar_name, appearance_type, custom_image_path, persona_id, custom_persona)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (user_id, avatar_name, appearance_type, custom_image_path, persona_id, custom_persona)
+            )
+            avatar_id = cursor.lastrowid
+            image_store.acquire(custom_image_path)
+
+        self.invalidate(user_id)
         return {"success": True, "avatar_id": avatar_id}
-    
+
     def update_avatar(self, avatar_id, user_id, avatar_name=None, appearance_type=None,
                      custom_image_path=None, persona_id=None, custom_persona=None):
         """更新 Avatar"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # 验证 Avatar 属于该用户
-        cursor.execute("SELECT id FROM Avatars WHERE id = ? AND user_id = ?", (avatar_id, user_id))
-        if not cursor.fetchone():
-            conn.close()
-            return {"success": False, "error": "Avatar 不存在或无权限"}
-        
         # 构建更新语句
         updates = []
         params = []
-        
+
         if avatar_name is not None:
             updates.append("avatar_name = ?")
             params.append(avatar_name)
@@ -117,49 +145,66 @@ class Avatar:
         if custom_persona is not None:
             updates.append("custom_persona = ?")
             params.append(custom_persona)
-        
-        if updates:
-            updates.append("updated_at = CURRENT_TIMESTAMP")
-            params.extend([avatar_id, user_id])
-            
-            sql = f"UPDATE Avatars SET {', '.join(updates)} WHERE id = ? AND user_id = ?"
-            cursor.execute(sql, params)
-            conn.commit()
-        
-        conn.close()
+
+        with self.db.get_connection() as conn:
+            # 验证 Avatar 属于该用户
+            owned = conn.execute(
+                "SELECT id, custom_image_path FROM Avatars WHERE id = ? AND user_id = ?", (avatar_id, user_id)
+            ).fetchone()
+            if not owned:
+                return {"success": False, "error": "Avatar 不存在或无权限"}
+
+            if updates:
+                # 毫秒精度：同一秒内的两次修改也能让条件 GET 的版本变化
+                updates.append("updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')")
+                params.extend([avatar_id, user_id])
+
+                sql = f"UPDATE Avatars SET {', '.join(updates)} WHERE id = ? AND user_id = ?"
+                conn.execute(sql, params)
+
+            # 换了图片：新图片加引用，旧图片减引用
+            old_image_path = owned['custom_image_path']
+            replaced = custom_image_path is not None and custom_image_path != old_image_path
+            if replaced:
+                image_store.acquire(custom_image_path)
+                image_store.release(old_image_path)
+
+        if replaced:
+            image_store.collect(old_image_path)
+        self.invalidate(user_id, avatar_id)
         return {"success": True}
-    
+
     def delete_avatar(self, avatar_id, user_id):
         """删除 Avatar"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # 验证 Avatar 属于该用户
-        cursor.execute("SELECT id FROM Avatars WHERE id = ? AND user_id = ?", (avatar_id, user_id))
-        if not cursor.fetchone():
-            conn.close()
-            return {"success": False, "error": "Avatar 不存在或无权限"}
-        
-        # 删除 Avatar
-        cursor.execute("DELETE FROM Avatars WHERE id = ? AND user_id = ?", (avatar_id, user_id))
-        
-        # 删除相关的聊天记录
-        cursor.execute("DELETE FROM ChatHistory WHERE avatar_id = ? AND user_id = ?", (avatar_id, user_id))
-        
-        conn.commit()
-        conn.close()
-        
+        with self.db.get_connection() as conn:
+            # 验证 Avatar 属于该用户
+            owned = conn.execute(
+                "SELECT id, custom_image_path FROM Avatars WHERE id = ? AND user_id = ?", (avatar_id, user_id)
+            ).fetchone()
+            if not owned:
+                return {"success": False, "error": "Avatar 不存在或无权限"}
+
+            # 删除 Avatar
+            conn.execute("DELETE FROM Avatars WHERE id = ? AND user_id = ?", (avatar_id, user_id))
+            image_store.release(owned['custom_image_path'])
+
+            # 删除相关的聊天记录
+            conn.execute("DELETE FROM ChatHistory WHERE avatar_id = ? AND user_id = ?", (avatar_id, user_id))
+
+        # 最后一个引用被删除时清理图片文件
+        image_store.collect(owned['custom_image_path'])
+        self.invalidate(user_id, avatar_id)
         return {"success": True}
-    
-    def create_or_update_avatar(self, user_id, appearance_type, 
+
+    def create_or_update_avatar(self, user_id, appearance_type,
                                 custom_image_path, persona_id, custom_persona=None):
         """创建或更新用户的 Avatar（兼容旧 API）"""
         avatars = self.get_all_avatars(user_id)
-        
+
         if avatars:
             # 更新第一个 Avatar
             return self.update_avatar(
-                avatars[0]['id'], 
+                avatars[0]['id'],
                 user_id,
                 appearance_type=appearance_type,
                 custom_image_path=custom_image_path,
@@ -168,16 +213,11 @@ class Avatar:
             )
         else:
             # 创建新 Avatar
-            from models import Avatar as AvatarModel
-            persona = None
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM Personas WHERE id = ?", (persona_id,))
-            result = cursor.fetchone()
-            if result:
-                persona = dict(result)
-            conn.close()
-            
+            with self.db.get_connection() as conn:
+                persona = conn.execute(
+                    "SELECT name FROM Personas WHERE id = ?", (persona_id,)
+                ).fetchone()
+
             avatar_name = persona['name'] if persona else "My Avatar"
             return self.create_avatar(
                 user_id,
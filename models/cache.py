@@ -0,0 +1,207 @@
+"""
+进程内实体缓存
+- 缓存很少变化的读取结果：用户、用户资料、Avatar、Persona 列表
+- LRU + TTL：超过 ENTITY_CACHE_SIZE 条淘汰最久未使用的，超过 ENTITY_CACHE_TTL 秒自动过期
+- 读穿透：get_or_load(key, loader) 未命中时调用 loader 查询数据库并写入缓存
+- 写操作（update_profile / create_avatar / update_avatar / delete_avatar 等）负责调用 invalidate
+- 每个数据库文件一个缓存实例，进程内所有模型对象共享
+- 多进程部署（多个 gunicorn worker）时，invalidate 同时写入 CacheInvalidations 失效日志；
+  每个进程的 InvalidationBus 线程用 PRAGMA data_version 感知其他连接的提交，
+  读取新的失效记录并清除本地缓存（默认每 20ms 检查一次，CACHE_INVALIDATION_POLL_MS=0 关闭）
+
+键的约定:
+    ('user', user_id)        User.get_user_by_id
+    ('profile', user_id)     UserProfile.get_profile
+    ('avatar', avatar_id)    Avatar.get_avatar_by_id
+    ('avatars', user_id)     Avatar.get_all_avatars
+    ('personas',)            Avatar.get_personas
+"""
+
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class EntityCache:
+    def __init__(self, max_size=4096, ttl=300, bus=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.bus = bus  # 跨进程失效通道（可选）
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # 每次失效加一；加载期间发生过失效时不写入缓存，避免把失效前读到的旧数据放回去
+        self._invalidation_seq = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        """
+        读取缓存，未命中（或已过期）时调用 loader() 加载
+
+        loader 返回 None 时不缓存（例如记录尚不存在），下次仍会查询数据库。
+        返回值是缓存内容的副本，调用方可以放心修改。
+        """
+        if self.max_size <= 0:
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+            seq = self._invalidation_seq
+
+        value = loader()
+        if value is not None:
+            self._store(key, value, seq)
+        return copy.deepcopy(value)
+
+    def _store(self, key, value, seq):
+        with self._lock:
+            if seq != self._invalidation_seq:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """删除指定的缓存项，并通知其他进程（在数据库写入提交之后调用）"""
+        self.evict(*keys)
+        if self.bus is not None:
+            self.bus.publish(keys)
+
+    def evict(self, *keys):
+        """只删除本进程的缓存项"""
+        with self._lock:
+            self._invalidation_seq += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._invalidation_seq += 1
+            self._entries.clear()
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class InvalidationBus:
+    """
+    基于 SQLite 失效日志的跨进程缓存失效通道（不依赖 Redis 等外部服务）
+
+    PRAGMA data_version 在其他连接提交写入后才会变化，查询它不读任何页，
+    所以空闲时每次轮询几乎没有开销；变化后再按 id 游标读取新的失效记录。
+    """
+
+    def __init__(self, db, cache, poll_interval=0.02, retention=600):
+        self.db = db
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.retention = retention  # 失效记录保留秒数，之后由轮询线程清理
+
+        self._conn = None
+        self._last_id = 0
+        self._data_version = None
+        self._last_prune = 0.0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def publish(self, keys):
+        """写入失效记录，其他进程的轮询线程会清除这些键"""
+        with self.db.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO CacheInvalidations (cache_key) VALUES (?)",
+                [(json.dumps(list(key)),) for key in keys]
+            )
+
+    def start(self):
+        # 轮询使用专用连接：data_version 是按连接计算的
+        self._conn = self.db.pool.open_dedicated()
+        self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM CacheInvalidations").fetchone()[0]
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._last_prune = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self):
+        while not self._stopping.wait(self.poll_interval):
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"[ERROR] 缓存失效轮询失败: {e}")
+
+    def _poll(self):
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            rows = self._conn.execute(
+                "SELECT id, cache_key FROM CacheInvalidations WHERE id > ? ORDER BY id",
+                (self._last_id,)
+            ).fetchall()
+            if rows:
+                self.cache.evict(*[tuple(json.loads(row['cache_key'])) for row in rows])
+                self._last_id = rows[-1]['id']
+
+        if time.monotonic() - self._last_prune > 60:
+            self._last_prune = time.monotonic()
+            self._conn.execute(
+                "DELETE FROM CacheInvalidations WHERE created_at < datetime('now', ?)",
+                (f"-{int(self.retention)} seconds",)
+            )
+            self._conn.commit()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db):
+    """获取数据库对应的实体缓存（ENTITY_CACHE_SIZE=0 时相当于关闭缓存）"""
+    cache = _caches.get(db.db_path)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(db.db_path)
+            if cache is None:
+                cache = EntityCache(
+                    max_size=int(os.getenv('ENTITY_CACHE_SIZE', 4096)),
+                    ttl=float(os.getenv('ENTITY_CACHE_TTL', 300))
+                )
+                poll_ms = float(os.getenv('CACHE_INVALIDATION_POLL_MS', 20))
+                if cache.max_size > 0 and poll_ms > 0:
+                    cache.bus = InvalidationBus(db, cache, poll_interval=poll_ms / 1000)
+                    cache.bus.start()
+                    atexit.register(cache.bus.close)
+                _caches[db.db_path] = cache
+    return cache
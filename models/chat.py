@@ -1,69 +1,182 @@
 from database.db_manager import Database
-from datetime import datetime
+from utils.dates import today
+from utils.serialization import rows_to_dicts
+from .avatar import Avatar
+from .profile import UserProfile
+
+INSERT_MESSAGE_SQL = "INSERT INTO ChatHistory (user_id, avatar_id, sender, message, day) VALUES (?, ?, ?, ?, ?)"
 
 class Chat:
     def __init__(self, db: Database):
         self.db = db
-    
+
     def save_message(self, user_id, avatar_id, sender, message):
         """保存聊天消息"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+        ids = self._insert_messages([(user_id, avatar_id, sender, message, today())])
+        return {"success": True, "message_id": ids[0]}
+
+    def save_turn(self, user_id, avatar_id, user_message, ai_message, wait=True):
+        """
+        在同一个写事务中保存一轮对话（用户消息 + AI 回复），只提交一次
         
-        cursor.execute(
-            "INSERT INTO ChatHistory (user_id, avatar_id, sender, message) VALUES (?, ?, ?, ?)",
-            (user_id, avatar_id, sender, message)
-        )
+        Args:
+            wait: 启用写缓冲时是否等待提交完成；为 False 时立即返回，消息 id 为 None
         
-        conn.commit()
-        message_id = cursor.lastrowid
-        conn.close()
+        Returns:
+            {"success": True, "user_message_id": ..., "ai_message_id": ...}
+        """
+        day = today()
+        ids = self._insert_messages([
+            (user_id, avatar_id, 'user', user_message, day),
+            (user_id, avatar_id, 'ai', ai_message, day)
+        ], wait=wait)
+        user_message_id, ai_message_id = ids or (None, None)
+
+        return {"success": True, "user_message_id": user_message_id, "ai_message_id": ai_message_id}
+
+    def _insert_messages(self, rows, wait=True):
+        """
+        在一个事务中插入多条消息，返回各自的 id
         
-        return {"success": True, "message_id": message_id}
-    
-    def get_chat_history(self, user_id, avatar_id=None, limit=50):
-        """获取聊天历史（可按 avatar_id 过滤）"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+        启用写缓冲（DB_WRITE_BUFFER）时交给后台线程与其他请求的写入合并提交，
+        wait=True 时等到提交完成（持久化确认）再返回。
+        """
+        buffer = self.db.write_buffer
+        if buffer is not None:
+            ticket = buffer.submit(INSERT_MESSAGE_SQL, rows)
+            return ticket.wait() if wait else None
+
+        with self.db.get_connection() as conn:
+            return [conn.execute(INSERT_MESSAGE_SQL, row).lastrowid for row in rows]
+
+    def get_turn_context(self, user_id, avatar_id, history_limit=50):
+        """
+        加载生成回复所需的全部数据：Avatar + Persona、用户资料、该 Avatar 最近的聊天历史
         
-        if avatar_id:
-            cursor.execute(
-                """SELECT * FROM ChatHistory 
+        Avatar 和用户资料优先从实体缓存读取；未命中的查询和历史查询在同一个读事务中执行。
+        
+        Returns:
+            {"avatar": ..., "profile": ..., "history": [...]}；Avatar 不存在或不属于该用户时返回 None
+        """
+        with self.db.get_connection() as conn:
+            # 显式开启读事务，本次的所有查询看到同一个快照（模型内部的查询复用这个连接）
+            conn.execute("BEGIN")
+            avatar = Avatar(self.db).get_avatar_by_id(avatar_id, user_id)
+            if not avatar:
+                return None
+
+            profile = UserProfile(self.db).get_profile(user_id)
+            history = conn.execute(
+                """SELECT * FROM ChatHistory
                    WHERE user_id = ? AND avatar_id = ?
-                   ORDER BY timestamp DESC 
+                   ORDER BY id DESC
                    LIMIT ?""",
-                (user_id, avatar_id, limit)
-            )
+                (user_id, avatar['id'], history_limit)
+            ).fetchall()
+
+        return {
+            "avatar": avatar,
+            "profile": profile,
+            "history": [dict(m) for m in reversed(history)]
+        }
+
+    def history_version(self, user_id, avatar_id=None, before_id=None):
+        """
+        聊天历史的版本（条件 GET 用）
+
+        消息只追加，所以最大消息 id 就是版本；消息只会随 Avatar 一起删除，
+        再带上该用户 Avatar 的 (数量, 最大 id) 覆盖删除的情况。
+        """
+        conditions = ["user_id = ?"]
+        params = [user_id]
+
+        if avatar_id:
+            conditions.append("avatar_id = ?")
+            params.append(avatar_id)
+        if before_id:
+            conditions.append("id < ?")
+            params.append(before_id)
+
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                f"""SELECT (SELECT MAX(id) FROM ChatHistory WHERE {' AND '.join(conditions)}),
+                           (SELECT COUNT(*) FROM Avatars WHERE user_id = ?),
+                           (SELECT MAX(id) FROM Avatars WHERE user_id = ?)""",
+                params + [user_id, user_id]
+            ).fetchone()
+        return tuple(row), None
+
+    def get_chat_history(self, user_id, avatar_id=None, limit=50, before_id=None, after_id=None, columns=None):
+        """
+        获取聊天历史（可按 avatar_id 过滤，按消息 id 游标分页）
+        
+        Args:
+            before_id: 只返回 id 小于它的消息（向上翻页加载更早的消息）
+            after_id: 只返回 id 大于它的消息（只拉取新消息）
+            columns: 只查询这些列（必须是调用方确定的列名，不能来自用户输入）；默认返回全部列
+        
+        Returns:
+            按时间正序排列的消息列表
+        """
+        conditions = ["user_id = ?"]
+        params = [user_id]
+        
+        if avatar_id:
+            conditions.append("avatar_id = ?")
+            params.append(avatar_id)
+        if before_id:
+            conditions.append("id < ?")
+            params.append(before_id)
+        
+        if after_id:
+            # 新消息从游标往后正序读取
+            conditions.append("id > ?")
+            params.append(after_id)
+            order = "ASC"
         else:
-            cursor.execute(
-                """SELECT * FROM ChatHistory 
-                   WHERE user_id = ? 
-                   ORDER BY timestamp DESC 
+            order = "DESC"
+        
+        params.append(limit)
+        
+        with self.db.get_connection() as conn:
+            messages = conn.execute(
+                f"""SELECT {', '.join(columns) if columns else '*'} FROM ChatHistory 
+                   WHERE {' AND '.join(conditions)}
+                   ORDER BY id {order} 
                    LIMIT ?""",
-                (user_id, limit)
-            )
+                params
+            ).fetchall()
         
-        messages = cursor.fetchall()
-        conn.close()
+        if order == "DESC":
+            # 反转顺序，使最新的消息在最后
+            messages.reverse()
         
-        # 反转顺序，使最新的消息在最后
-        return [dict(m) for m in reversed(messages)]
+        if columns:
+            return rows_to_dicts(columns, messages)
+        return [dict(m) for m in messages]
     
     def get_recent_messages_for_mood(self, user_id, date):
         """获取特定日期的聊天消息，用于分析心情"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """SELECT message FROM ChatHistory 
-               WHERE user_id = ? 
-               AND date(timestamp) = date(?) 
-               AND sender = 'user'
-               ORDER BY timestamp""",
-            (user_id, date)
-        )
-        
-        messages = cursor.fetchall()
-        conn.close()
-        
+        with self.db.get_connection() as conn:
+            messages = conn.execute(
+                """SELECT message FROM ChatHistory
+                   WHERE user_id = ?
+                   AND day = ?
+                   AND sender = 'user'
+                   ORDER BY id""",
+                (user_id, date)
+            ).fetchall()
+
         return [m['message'] for m in messages]
+
+    def has_user_messages_on(self, user_id, date):
+        """某天是否有用户发送的消息（只判断是否存在，走 (user_id, day) 索引，不读取消息内容）"""
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                """SELECT 1 FROM ChatHistory
+                   WHERE user_id = ? AND day = ? AND sender = 'user'
+                   LIMIT 1""",
+                (user_id, date)
+            ).fetchone()
+
+        return row is not None
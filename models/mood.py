@@ -1,62 +1,76 @@
 from database.db_manager import Database
-from datetime import datetime
+from utils.dates import month_range
+from utils.serialization import rows_to_dicts
 
 class Mood:
     def __init__(self, db: Database):
         self.db = db
-    
+
     def set_mood(self, user_id, date, mood_emoji, source='manual'):
         """设置某天的心情"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # 使用 REPLACE 来更新或插入
-        cursor.execute(
-            """INSERT OR REPLACE INTO MoodCalendar 
-               (user_id, date, mood_emoji, source) 
-               VALUES (?, ?, ?, ?)""",
-            (user_id, date, mood_emoji, source)
-        )
-        
-        conn.commit()
-        conn.close()
-        
+        with self.db.get_connection() as conn:
+            # 使用 REPLACE 来更新或插入
+            conn.execute(
+                """INSERT OR REPLACE INTO MoodCalendar
+                   (user_id, date, mood_emoji, source)
+                   VALUES (?, ?, ?, ?)""",
+                (user_id, date, mood_emoji, source)
+            )
+
         return {"success": True}
-    
+
     def get_mood(self, user_id, date):
         """获取某天的心情"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT * FROM MoodCalendar WHERE user_id = ? AND date = ?",
-            (user_id, date)
-        )
-        
-        mood = cursor.fetchone()
-        conn.close()
-        
+        with self.db.get_connection() as conn:
+            mood = conn.execute(
+                "SELECT * FROM MoodCalendar WHERE user_id = ? AND date = ?",
+                (user_id, date)
+            ).fetchone()
+
         if mood:
             return dict(mood)
         return None
-    
-    def get_month_moods(self, user_id, year, month):
+
+    def month_version(self, user_id, year, month, today, job_key):
+        """
+        月度心情的版本（条件 GET 用）
+
+        除了本月的心情记录，还包括今天的心情、今天最新的聊天消息和今天的自动分析任务状态，
+        这些变化时接口需要重新执行（可能要安排新的心情分析）。
+        """
+        start, end = month_range(year, month)
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                """SELECT (SELECT COUNT(*) FROM MoodCalendar WHERE user_id = ? AND date BETWEEN ? AND ?),
+                          (SELECT MAX(id) FROM MoodCalendar WHERE user_id = ? AND date BETWEEN ? AND ?),
+                          (SELECT id FROM MoodCalendar WHERE user_id = ? AND date = ?),
+                          (SELECT MAX(id) FROM ChatHistory WHERE user_id = ? AND day = ?),
+                          (SELECT status FROM Jobs WHERE dedupe_key = ?)""",
+                (user_id, start, end, user_id, start, end, user_id, today,
+                 user_id, today, job_key)
+            ).fetchone()
+        return (today,) + tuple(row), None
+
+    def get_month_moods(self, user_id, year, month, columns=None):
         """获取某个月的所有心情记录"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # 格式化月份为 YYYY-MM
-        date_prefix = f"{year}-{month:02d}"
-        
-        cursor.execute(
-            """SELECT * FROM MoodCalendar 
-               WHERE user_id = ? 
-               AND date LIKE ? 
-               ORDER BY date""",
-            (user_id, f"{date_prefix}%")
-        )
-        
-        moods = cursor.fetchall()
-        conn.close()
-        
+        start, end = month_range(year, month)
+        return self.get_moods_between(user_id, start, end, columns)
+
+    def get_moods_between(self, user_id, start_date, end_date, columns=None):
+        """
+        获取日期区间内（含首尾）的心情记录，走 (user_id, date) 唯一索引的范围扫描
+
+        columns: 只查询这些列（调用方确定的列名）；默认返回全部列
+        """
+        with self.db.get_connection() as conn:
+            moods = conn.execute(
+                f"""SELECT {', '.join(columns) if columns else '*'} FROM MoodCalendar
+                   WHERE user_id = ?
+                   AND date BETWEEN ? AND ?
+                   ORDER BY date""",
+                (user_id, start_date, end_date)
+            ).fetchall()
+
+        if columns:
+            return rows_to_dicts(columns, moods)
         return [dict(m) for m in moods]
@@ -1,35 +1,47 @@
 from database.db_manager import Database
+from .cache import get_cache
 
 class UserProfile:
     def __init__(self, db: Database):
         self.db = db
-    
+
+    @property
+    def cache(self):
+        return get_cache(self.db)
+
     def get_profile(self, user_id):
-        """获取用户资料"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT * FROM UserProfiles WHERE user_id = ?",
-            (user_id,)
-        )
-        profile = cursor.fetchone()
-        conn.close()
-        
+        """获取用户资料（读穿透缓存）"""
+        return self.cache.get_or_load(('profile', user_id), lambda: self._load_profile(user_id))
+
+    def _load_profile(self, user_id):
+        with self.db.get_connection() as conn:
+            profile = conn.execute(
+                "SELECT * FROM UserProfiles WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+
         if profile:
             return dict(profile)
         return None
-    
-    def update_profile(self, user_id, name=None, gender=None, user_avatar_path=None, 
+
+    def profile_version(self, user_id):
+        """用户资料的版本（条件 GET 用）"""
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT id, updated_at FROM UserProfiles WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        if not row:
+            return (None, None), None
+        return (row['id'], row['updated_at']), row['updated_at']
+
+    def update_profile(self, user_id, name=None, gender=None, user_avatar_path=None,
                       date_birth=None, goal=None, self_description=None):
         """更新用户资料"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
         # 构建更新语句
         updates = []
         values = []
-        
+
         if name is not None:
             updates.append("name = ?")
             values.append(name)
@@ -48,17 +60,18 @@ class UserProfile:
         if self_description is not None:
             updates.append("self_description = ?")
             values.append(self_description)
-        
+
         if not updates:
             return {"success": False, "error": "没有要更新的字段"}
-        
-        updates.append("updated_at = CURRENT_TIMESTAMP")
+
+        # 毫秒精度：同一秒内的两次修改也能让条件 GET 的版本变化
+        updates.append("updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')")
         values.append(user_id)
-        
+
         query = f"UPDATE UserProfiles SET {', '.join(updates)} WHERE user_id = ?"
-        
-        cursor.execute(query, values)
-        conn.commit()
-        conn.close()
-        
+
+        with self.db.get_connection() as conn:
+            conn.execute(query, values)
+
+        self.cache.invalidate(('profile', user_id))
         return {"success": True}
@@ -1,51 +1,54 @@
 import sqlite3
 from database.db_manager import Database
-from werkzeug.security import generate_password_hash, check_password_hash
+from .cache import get_cache
+from extensions import password_hasher
 
 class User:
     def __init__(self, db: Database):
         self.db = db
-    
+
+    @property
+    def cache(self):
+        return get_cache(self.db)
+
     def create_user(self, email, username, password):
         """创建新用户"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
+        hashed_password = password_hasher.hash(password)
+
         try:
-            hashed_password = generate_password_hash(password)
-            cursor.execute(
-                "INSERT INTO Users (email, username, hashed_password) VALUES (?, ?, ?)",
-                (email, username, hashed_password)
-            )
-            user_id = cursor.lastrowid
-            
-            # 创建对应的用户资料记录
-            cursor.execute(
-                "INSERT INTO UserProfiles (user_id) VALUES (?)",
-                (user_id,)
-            )
-            
-            conn.commit()
+            with self.db.get_connection() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO Users (email, username, hashed_password) VALUES (?, ?, ?)",
+                    (email, username, hashed_password)
+                )
+                user_id = cursor.lastrowid
+
+                # 创建对应的用户资料记录
+                conn.execute(
+                    "INSERT INTO UserProfiles (user_id) VALUES (?)",
+                    (user_id,)
+                )
             return {"success": True, "user_id": user_id}
         except sqlite3.IntegrityError as e:
             return {"success": False, "error": "用户名或邮箱已存在"}
-        finally:
-            conn.close()
-    
+
     def verify_user(self, login_id, password):
         """验证用户登录"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # 查找用户（支持邮箱或用户名登录）
-        cursor.execute(
-            "SELECT * FROM Users WHERE email = ? OR username = ?",
-            (login_id, login_id)
-        )
-        user = cursor.fetchone()
-        conn.close()
-        
-        if user and check_password_hash(user['hashed_password'], password):
+        with self.db.get_connection() as conn:
+            # 查找用户（支持邮箱或用户名登录）
+            user = conn.execute(
+                "SELECT * FROM Users WHERE email = ? OR username = ?",
+                (login_id, login_id)
+            ).fetchone()
+
+        if user and password_hasher.verify(user['hashed_password'], password):
+            # 哈希算法或参数已调整时，用本次登录的明文重新计算并保存
+            if password_hasher.needs_rehash(user['hashed_password']):
+                with self.db.get_connection() as conn:
+                    conn.execute(
+                        "UPDATE Users SET hashed_password = ? WHERE id = ?",
+                        (password_hasher.hash(password), user['id'])
+                    )
             return {
                 "success": True,
                 "user_id": user['id'],
@@ -53,16 +56,18 @@ class User:
                 "username": user['username']
             }
         return {"success": False, "error": "用户名或密码错误"}
-    
+
     def get_user_by_id(self, user_id):
-        """根据ID获取用户信息"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, email, username FROM Users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
-        conn.close()
-        
+        """根据ID获取用户信息（读穿透缓存）"""
+        return self.cache.get_or_load(('user', user_id), lambda: self._load_user(user_id))
+
+    def _load_user(self, user_id):
+        with self.db.get_connection() as conn:
+            user = conn.execute(
+                "SELECT id, email, username FROM Users WHERE id = ?",
+                (user_id,)
+            ).fetchone()
+
         if user:
             return dict(user)
         return None
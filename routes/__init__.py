@@ -4,5 +4,7 @@ from .avatar import avatar_bp
 from .chat import chat_bp
 from .mood import mood_bp
 from .demo import demo_bp
+from .media import media_bp
+from .assets import assets_bp
 
-__all__ = ['auth_bp', 'profile_bp', 'avatar_bp', 'chat_bp', 'mood_bp', 'demo_bp']
+__all__ = ['auth_bp', 'profile_bp', 'avatar_bp', 'chat_bp', 'mood_bp', 'demo_bp', 'media_bp', 'assets_bp']
@@ -0,0 +1,22 @@
+from flask import Blueprint, abort, current_app, request
+from utils.auth import public
+from .media import IMMUTABLE_MAX_AGE
+
+assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+@assets_bp.route('/<path:filename>', methods=['GET'])
+@public
+def get_asset(filename):
+    """带内容哈希的静态资源（由 utils.assets 在启动时构建）"""
+    asset = current_app.extensions['assets'].get(filename)
+    if asset is None:
+        abort(404)
+
+    response = current_app.response_class(asset.data, mimetype=asset.mimetype)
+    # 预先压缩好的 gzip / br 内容，由压缩钩子按 Accept-Encoding 选择
+    response.compressed_variants = asset.variants
+    response.set_etag(asset.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
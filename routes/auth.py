@@ -1,84 +1,88 @@
+import math
+import os
 from flask import Blueprint, request, jsonify, session
 from models import User
-from database import Database
-import secrets
-import time
+from extensions import db, token_store
+from utils.auth import public, login_required, get_token_from_request, verify_token
+from utils.password_hasher import HasherBusy
+from utils.rate_limit import RateLimiter
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
-db = Database()
 user_model = User(db)
 
-# Token 存储（简单的内存存储，生产环境应使用 Redis）
-active_tokens = {}  # {token: {user_id, expires_at}}
+# 登录 / 注册限流（令牌桶，每分钟次数，允许同样数量的突发）
+ip_limiter = RateLimiter(
+    rate=int(os.getenv('AUTH_RATE_PER_IP', 20)) / 60,
+    burst=int(os.getenv('AUTH_RATE_PER_IP', 20))
+)
+account_limiter = RateLimiter(
+    rate=int(os.getenv('AUTH_RATE_PER_ACCOUNT', 5)) / 60,
+    burst=int(os.getenv('AUTH_RATE_PER_ACCOUNT', 5))
+)
+# 部署在反向代理（如 Render）后面时，从 X-Forwarded-For 取客户端 IP
+TRUST_PROXY_HEADERS = os.getenv('TRUST_PROXY_HEADERS', 'False') == 'True'
 
-def generate_token():
-    """生成随机 token"""
-    return secrets.token_urlsafe(32)
+def client_ip():
+    """客户端 IP"""
+    if TRUST_PROXY_HEADERS and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
 
-def verify_token(token):
-    """验证 token 并返回 user_id"""
-    if not token or token not in active_tokens:
-        return None
-    
-    token_data = active_tokens[token]
-    
-    # 检查是否过期
-    if token_data['expires_at'] < time.time():
-        del active_tokens[token]
-        return None
-    
-    return token_data['user_id']
+def too_many_attempts(retry_after):
+    response = jsonify({"success": False, "error": "尝试次数过多，请稍后再试"})
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
 
-def get_token_from_request():
-    """从请求中获取 token（支持多种方式）"""
-    # 1. 从 Authorization header
-    auth_header = request.headers.get('Authorization')
-    if auth_header and auth_header.startswith('Bearer '):
-        return auth_header.replace('Bearer ', '')
-    
-    # 2. 从请求体
-    if request.is_json:
-        token = request.get_json().get('token')
-        if token:
-            return token
-    
-    # 3. 从 URL 参数
-    token = request.args.get('token')
-    if token:
-        return token
-    
-    # 4. 向后兼容：从 session
-    user_id = session.get('user_id')
-    if user_id:
-        return f"session_{user_id}"
-    
+def rate_limited(*checks):
+    """
+    依次检查 (limiter, key)，任一超限返回 429 响应，否则返回 None
+    """
+    for limiter, key in checks:
+        allowed, retry_after = limiter.allow(key)
+        if not allowed:
+            return too_many_attempts(retry_after)
     return None
 
+def hasher_busy():
+    return jsonify({"success": False, "error": "服务繁忙，请稍后再试"}), 503
+
+def generate_token(user_id):
+    """为用户签发登录 token（有效期 24 小时）"""
+    return token_store.issue(user_id)
+
 @auth_bp.route('/register', methods=['POST'])
+@public
 def register():
     """用户注册"""
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "请求格式错误"}), 400
     
     username = data.get('username')
     password = data.get('password')
     
     if not all([username, password]):
         return jsonify({"success": False, "error": "缺少必填字段"}), 400
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({"success": False, "error": "username 和 password 必须是字符串"}), 400
+    
+    limited = rate_limited((ip_limiter, f"ip:{client_ip()}"))
+    if limited:
+        return limited
     
     # 使用用户名作为邮箱（为了兼容数据库结构）
     email = f"{username}@mindmate.local"
     
-    result = user_model.create_user(email, username, password)
+    try:
+        result = user_model.create_user(email, username, password)
+    except HasherBusy:
+        return hasher_busy()
     
     if result['success']:
         user_id = result['user_id']
         
         # 生成 token
-        token = generate_token()
-        active_tokens[token] = {
-            'user_id': user_id,
-            'expires_at': time.time() + 86400  # 24小时
-        }
+        token = generate_token(user_id)
         
         # 同时设置 session（向后兼容）
         session['user_id'] = user_id
@@ -90,27 +94,45 @@ def register():
         return jsonify(result), 400
 
 @auth_bp.route('/login', methods=['POST'])
+@public
 def login():
     """用户登录"""
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "请求格式错误"}), 400
     
     login_id = data.get('login_id')  # email 或 username
     password = data.get('password')
     
     if not all([login_id, password]):
         return jsonify({"success": False, "error": "缺少必填字段"}), 400
+    if not isinstance(login_id, str) or not isinstance(password, str):
+        return jsonify({"success": False, "error": "login_id 和 password 必须是字符串"}), 400
+    
+    limited = rate_limited((ip_limiter, f"ip:{client_ip()}"))
+    if limited:
+        return limited
+    
+    # 账号桶按 (IP, 账号) 区分，且只在密码错误时扣减：
+    # 不知道密码的人无法通过刷请求把别人的账号锁住
+    account_key = f"account:{client_ip()}:{login_id.lower()}"
+    allowed, retry_after = account_limiter.check(account_key)
+    if not allowed:
+        return too_many_attempts(retry_after)
+    
+    try:
+        result = user_model.verify_user(login_id, password)
+    except HasherBusy:
+        return hasher_busy()
     
-    result = user_model.verify_user(login_id, password)
+    if not result['success']:
+        account_limiter.allow(account_key)
     
     if result['success']:
         user_id = result['user_id']
         
         # 生成 token
-        token = generate_token()
-        active_tokens[token] = {
-            'user_id': user_id,
-            'expires_at': time.time() + 86400  # 24小时
-        }
+        token = generate_token(user_id)
         
         # 同时设置 session（向后兼容）
         session['user_id'] = user_id
@@ -122,12 +144,13 @@ def login():
         return jsonify(result), 401
 
 @auth_bp.route('/logout', methods=['POST'])
+@public
 def logout():
     """用户登出"""
-    # 获取并删除 token
+    # 获取并吊销 token
     token = get_token_from_request()
-    if token and token in active_tokens:
-        del active_tokens[token]
+    if token:
+        token_store.revoke(token)
     
     # 清除 session 中的所有数据
     session.clear()
@@ -137,6 +160,7 @@ def logout():
     return jsonify({"success": True, "message": "Logged out successfully"}), 200
 
 @auth_bp.route('/check', methods=['GET'])
+@public
 def check_auth():
     """检查用户是否已登录"""
     # 优先从 token 获取 user_id
@@ -158,39 +182,35 @@ def check_auth():
     return jsonify({"authenticated": False}), 200
 
 @auth_bp.route('/stats', methods=['GET'])
+@login_required
 def get_user_stats():
     """获取用户统计信息（仅管理员或测试使用）"""
-    from database import db_manager
-    
     try:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
+        with db.get_connection() as conn:
+            # 获取总用户数
+            total_users = conn.execute("SELECT COUNT(*) FROM Users").fetchone()[0]
+            
+            # 获取最近注册的用户（最多10个）
+            rows = conn.execute("""
+                SELECT id, username, created_at 
+                FROM Users 
+                ORDER BY created_at DESC 
+                LIMIT 10
+            """).fetchall()
         
-        # 获取总用户数
-        cursor.execute("SELECT COUNT(*) FROM Users")
-        total_users = cursor.fetchone()[0]
-        
-        # 获取最近注册的用户（最多10个）
-        cursor.execute("""
-            SELECT id, username, created_at 
-            FROM Users 
-            ORDER BY created_at DESC 
-            LIMIT 10
-        """)
         recent_users = []
-        for row in cursor.fetchall():
+        for row in rows:
             recent_users.append({
                 'id': row[0],
                 'username': row[1],
                 'created_at': row[2]
             })
         
-        conn.close()
-        
         return jsonify({
             "success": True,
             "total_users": total_users,
-            "recent_users": recent_users
+            "recent_users": recent_users,
+            "entity_cache": user_model.cache.stats()
         }), 200
         
     except Exception as e:
@@ -1,46 +1,49 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify
 from models import Avatar
-from database import Database
-from utils import save_uploaded_file
-import os
+from extensions import db
+from utils.auth import login_required, current_user_id
+from utils.http_cache import conditional
+from utils.serialization import requested_fields, project, project_one
+from utils import save_uploaded_image
 
 avatar_bp = Blueprint('avatar', __name__, url_prefix='/api/avatar')
-db = Database()
 avatar_model = Avatar(db)
 
-def login_required(f):
-    """登录验证装饰器"""
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"success": False, "error": "未登录"}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+# 返回给页面的字段（不返回 user_id 和 Persona 的 system_prompt，可用 ?fields= 进一步裁剪）
+PERSONA_FIELDS = ('id', 'name', 'description')
+AVATAR_FIELDS = (
+    'id', 'avatar_name', 'appearance_type', 'custom_image_path', 'image_urls',
+    'persona_id', 'persona_name', 'description', 'custom_persona', 'created_at', 'updated_at'
+)
 
+# 预设 Persona 只随部署变化，浏览器可以直接缓存 10 分钟
 @avatar_bp.route('/personas', methods=['GET'])
 @login_required
+@conditional(avatar_model.personas_version, max_age=600)
 def get_personas():
     """获取所有预设的 Persona"""
     personas = avatar_model.get_personas()
-    return jsonify({"success": True, "personas": personas}), 200
+    return jsonify({"success": True, "personas": project(personas, requested_fields(PERSONA_FIELDS))}), 200
 
 @avatar_bp.route('/list', methods=['GET'])
 @login_required
+@conditional(avatar_model.avatars_version)
 def get_all_avatars():
     """获取用户的所有 Avatar 列表"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     avatars = avatar_model.get_all_avatars(user_id)
-    return jsonify({"success": True, "avatars": avatars}), 200
+    return jsonify({"success": True, "avatars": project(avatars, requested_fields(AVATAR_FIELDS))}), 200
 
 @avatar_bp.route('/<int:avatar_id>', methods=['GET'])
 @login_required
+@conditional(lambda user_id: avatar_model.avatar_version(request.view_args['avatar_id'], user_id))
 def get_avatar_by_id(avatar_id):
     """根据 ID 获取特定 Avatar"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     avatar = avatar_model.get_avatar_by_id(avatar_id, user_id)
     
     if avatar:
-        return jsonify({"success": True, "avatar": avatar}), 200
+        return jsonify({"success": True, "avatar": project_one(avatar, requested_fields(AVATAR_FIELDS))}), 200
     else:
         return jsonify({"success": False, "error": "Avatar 不存在"}), 404
 
@@ -48,11 +51,11 @@ def get_avatar_by_id(avatar_id):
 @login_required
 def get_avatar():
     """获取用户的默认 Avatar（兼容旧 API）"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     avatar = avatar_model.get_avatar(user_id)
     
     if avatar:
-        return jsonify({"success": True, "avatar": avatar}), 200
+        return jsonify({"success": True, "avatar": project_one(avatar, requested_fields(AVATAR_FIELDS))}), 200
     else:
         return jsonify({"success": False, "error": "尚未配置 Avatar"}), 404
 
@@ -60,7 +63,7 @@ def get_avatar():
 @login_required
 def create_avatar():
     """创建新的 Avatar"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     
     avatar_name = request.form.get('avatar_name')
     appearance_type = request.form.get('appearance_type')
@@ -81,8 +84,7 @@ def create_avatar():
         image_file = request.files['custom_image']
         if image_file and image_file.filename:
             try:
-                upload_folder = os.path.join('static', 'uploads', 'avatar_images')
-                custom_image_path = save_uploaded_file(image_file, upload_folder, f'avatar_{user_id}')
+                custom_image_path = save_uploaded_image(image_file)
                 print(f"[DEBUG] 文件上传成功: {custom_image_path}")
             except Exception as e:
                 print(f"[WARNING] 文件上传失败: {e}")
@@ -114,7 +116,7 @@ def create_avatar():
 @login_required
 def update_avatar(avatar_id):
     """更新 Avatar"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     
     avatar_name = request.form.get('avatar_name')
     appearance_type = request.form.get('appearance_type')
@@ -128,8 +130,7 @@ def update_avatar(avatar_id):
         image_file = request.files['custom_image']
         if image_file and image_file.filename:
             try:
-                upload_folder = os.path.join('static', 'uploads', 'avatar_images')
-                custom_image_path = save_uploaded_file(image_file, upload_folder, f'avatar_{avatar_id}')
+                custom_image_path = save_uploaded_image(image_file)
             except Exception as e:
                 print(f"文件上传失败: {e}")
                 # 上传失败不影响更新
@@ -150,7 +151,7 @@ def update_avatar(avatar_id):
 @login_required
 def delete_avatar(avatar_id):
     """删除 Avatar"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     result = avatar_model.delete_avatar(avatar_id, user_id)
     return jsonify(result), 200
 
@@ -158,7 +159,7 @@ def delete_avatar(avatar_id):
 @login_required
 def save_avatar():
     """保存或更新用户的 Avatar（兼容旧 API）"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     
     appearance_type = request.form.get('appearance_type')
     persona_id = request.form.get('persona_id')
@@ -173,8 +174,7 @@ def save_avatar():
     if 'custom_image' in request.files:
         image_file = request.files['custom_image']
         if image_file and image_file.filename:
-            upload_folder = os.path.join('static', 'uploads', 'avatar_images')
-            custom_image_path = save_uploaded_file(image_file, upload_folder, f'avatar_{user_id}')
+            custom_image_path = save_uploaded_image(image_file)
     
     result = avatar_model.create_or_update_avatar(
         user_id,
@@ -1,62 +1,83 @@
-from flask import Blueprint, request, jsonify, session
-from models import Chat, UserProfile, Avatar
-from database import Database
-from utils import GPTService
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from models import Chat
+from extensions import db, gpt_service
+from utils.auth import login_required, current_user_id
+from utils.http_cache import conditional
+from utils.serialization import requested_fields
+import json
 
 chat_bp = Blueprint('chat', __name__, url_prefix='/api/chat')
-db = Database()
 chat_model = Chat(db)
-profile_model = UserProfile(db)
-avatar_model = Avatar(db)
-gpt_service = GPTService()
 
-def login_required(f):
-    """登录验证装饰器"""
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"success": False, "error": "未登录"}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+MAX_HISTORY_PAGE_SIZE = 200
+# 历史消息返回的字段（不返回 user_id / avatar_id，可用 ?fields= 进一步裁剪）
+HISTORY_FIELDS = ('id', 'sender', 'message', 'timestamp')
+# 生成回复时读取的历史条数上限，实际发送多少由 GPTService 的 token 预算决定
+CHAT_CONTEXT_HISTORY_LIMIT = 50
+
+def history_version(user_id):
+    return chat_model.history_version(
+        user_id,
+        request.args.get('avatar_id', type=int),
+        before_id=request.args.get('before_id', type=int)
+    )
 
 @chat_bp.route('/history', methods=['GET'])
 @login_required
+@conditional(history_version)
 def get_history():
-    """获取聊天历史（可按 avatar_id 过滤）"""
-    user_id = session['user_id']
-    limit = request.args.get('limit', 50, type=int)
+    """
+    获取聊天历史（可按 avatar_id 过滤）
+    
+    支持游标分页：
+    - before_id: 加载比该消息更早的一页
+    - after_id: 只加载该消息之后的新消息
+    """
+    user_id = current_user_id()
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_HISTORY_PAGE_SIZE)
     avatar_id = request.args.get('avatar_id', type=int)  # 可选的 avatar_id 参数
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
     
-    history = chat_model.get_chat_history(user_id, avatar_id, limit)
-    return jsonify({"success": True, "history": history}), 200
+    # 多取一条用于判断是否还有更多
+    history = chat_model.get_chat_history(
+        user_id, avatar_id, limit + 1, before_id=before_id, after_id=after_id,
+        columns=requested_fields(HISTORY_FIELDS)
+    )
+    has_more = len(history) > limit
+    if has_more:
+        # 向后拉取时多出来的是最新的一条，向前翻页时多出来的是最早的一条
+        history = history[:limit] if after_id else history[1:]
+    
+    return jsonify({"success": True, "history": history, "has_more": has_more}), 200
 
-@chat_bp.route('/send', methods=['POST'])
-@login_required
-def send_message():
-    """发送消息并获取 AI 回复"""
-    user_id = session['user_id']
-    data = request.get_json()
+def prepare_chat_turn(user_id, data):
+    """
+    校验请求并在一个读事务中加载生成回复所需的上下文
     
+    用户消息不在这里保存，而是在回复生成后与 AI 回复一起写入（见 finish_chat_turn）。
+    
+    Returns:
+        (error_response, turn)：校验失败时 error_response 为 (json, status)，否则 turn 为上下文字典
+    """
     user_message = data.get('message')
     avatar_id = data.get('avatar_id')  # 获取 avatar_id 参数
     
     if not user_message:
-        return jsonify({"success": False, "error": "消息不能为空"}), 400
+        return (jsonify({"success": False, "error": "消息不能为空"}), 400), None
     
     if not avatar_id:
-        return jsonify({"success": False, "error": "请指定 Avatar"}), 400
-    
-    # 获取 Avatar 配置
-    avatar = avatar_model.get_avatar_by_id(avatar_id, user_id)
+        return (jsonify({"success": False, "error": "请指定 Avatar"}), 400), None
     
-    if not avatar:
-        return jsonify({"success": False, "error": "Avatar 不存在或无权限"}), 400
+    # Avatar + Persona、用户资料、该 Avatar 的聊天历史
+    context = chat_model.get_turn_context(user_id, avatar_id, history_limit=CHAT_CONTEXT_HISTORY_LIMIT)
     
-    # 保存用户消息
-    chat_model.save_message(user_id, avatar_id, 'user', user_message)
+    if not context:
+        return (jsonify({"success": False, "error": "Avatar 不存在或无权限"}), 400), None
     
-    # 获取用户资料
-    user_profile = profile_model.get_profile(user_id)
+    avatar = context['avatar']
+    avatar_id = avatar['id']
+    user_profile = context['profile']
     
     # 确定使用的系统提示
     if avatar['persona_id'] == 5 and avatar['custom_persona']:  # User-defined
@@ -64,37 +85,112 @@ def send_message():
     else:
         system_prompt = avatar['system_prompt']
     
-    # 获取聊天历史（只获取该 Avatar 的历史）
-    chat_history = chat_model.get_chat_history(user_id, avatar_id, limit=10)
+    return None, {
+        "user_id": user_id,
+        "avatar_id": avatar_id,
+        "user_message": user_message,
+        "system_prompt": system_prompt,
+        "user_profile": user_profile,
+        "chat_history": context['history'],
+        # 系统提示前缀的缓存键：Avatar 或资料修改后 updated_at 变化，自动重新拼接
+        "prompt_cache_key": (
+            avatar_id,
+            avatar.get('updated_at'),
+            user_profile.get('updated_at') if user_profile else None
+        )
+    }
+
+def finish_chat_turn(turn, ai_message, usage=None):
+    """在一个写事务中保存用户消息和 AI 回复，返回给前端的结果（/send 的响应体、/stream 的 done 事件）"""
+    saved = chat_model.save_turn(turn['user_id'], turn['avatar_id'], turn['user_message'], ai_message)
+    
+    result = {
+        "success": True,  # API 失败时也返回 True，让前端正常显示
+        "user_message": turn['user_message'],
+        "ai_message": ai_message,
+        "user_message_id": saved['user_message_id'],
+        "ai_message_id": saved['ai_message_id']
+    }
+    if usage:
+        result["usage"] = usage  # token 用量（含命中前缀缓存的 token 数）
+    return result
+
+@chat_bp.route('/send', methods=['POST'])
+@login_required
+def send_message():
+    """发送消息并获取 AI 回复"""
+    user_id = current_user_id()
+    error, turn = prepare_chat_turn(user_id, request.get_json())
+    if error:
+        return error
     
     # 生成 AI 回复
     response = gpt_service.generate_response(
-        user_message,
-        chat_history,
-        system_prompt,
-        user_profile
+        turn['user_message'],
+        turn['chat_history'],
+        turn['system_prompt'],
+        turn['user_profile'],
+        turn['prompt_cache_key']
     )
     
     if response['success']:
         ai_message = response['message']
-        
-        # 保存 AI 回复
-        chat_model.save_message(user_id, avatar_id, 'ai', ai_message)
-        
-        return jsonify({
-            "success": True,
-            "user_message": user_message,
-            "ai_message": ai_message
-        }), 200
     else:
-        # API 调用失败，但还是返回一个友好的回复
-        error_message = response.get('message', response.get('error', '抱歉，我现在无法回复。'))
+        # API 调用失败，但还是返回一个友好的回复（保存错误消息让用户看到）
+        ai_message = response.get('message', response.get('error', '抱歉，我现在无法回复。'))
+    
+    return jsonify(finish_chat_turn(turn, ai_message, response.get('usage'))), 200
+
+def sse_event(data, event=None):
+    """格式化一条 Server-Sent Event"""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+@chat_bp.route('/stream', methods=['POST'])
+@login_required
+def stream_message():
+    """
+    发送消息并以 Server-Sent Events 流式返回 AI 回复
+    
+    事件格式：
+    - event: start                      开始生成
+    - data: {"delta": "..."}            逐段回复文本
+    - event: done / data: {...}         结束，包含最终回复和消息 id
+    """
+    user_id = current_user_id()
+    error, turn = prepare_chat_turn(user_id, request.get_json())
+    if error:
+        return error
+    
+    def generate():
+        yield sse_event({"success": True}, event='start')
         
-        # 保存错误消息（让用户看到）
-        chat_model.save_message(user_id, avatar_id, 'ai', error_message)
+        parts = []
+        try:
+            for delta in gpt_service.stream_response(
+                turn['user_message'],
+                turn['chat_history'],
+                turn['system_prompt'],
+                turn['user_profile'],
+                turn['prompt_cache_key']
+            ):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except GeneratorExit:
+            # 客户端中途断开：仍然保存用户消息和已生成的部分回复（没有人等待结果，不必等提交）
+            chat_model.save_turn(turn['user_id'], turn['avatar_id'], turn['user_message'], "".join(parts), wait=False)
+            raise
         
-        return jsonify({
-            "success": True,  # 改为 True，让前端正常显示
-            "user_message": user_message,
-            "ai_message": error_message
-        }), 200
+        # 流结束后只保存一次完整的一轮对话
+        yield sse_event(finish_chat_turn(turn, "".join(parts)), event='done')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # 关闭反向代理缓冲，保证逐段送达
+        }
+    )
@@ -1,57 +1,66 @@
 from flask import Blueprint, jsonify, session
-from database import Database
-from models import User
+from models import User, UserProfile, Avatar
+from extensions import db, image_store
+from utils.auth import public
 
 demo_bp = Blueprint('demo', __name__, url_prefix='/api/demo')
-db = Database()
 user_model = User(db)
+profile_model = UserProfile(db)
+avatar_model = Avatar(db)
 
 DEMO_USERNAME = 'test'
 DEMO_EMAIL = 'test@mindmate.demo'
 DEMO_PASSWORD = 'test'
 
 @demo_bp.route('/clear', methods=['POST'])
+@public
 def clear_demo_data():
     """清空 demo 测试账号的所有数据"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # 查找 demo 用户
-        cursor.execute("SELECT id FROM Users WHERE username = ? OR email = ?", 
-                      (DEMO_USERNAME, DEMO_EMAIL))
-        user = cursor.fetchone()
+        with db.get_connection() as conn:
+            # 查找 demo 用户
+            user = conn.execute("SELECT id FROM Users WHERE username = ? OR email = ?", 
+                                (DEMO_USERNAME, DEMO_EMAIL)).fetchone()
+            
+            if user:
+                user_id = user['id']
+                print(f"[DEMO] 清空用户 {DEMO_USERNAME} (ID: {user_id}) 的数据")
+                
+                avatar_rows = conn.execute(
+                    "SELECT id, custom_image_path FROM Avatars WHERE user_id = ?", (user_id,)
+                ).fetchall()
+                avatar_ids = [row['id'] for row in avatar_rows]
+                image_paths = [row['custom_image_path'] for row in avatar_rows]
+                
+                # 1. 删除聊天记录
+                deleted_chats = conn.execute("DELETE FROM ChatHistory WHERE user_id = ?", (user_id,)).rowcount
+                
+                # 2. 删除 Avatars
+                deleted_avatars = conn.execute("DELETE FROM Avatars WHERE user_id = ?", (user_id,)).rowcount
+                for path in image_paths:
+                    image_store.release(path)
+                
+                # 3. 删除心情记录
+                deleted_moods = conn.execute("DELETE FROM MoodCalendar WHERE user_id = ?", (user_id,)).rowcount
+                
+                # 4. 清空用户资料（保留基本信息），同时更新 updated_at，资料接口的 ETag 随之变化
+                conn.execute("""
+                    UPDATE UserProfiles 
+                    SET name = NULL, 
+                        gender = NULL, 
+                        user_avatar_path = NULL, 
+                        date_birth = NULL, 
+                        goal = NULL, 
+                        self_description = NULL,
+                        updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+                    WHERE user_id = ?
+                """, (user_id,))
         
         if user:
-            user_id = user['id']
-            print(f"[DEMO] 清空用户 {DEMO_USERNAME} (ID: {user_id}) 的数据")
-            
-            # 1. 删除聊天记录
-            cursor.execute("DELETE FROM ChatHistory WHERE user_id = ?", (user_id,))
-            deleted_chats = cursor.rowcount
-            
-            # 2. 删除 Avatars
-            cursor.execute("DELETE FROM Avatars WHERE user_id = ?", (user_id,))
-            deleted_avatars = cursor.rowcount
-            
-            # 3. 删除心情记录
-            cursor.execute("DELETE FROM MoodCalendar WHERE user_id = ?", (user_id,))
-            deleted_moods = cursor.rowcount
-            
-            # 4. 清空用户资料（保留基本信息）
-            cursor.execute("""
-                UPDATE UserProfiles 
-                SET name = NULL, 
-                    gender = NULL, 
-                    user_avatar_path = NULL, 
-                    date_birth = NULL, 
-                    goal = NULL, 
-                    self_description = NULL
-                WHERE user_id = ?
-            """, (user_id,))
-            
-            conn.commit()
-            conn.close()
+            # 清除该用户的资料和 Avatar 缓存
+            profile_model.cache.invalidate(('profile', user['id']))
+            avatar_model.invalidate(user['id'], *avatar_ids)
+            image_store.collect(*image_paths)
             
             print(f"[DEMO] 已清空: {deleted_chats} 条聊天, {deleted_avatars} 个 Avatar, {deleted_moods} 条心情记录")
             
@@ -88,30 +97,22 @@ def clear_demo_data():
         }), 500
 
 @demo_bp.route('/status', methods=['GET'])
+@public
 def demo_status():
     """检查 demo 账号状态"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM Users WHERE username = ?", (DEMO_USERNAME,))
-        user = cursor.fetchone()
+        with db.get_connection() as conn:
+            user = conn.execute("SELECT id FROM Users WHERE username = ?", (DEMO_USERNAME,)).fetchone()
+            
+            if user:
+                user_id = user['id']
+                
+                # 统计数据
+                avatar_count = conn.execute("SELECT COUNT(*) as count FROM Avatars WHERE user_id = ?", (user_id,)).fetchone()['count']
+                chat_count = conn.execute("SELECT COUNT(*) as count FROM ChatHistory WHERE user_id = ?", (user_id,)).fetchone()['count']
+                mood_count = conn.execute("SELECT COUNT(*) as count FROM MoodCalendar WHERE user_id = ?", (user_id,)).fetchone()['count']
         
         if user:
-            user_id = user['id']
-            
-            # 统计数据
-            cursor.execute("SELECT COUNT(*) as count FROM Avatars WHERE user_id = ?", (user_id,))
-            avatar_count = cursor.fetchone()['count']
-            
-            cursor.execute("SELECT COUNT(*) as count FROM ChatHistory WHERE user_id = ?", (user_id,))
-            chat_count = cursor.fetchone()['count']
-            
-            cursor.execute("SELECT COUNT(*) as count FROM MoodCalendar WHERE user_id = ?", (user_id,))
-            mood_count = cursor.fetchone()['count']
-            
-            conn.close()
-            
             return jsonify({
                 "success": True,
                 "exists": True,
@@ -122,7 +123,6 @@ def demo_status():
                 }
             }), 200
         else:
-            conn.close()
             return jsonify({
                 "success": True,
                 "exists": False
@@ -0,0 +1,24 @@
+import os
+from flask import Blueprint, send_from_directory
+from extensions import image_store
+from utils.auth import public
+from utils.image_store import IMAGE_DIR
+
+media_bp = Blueprint('media', __name__, url_prefix='/media')
+
+# 内容寻址的文件永不修改，浏览器缓存一年且不再重新验证
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+@media_bp.route(f'/{IMAGE_DIR}/<path:filename>', methods=['GET'])
+@public
+def get_image(filename):
+    """按内容寻址的图片（原图和各尺寸变体）"""
+    # 文件名由内容哈希（和尺寸）决定，直接用作强 ETag
+    etag = os.path.basename(filename)
+    # 图片按当前工作目录写入（与 static/uploads 一致），这里转成绝对路径
+    response = send_from_directory(
+        os.path.abspath(image_store.file_path(IMAGE_DIR)), filename, max_age=IMMUTABLE_MAX_AGE, etag=etag
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
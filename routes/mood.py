@@ -1,29 +1,46 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify
 from models import Mood, Chat
-from database import Database
-from utils import GPTService
-from datetime import datetime
+from extensions import db, gpt_service, job_queue
+from utils.auth import login_required, current_user_id
+from utils.http_cache import conditional
+from utils.serialization import requested_fields, project, project_one
+from utils import dates
+from utils.job_queue import job_handler
 
 mood_bp = Blueprint('mood', __name__, url_prefix='/api/mood')
-db = Database()
 mood_model = Mood(db)
 chat_model = Chat(db)
-gpt_service = GPTService()
 
-def login_required(f):
-    """登录验证装饰器"""
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"success": False, "error": "未登录"}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+# 心情记录返回的字段（可用 ?fields= 进一步裁剪）
+MOOD_FIELDS = ('date', 'mood_emoji', 'source')
+
+def mood_job_key(user_id, date):
+    """心情分析任务的去重键：每个用户每天最多一个任务"""
+    return f"mood:{user_id}:{date}"
+
+@job_handler('mood_analysis')
+def analyze_mood_job(payload):
+    """后台任务：分析某用户某天的聊天内容并保存心情"""
+    user_id = payload['user_id']
+    date = payload['date']
+    
+    # 排队期间用户可能已经手动设置了心情，不覆盖
+    if mood_model.get_mood(user_id, date):
+        return
+    
+    messages = chat_model.get_recent_messages_for_mood(user_id, date)
+    if not messages:
+        return
+    
+    # 模型调用失败时抛出异常：任务按 max_attempts 重试，最终标记为 failed，不保存默认心情
+    mood_emoji = gpt_service.classify_mood(" ".join(messages))
+    mood_model.set_mood(user_id, date, mood_emoji, source='auto')
 
 @mood_bp.route('/set', methods=['POST'])
 @login_required
 def set_mood():
     """手动设置心情"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     data = request.get_json()
     
     date = data.get('date')
@@ -39,10 +56,10 @@ def set_mood():
 @login_required
 def auto_analyze_mood():
     """自动分析聊天内容并设置心情"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     data = request.get_json()
     
-    date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
+    date = data.get('date', dates.today())
     
     # 获取当天的聊天消息
     messages = chat_model.get_recent_messages_for_mood(user_id, date)
@@ -72,7 +89,7 @@ def auto_analyze_mood():
 @login_required
 def get_mood():
     """获取某天的心情"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     date = request.args.get('date')
     
     if not date:
@@ -81,48 +98,74 @@ def get_mood():
     mood = mood_model.get_mood(user_id, date)
     
     if mood:
-        return jsonify({"success": True, "mood": mood}), 200
+        return jsonify({"success": True, "mood": project_one(mood, MOOD_FIELDS)}), 200
     else:
         return jsonify({"success": False, "error": "当天没有心情记录"}), 404
 
-@mood_bp.route('/month', methods=['GET'])
-@login_required
-def get_month_moods():
-    """获取某个月的所有心情，并自动分析今天的心情"""
-    user_id = session['user_id']
+def month_args():
+    """请求中的年月（默认当前月份）"""
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
     
     if not year or not month:
-        # 默认使用当前月份
-        now = datetime.now()
+        now = dates.now()
         year = now.year
         month = now.month
+    return year, month
+
+def month_version(user_id):
+    year, month = month_args()
+    today = dates.today()
+    return mood_model.month_version(user_id, year, month, today, mood_job_key(user_id, today))
+
+@mood_bp.route('/month', methods=['GET'])
+@login_required
+@conditional(month_version)
+def get_month_moods():
+    """获取某个月的所有心情，并自动分析今天的心情"""
+    user_id = current_user_id()
+    year, month = month_args()
+    fields = requested_fields(MOOD_FIELDS)
     
-    moods = mood_model.get_month_moods(user_id, year, month)
-    
-    # 自动分析今天的心情（如果今天还没有记录）
-    today = datetime.now().strftime('%Y-%m-%d')
-    today_has_mood = any(m['date'] == today for m in moods)
-    
-    if not today_has_mood:
-        # 尝试自动分析今天的心情
-        messages = chat_model.get_recent_messages_for_mood(user_id, today)
-        
-        if messages and len(messages) > 0:
-            # 有聊天记录，分析心情
-            combined_text = " ".join(messages)
-            mood_emoji = gpt_service.analyze_mood_from_text(combined_text)
-            
-            # 保存心情
-            mood_model.set_mood(user_id, today, mood_emoji, source='auto')
-            
-            # 重新加载心情数据
-            moods = mood_model.get_month_moods(user_id, year, month)
+    moods = mood_model.get_month_moods(user_id, year, month, columns=MOOD_FIELDS)
+    
+    # 自动分析今天的心情（如果今天还没有记录）：放入后台队列，立即返回
+    today = dates.today()
+    if today.startswith(f"{year}-{month:02d}"):
+        today_has_mood = any(m['date'] == today for m in moods)
+    else:
+        today_has_mood = mood_model.get_mood(user_id, today) is not None
+    pending = None
+    
+    if not today_has_mood and chat_model.has_user_messages_on(user_id, today):
+        job = job_queue.enqueue(
+            'mood_analysis',
+            {"user_id": user_id, "date": today},
+            dedupe_key=mood_job_key(user_id, today)
+        )
+        pending = {"date": today, "status": job['status']}
     
     return jsonify({
         "success": True,
         "year": year,
         "month": month,
-        "moods": moods
+        "moods": moods if fields == MOOD_FIELDS else project(moods, fields),
+        "pending": pending
+    }), 200
+
+@mood_bp.route('/analysis-status', methods=['GET'])
+@login_required
+def get_analysis_status():
+    """查询某天自动心情分析的进度（供日历页面轮询）"""
+    user_id = current_user_id()
+    date = request.args.get('date', dates.today())
+    
+    job = job_queue.get_status(mood_job_key(user_id, date))
+    mood = mood_model.get_mood(user_id, date)
+    
+    return jsonify({
+        "success": True,
+        "date": date,
+        "status": job['status'] if job else None,
+        "mood": project_one(mood, MOOD_FIELDS)
     }), 200
@@ -1,27 +1,19 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify
 from models import UserProfile
-from database import Database
-from utils import save_uploaded_file
+from extensions import db
+from utils.auth import login_required, current_user_id
+from utils.http_cache import conditional
 import os
 
 profile_bp = Blueprint('profile', __name__, url_prefix='/api/profile')
-db = Database()
 profile_model = UserProfile(db)
 
-def login_required(f):
-    """登录验证装饰器"""
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"success": False, "error": "未登录"}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @profile_bp.route('/', methods=['GET'])
 @login_required
+@conditional(profile_model.profile_version)
 def get_profile():
     """获取用户资料"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     profile = profile_model.get_profile(user_id)
     
     if profile:
@@ -33,7 +25,7 @@ def get_profile():
 @login_required
 def update_profile():
     """更新用户资料"""
-    user_id = session['user_id']
+    user_id = current_user_id()
     
     # 处理表单数据
     name = request.form.get('name')
@@ -43,7 +43,8 @@ def init_database():
     """初始化数据库"""
     try:
         from database import Database
-        db = Database()
+        db = Database(os.getenv('DATABASE_PATH', 'mindmate.db'))
+        db.init_db()
         print("✓ 数据库初始化成功")
         return True
     except Exception as e:
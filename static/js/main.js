@@ -25,6 +25,14 @@ window.fetchWithAuth = async (url, options = {}) => {
     });
 };
 
+// 上传图片的缩略图在后台生成，尚未生成时回退到原图（data-fallback）
+window.imageFallback = function(img) {
+    img.onerror = null;
+    if (img.dataset.fallback) {
+        img.src = img.dataset.fallback;
+    }
+};
+
 // 向后兼容的函数
 window.fetchWithCredentials = window.fetchWithAuth;
 
@@ -0,0 +1,102 @@
+let personas = [];
+
+// 加载 Personas
+async function loadPersonas() {
+    try {
+        const response = await fetch('/api/avatar/personas');
+        const data = await response.json();
+
+        if (data.success) {
+            personas = data.personas;
+            renderPersonas();
+        }
+    } catch (error) {
+        console.error('加载 Personas 失败:', error);
+    }
+}
+
+function renderPersonas() {
+    const container = document.getElementById('personasList');
+    container.innerHTML = personas.map(p => `
+        <label class="persona-option">
+            <input type="radio" name="persona_id" value="${p.id}" required>
+            <div class="option-card">
+                <h3>${p.name}</h3>
+                <p>${p.description}</p>
+            </div>
+        </label>
+    `).join('');
+
+    // 监听 Persona 选择
+    document.querySelectorAll('input[name="persona_id"]').forEach(radio => {
+        radio.addEventListener('change', (e) => {
+            const personaId = parseInt(e.target.value);
+            const isUserDefined = personas.find(p => p.id === personaId && p.name === 'User-defined');
+            document.getElementById('customPersonaInput').style.display = isUserDefined ? 'block' : 'none';
+        });
+    });
+}
+
+// 监听外观类型选择
+document.querySelectorAll('input[name="appearance_type"]').forEach(radio => {
+    radio.addEventListener('change', (e) => {
+        const uploadSection = document.getElementById('customImageUpload');
+        uploadSection.style.display = e.target.value === 'custom' ? 'block' : 'none';
+    });
+});
+
+// Avatar 头像预览
+document.getElementById('custom_image').addEventListener('change', (e) => {
+    const file = e.target.files[0];
+    if (file) {
+        const reader = new FileReader();
+        reader.onload = (e) => {
+            document.getElementById('avatarPreview').src = e.target.result;
+        };
+        reader.readAsDataURL(file);
+    }
+});
+
+// 提交表单
+document.getElementById('avatarForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const submitBtn = e.target.querySelector('button[type="submit"]');
+    const originalText = submitBtn.textContent;
+    submitBtn.textContent = '保存中...';
+    submitBtn.disabled = true;
+
+    const formData = new FormData(e.target);
+
+    try {
+        const response = await fetch('/api/avatar/', {
+            method: 'POST',
+            body: formData
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            showMessage('✅ Avatar 配置成功！正在跳转...', 'success');
+            setTimeout(() => {
+                window.location.href = '/chat';
+            }, 1500);
+        } else {
+            showMessage('❌ ' + (data.error || '配置失败'), 'error');
+            submitBtn.textContent = originalText;
+            submitBtn.disabled = false;
+        }
+    } catch (error) {
+        showMessage('❌ 网络错误，请重试', 'error');
+        submitBtn.textContent = originalText;
+        submitBtn.disabled = false;
+    }
+});
+
+function showMessage(text, type) {
+    const messageEl = document.getElementById('message');
+    messageEl.textContent = text;
+    messageEl.className = 'message ' + type;
+}
+
+loadPersonas();
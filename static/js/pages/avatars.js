@@ -0,0 +1,264 @@
+let personas = [];
+let avatars = [];
+let editingAvatarId = null;
+
+// 页面加载时初始化
+document.addEventListener('DOMContentLoaded', async () => {
+    await loadPersonas();
+    await loadAvatars();
+    setupEventListeners();
+});
+
+// 加载所有 Persona
+async function loadPersonas() {
+    try {
+        const response = await fetch('/api/avatar/personas');
+        const data = await response.json();
+
+        if (data.success) {
+            personas = data.personas;
+            populatePersonaSelect();
+        }
+    } catch (error) {
+        console.error('加载 Persona 失败:', error);
+    }
+}
+
+// 填充 Persona 下拉框
+function populatePersonaSelect() {
+    const select = document.getElementById('personaSelect');
+    select.innerHTML = '<option value="">-- Select Personality --</option>';
+
+    personas.forEach(persona => {
+        const option = document.createElement('option');
+        option.value = persona.id;
+        option.textContent = `${persona.name} - ${persona.description}`;
+        select.appendChild(option);
+    });
+}
+
+// 加载所有 Avatar
+async function loadAvatars() {
+    try {
+        const response = await fetch('/api/avatar/list');
+        const data = await response.json();
+
+        if (data.success) {
+            avatars = data.avatars;
+            renderAvatars();
+        }
+    } catch (error) {
+        console.error('加载 Avatar 列表失败:', error);
+    }
+}
+
+// 渲染 Avatar 列表
+function renderAvatars() {
+    const container = document.getElementById('avatarsList');
+
+    if (avatars.length === 0) {
+        container.innerHTML = `
+            <div class="empty-state">
+                <div class="icon">🤖</div>
+                <h3>No Avatars Yet</h3>
+                <p>Click the button below to create your first AI companion!</p>
+            </div>
+        `;
+        return;
+    }
+
+    container.innerHTML = avatars.map(avatar => `
+        <div class="avatar-card" data-id="${avatar.id}">
+            <div class="avatar-card-header">
+                <img src="${getAvatarImage(avatar)}" data-fallback="${getAvatarImage(avatar, 'original')}" onerror="imageFallback(this)" alt="${avatar.avatar_name}" class="avatar-image">
+                <div class="avatar-info">
+                    <h3>${avatar.avatar_name}</h3>
+                    <span class="persona-tag">${avatar.persona_name}</span>
+                </div>
+            </div>
+            <div class="avatar-description">
+                ${avatar.description || '这是我的 AI 伙伴'}
+            </div>
+            <div class="avatar-actions">
+                <button class="btn-chat" onclick="chatWithAvatar(${avatar.id})">💬 Chat</button>
+                <button class="btn-edit" onclick="editAvatar(${avatar.id})">✏️ Edit</button>
+                <button class="btn-delete" onclick="deleteAvatar(${avatar.id})">🗑️ Delete</button>
+            </div>
+        </div>
+    `).join('');
+}
+
+// 获取 Avatar 图片 URL
+function getAvatarImage(avatar, size = 'medium') {
+    if (avatar.appearance_type === 'custom' && avatar.image_urls) {
+        return avatar.image_urls[size];
+    } else if (avatar.appearance_type === 'custom' && avatar.custom_image_path) {
+        let path = avatar.custom_image_path.trim();
+        if (path.startsWith('avatar_images/')) {
+            path = 'static/uploads/' + path;
+        } else if (!path.startsWith('static/')) {
+            path = 'static/uploads/' + path;
+        }
+        if (!path.startsWith('/')) {
+            path = '/' + path;
+        }
+        return path;
+    } else if (avatar.appearance_type === 'q_character') {
+        return '/static/images/q-character-avatar.svg';
+    } else if (avatar.appearance_type === 'cute_animal') {
+        return '/static/images/cute-animal-avatar.svg';
+    }
+    return '/static/images/default-avatar.png';
+}
+
+// 显示创建模态框
+function showCreateModal() {
+    editingAvatarId = null;
+    document.getElementById('modalTitle').textContent = 'Create New Avatar';
+    document.getElementById('avatarForm').reset();
+    document.getElementById('editAvatarId').value = '';
+    document.getElementById('avatarModal').style.display = 'flex';
+}
+
+// 关闭模态框
+function closeModal() {
+    document.getElementById('avatarModal').style.display = 'none';
+}
+
+// 编辑 Avatar
+function editAvatar(avatarId) {
+    const avatar = avatars.find(a => a.id === avatarId);
+    if (!avatar) return;
+
+    editingAvatarId = avatarId;
+    document.getElementById('modalTitle').textContent = 'Edit Avatar';
+    document.getElementById('editAvatarId').value = avatarId;
+    document.getElementById('avatarName').value = avatar.avatar_name;
+    document.querySelector(`input[name="appearance_type"][value="${avatar.appearance_type}"]`).checked = true;
+    document.getElementById('personaSelect').value = avatar.persona_id;
+
+    if (avatar.custom_persona) {
+        document.getElementById('customPersona').value = avatar.custom_persona;
+    }
+
+    // 触发外观类型变化事件
+    updateAppearanceVisibility();
+    updatePersonaVisibility();
+
+    document.getElementById('avatarModal').style.display = 'flex';
+}
+
+// 删除 Avatar
+async function deleteAvatar(avatarId) {
+    if (!confirm('Are you sure you want to delete this Avatar? Related chat history will also be deleted.')) {
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/avatar/${avatarId}`, {
+            method: 'DELETE'
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            alert('Avatar 已删除！');
+            await loadAvatars();
+        } else {
+            alert('删除失败: ' + data.error);
+        }
+    } catch (error) {
+        console.error('删除 Avatar 失败:', error);
+        alert('删除失败，请重试');
+    }
+}
+
+// 与 Avatar 聊天
+function chatWithAvatar(avatarId) {
+    window.location.href = `/chat?avatar_id=${avatarId}`;
+}
+
+// 设置事件监听器
+function setupEventListeners() {
+    // 外观类型变化
+    document.querySelectorAll('input[name="appearance_type"]').forEach(radio => {
+        radio.addEventListener('change', updateAppearanceVisibility);
+    });
+
+    // Persona 变化
+    document.getElementById('personaSelect').addEventListener('change', updatePersonaVisibility);
+
+    // 表单提交
+    document.getElementById('avatarForm').addEventListener('submit', handleFormSubmit);
+}
+
+// 更新外观类型可见性
+function updateAppearanceVisibility() {
+    const selectedType = document.querySelector('input[name="appearance_type"]:checked')?.value;
+    const customImageGroup = document.getElementById('customImageGroup');
+
+    if (selectedType === 'custom') {
+        customImageGroup.style.display = 'block';
+    } else {
+        customImageGroup.style.display = 'none';
+    }
+}
+
+// 更新性格描述可见性
+function updatePersonaVisibility() {
+    const selectedPersona = document.getElementById('personaSelect').value;
+    const customPersonaGroup = document.getElementById('customPersonaGroup');
+
+    if (selectedPersona === '5') {  // User-defined
+        customPersonaGroup.style.display = 'block';
+    } else {
+        customPersonaGroup.style.display = 'none';
+    }
+}
+
+// 处理表单提交
+async function handleFormSubmit(e) {
+    e.preventDefault();
+
+    const formData = new FormData(e.target);
+    const avatarId = document.getElementById('editAvatarId').value;
+
+    try {
+        let url, method;
+        if (avatarId) {
+            // 更新
+            url = `/api/avatar/${avatarId}`;
+            method = 'POST';
+        } else {
+            // 创建
+            url = '/api/avatar/create';
+            method = 'POST';
+        }
+
+        const response = await fetch(url, {
+            method: method,
+            body: formData
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            alert(avatarId ? 'Avatar 已更新！' : 'Avatar 已创建！');
+            closeModal();
+            await loadAvatars();
+        } else {
+            alert('操作失败: ' + data.error);
+        }
+    } catch (error) {
+        console.error('保存 Avatar 失败:', error);
+        alert('保存失败，请重试');
+    }
+}
+
+// 点击模态框外部关闭
+document.addEventListener('click', (e) => {
+    const modal = document.getElementById('avatarModal');
+    if (e.target === modal) {
+        closeModal();
+    }
+});
@@ -0,0 +1,183 @@
+let currentDate = new Date();
+let selectedDate = null;
+let moodData = {};
+
+// 初始化
+function init() {
+    renderCalendar();
+    loadMonthMoods();
+
+    document.getElementById('prevMonth').addEventListener('click', () => {
+        currentDate.setMonth(currentDate.getMonth() - 1);
+        renderCalendar();
+        loadMonthMoods();
+    });
+
+    document.getElementById('nextMonth').addEventListener('click', () => {
+        currentDate.setMonth(currentDate.getMonth() + 1);
+        renderCalendar();
+        loadMonthMoods();
+    });
+
+    document.getElementById('closeSelector').addEventListener('click', () => {
+        document.getElementById('moodSelector').style.display = 'none';
+    });
+
+    document.querySelectorAll('.emoji-btn').forEach(btn => {
+        btn.addEventListener('click', () => {
+            const emoji = btn.dataset.emoji;
+            setMood(selectedDate, emoji);
+        });
+    });
+
+    document.getElementById('autoAnalyze').addEventListener('click', () => {
+        autoAnalyzeMood(selectedDate);
+    });
+}
+
+function renderCalendar() {
+    const year = currentDate.getFullYear();
+    const month = currentDate.getMonth();
+
+    document.getElementById('monthYear').textContent = 
+        `${currentDate.toLocaleDateString('en-US', { month: 'long', year: 'numeric' })}`;
+
+    const firstDay = new Date(year, month, 1).getDay();
+    const daysInMonth = new Date(year, month + 1, 0).getDate();
+
+    let html = '<div class="weekdays">';
+    ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'].forEach(day => {
+        html += `<div class="weekday">${day}</div>`;
+    });
+    html += '</div><div class="days">';
+
+    // 空白日期
+    for (let i = 0; i < firstDay; i++) {
+        html += '<div class="day empty"></div>';
+    }
+
+    // 实际日期
+    const today = new Date().toISOString().split('T')[0];
+    for (let day = 1; day <= daysInMonth; day++) {
+        const dateStr = `${year}-${String(month + 1).padStart(2, '0')}-${String(day).padStart(2, '0')}`;
+        const mood = moodData[dateStr];
+        const isToday = dateStr === today;
+        const isFuture = dateStr > today;  // 判断是否为未来日期
+
+        html += `
+            <div class="day ${isToday ? 'today' : ''} ${isFuture ? 'future' : ''}" data-date="${dateStr}">
+                <span class="day-number">${day}</span>
+                ${mood ? `<span class="mood-emoji">${mood.mood_emoji}</span>` : ''}
+            </div>
+        `;
+    }
+
+    html += '</div>';
+
+    document.getElementById('calendarGrid').innerHTML = html;
+
+    // 添加点击事件（排除未来日期）
+    document.querySelectorAll('.day:not(.empty):not(.future)').forEach(dayEl => {
+        dayEl.addEventListener('click', () => {
+            selectedDate = dayEl.dataset.date;
+            document.getElementById('moodSelector').style.display = 'block';
+        });
+    });
+}
+
+async function loadMonthMoods() {
+    const year = currentDate.getFullYear();
+    const month = currentDate.getMonth() + 1;
+
+    try {
+        const response = await fetch(`/api/mood/month?year=${year}&month=${month}`);
+        const data = await response.json();
+
+        if (data.success) {
+            moodData = {};
+            data.moods.forEach(m => {
+                moodData[m.date] = m;
+            });
+            renderCalendar();
+
+            // 今天的心情正在后台分析，稍后轮询结果
+            if (data.pending) {
+                pollMoodAnalysis(data.pending.date);
+            }
+        }
+    } catch (error) {
+        console.error('加载心情数据失败:', error);
+    }
+}
+
+let moodPollTimer = null;
+
+function pollMoodAnalysis(date, attempt = 0) {
+    clearTimeout(moodPollTimer);
+    if (attempt >= 15) return;
+
+    moodPollTimer = setTimeout(async () => {
+        try {
+            const response = await fetch(`/api/mood/analysis-status?date=${date}`);
+            const data = await response.json();
+
+            if (data.success && data.mood) {
+                moodData[date] = data.mood;
+                renderCalendar();
+            } else if (data.success && data.status !== 'failed') {
+                pollMoodAnalysis(date, attempt + 1);
+            }
+        } catch (error) {
+            console.error('查询心情分析进度失败:', error);
+        }
+    }, 2000);
+}
+
+async function setMood(date, emoji) {
+    try {
+        const response = await fetch('/api/mood/set', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ date, mood_emoji: emoji })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            moodData[date] = { date, mood_emoji: emoji };
+            renderCalendar();
+            document.getElementById('moodSelector').style.display = 'none';
+        }
+    } catch (error) {
+        alert('设置心情失败，请重试');
+    }
+}
+
+async function autoAnalyzeMood(date) {
+    try {
+        const response = await fetch('/api/mood/auto-analyze', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ date })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            moodData[date] = { date: data.date, mood_emoji: data.mood_emoji };
+            renderCalendar();
+            document.getElementById('moodSelector').style.display = 'none';
+            alert(`自动分析完成！今日心情：${data.mood_emoji}`);
+        } else {
+            alert(data.error || '自动分析失败');
+        }
+    } catch (error) {
+        alert('自动分析失败，请重试');
+    }
+}
+
+init();
@@ -0,0 +1,525 @@
+// VERSION 3.0 - 多 Avatar 支持
+console.log('Chat JS Version 3.0 - Multi-Avatar Support');
+
+let chatHistory = [];
+let currentAvatar = null;
+let allAvatars = [];
+let avatarImageUrl = '/static/images/default-avatar.png';
+let avatarFallbackUrl = avatarImageUrl;  // 缩略图尚未生成时使用的原图
+let currentAvatarId = null;
+let historyCache = {};  // {avatarId: {messages, hasMore}}，切换回来时只拉取新消息
+let hasMoreHistory = false;
+let loadingOlder = false;
+const HISTORY_PAGE_SIZE = 50;
+
+// 页面加载时初始化
+async function init() {
+    const urlParams = new URLSearchParams(window.location.search);
+    const avatarIdParam = urlParams.get('avatar_id');
+
+    await loadAllAvatars();
+
+    if (avatarIdParam && allAvatars.find(a => a.id == avatarIdParam)) {
+        currentAvatarId = parseInt(avatarIdParam);
+    } else if (allAvatars.length > 0) {
+        currentAvatarId = allAvatars[0].id;
+    } else {
+        document.getElementById('avatarInfo').innerHTML = `
+            <div style="text-align: center; width: 100%;">
+                <p style="color: #e74c3c;">⚠️ Please create an Avatar first!</p>
+                <a href="/avatar" class="btn-primary" style="display: inline-block; margin-top: 10px;">Create Now</a>
+            </div>
+        `;
+        return;
+    }
+
+    await loadCurrentAvatar();
+    await loadChatHistory();
+}
+
+async function loadAllAvatars() {
+    try {
+        const response = await fetch('/api/avatar/list');
+        const data = await response.json();
+
+        if (data.success) {
+            allAvatars = data.avatars;
+            console.log('加载了', allAvatars.length, '个 Avatar');
+        }
+    } catch (error) {
+        console.error('加载 Avatar 列表失败:', error);
+    }
+}
+
+async function loadCurrentAvatar() {
+    if (!currentAvatarId) return;
+
+    try {
+        const response = await fetch(`/api/avatar/${currentAvatarId}`);
+        const data = await response.json();
+
+        if (data.success) {
+            currentAvatar = data.avatar;
+            avatarImageUrl = calculateAvatarImage(currentAvatar);
+            avatarFallbackUrl = calculateAvatarImage(currentAvatar, 'original');
+            console.log('当前 Avatar:', currentAvatar);
+            updateAvatarHeader();
+        }
+    } catch (error) {
+        console.error('加载 Avatar 失败:', error);
+    }
+}
+
+function calculateAvatarImage(avatar, size = 'thumb') {
+    if (!avatar) return '/static/images/default-avatar.png';
+
+    // 聊天页只显示小头像，默认使用缩略图
+    if (avatar.appearance_type === 'custom' && avatar.image_urls) return avatar.image_urls[size];
+    if (avatar.appearance_type === 'custom' && avatar.custom_image_path) {
+        let path = avatar.custom_image_path.trim();
+        if (path.startsWith('http://') || path.startsWith('https://')) return path;
+        if (path.startsWith('avatar_images/')) path = 'static/uploads/' + path;
+        else if (path.startsWith('uploads/')) path = 'static/' + path;
+        else if (!path.startsWith('static/')) path = 'static/uploads/' + path;
+        if (!path.startsWith('/')) path = '/' + path;
+        return path;
+    }
+
+    if (avatar.appearance_type === 'q_character') return '/static/images/q-character-avatar.svg';
+    if (avatar.appearance_type === 'cute_animal') return '/static/images/cute-animal-avatar.svg';
+    return '/static/images/default-avatar.png';
+}
+
+function updateAvatarHeader() {
+    if (!currentAvatar) return;
+
+    const headerImage = document.getElementById('avatarImage');
+    headerImage.dataset.fallback = avatarFallbackUrl;
+    headerImage.onerror = () => imageFallback(headerImage);
+    headerImage.src = avatarImageUrl;
+    document.getElementById('avatarName').textContent = currentAvatar.avatar_name || 'AI 伙伴';
+    document.getElementById('avatarPersona').textContent = currentAvatar.description || '';
+}
+
+function showAvatarSelector() {
+    const listContainer = document.getElementById('avatarListContent');
+    listContainer.innerHTML = allAvatars.map(avatar => `
+        <div class="avatar-option ${avatar.id === currentAvatarId ? 'active' : ''}" 
+             onclick="switchAvatar(${avatar.id})">
+            <img src="${calculateAvatarImage(avatar)}" data-fallback="${calculateAvatarImage(avatar, 'original')}" onerror="imageFallback(this)" alt="${avatar.avatar_name}" class="avatar-option-image">
+            <div class="avatar-option-info">
+                <h4>${avatar.avatar_name}</h4>
+                <p>${avatar.persona_name}</p>
+            </div>
+        </div>
+    `).join('');
+
+    document.getElementById('avatarSelector').style.display = 'flex';
+}
+
+function closeAvatarSelector() {
+    document.getElementById('avatarSelector').style.display = 'none';
+}
+
+async function switchAvatar(avatarId) {
+    if (avatarId === currentAvatarId) {
+        closeAvatarSelector();
+        return;
+    }
+
+    currentAvatarId = avatarId;
+    await loadCurrentAvatar();
+    await loadChatHistory();
+    closeAvatarSelector();
+    window.history.pushState({}, '', `/chat?avatar_id=${avatarId}`);
+}
+
+function lastMessageId(messages) {
+    for (let i = messages.length - 1; i >= 0; i--) {
+        if (messages[i].id) return messages[i].id;
+    }
+    return null;
+}
+
+async function loadChatHistory() {
+    if (!currentAvatarId) return;
+
+    const avatarId = currentAvatarId;
+    const cached = historyCache[avatarId];
+    const afterId = cached ? lastMessageId(cached.messages) : null;
+
+    // 已缓存过的 Avatar 只拉取新消息，否则加载最近一页
+    const url = afterId
+        ? `/api/chat/history?avatar_id=${avatarId}&after_id=${afterId}&limit=${HISTORY_PAGE_SIZE}`
+        : `/api/chat/history?avatar_id=${avatarId}&limit=${HISTORY_PAGE_SIZE}`;
+
+    try {
+        const response = await fetch(url);
+        const data = await response.json();
+
+        if (data.success) {
+            if (afterId && data.has_more) {
+                // 离开期间新消息超过一页：丢弃缓存，重新加载最近一页
+                delete historyCache[avatarId];
+                return loadChatHistory();
+            }
+
+            if (afterId) {
+                cached.messages = cached.messages.concat(data.history);
+            } else {
+                historyCache[avatarId] = { messages: data.history, hasMore: data.has_more };
+            }
+            showCachedHistory(avatarId);
+        }
+    } catch (error) {
+        console.error('加载聊天历史失败:', error);
+    }
+}
+
+function showCachedHistory(avatarId) {
+    if (avatarId !== currentAvatarId) return;
+    chatHistory = historyCache[avatarId].messages;
+    hasMoreHistory = historyCache[avatarId].hasMore;
+    resetMessageList();
+}
+
+async function loadOlderMessages() {
+    if (loadingOlder || !hasMoreHistory || !currentAvatarId) return;
+
+    const firstWithId = chatHistory.find(m => m.id);
+    if (!firstWithId) return;
+
+    loadingOlder = true;
+    const avatarId = currentAvatarId;
+
+    try {
+        const response = await fetch(`/api/chat/history?avatar_id=${avatarId}&before_id=${firstWithId.id}&limit=${HISTORY_PAGE_SIZE}`);
+        const data = await response.json();
+
+        if (data.success && avatarId === currentAvatarId) {
+            const cached = historyCache[avatarId];
+            cached.messages = data.history.concat(cached.messages);
+            cached.hasMore = data.has_more;
+            chatHistory = cached.messages;
+            hasMoreHistory = cached.hasMore;
+
+            // 更早的消息插在可视区域上方：先按估算高度撑开顶部占位，再同步滚动位置，保持当前可见内容不跳动
+            const added = data.history.reduce((sum, msg) => sum + heightOf(msg), 0);
+            topSpacer.style.height = `${topSpacer.offsetHeight + added}px`;
+            messagesContainer.scrollTop += added;
+            renderWindow();
+        }
+    } catch (error) {
+        console.error('加载更早的聊天记录失败:', error);
+    } finally {
+        loadingOlder = false;
+    }
+}
+
+// ===== 消息列表（虚拟列表） =====
+// 只有可视区域附近的消息在 DOM 中，其余消息的高度由上下两个占位块撑开；
+// 每条消息对应一个 DOM 节点，新消息追加、回复更新时只修改对应的节点
+const ESTIMATED_MESSAGE_HEIGHT = 72;  // 尚未渲染过的消息按这个高度估算（含间距）
+const OVERSCAN = 10;                  // 可视区域上下额外渲染的消息数
+const TYPING_INDICATOR_HTML = '<div class="typing-indicator"><span></span><span></span><span></span></div>';
+
+const messagesContainer = document.getElementById('chatMessages');
+const topSpacer = document.createElement('div');
+const bottomSpacer = document.createElement('div');
+const messageNodes = new WeakMap();    // 消息对象 -> DOM 节点
+const messageHeights = new WeakMap();  // 消息对象 -> 实测高度
+let renderedMessages = [];
+let renderScheduled = false;
+
+messagesContainer.textContent = '';
+messagesContainer.appendChild(topSpacer);
+messagesContainer.appendChild(bottomSpacer);
+
+messagesContainer.addEventListener('scroll', () => {
+    scheduleRender();
+    if (messagesContainer.scrollTop < 80) {
+        loadOlderMessages();
+    }
+});
+
+function heightOf(msg) {
+    return messageHeights.get(msg) || ESTIMATED_MESSAGE_HEIGHT;
+}
+
+function nodeFor(msg) {
+    let node = messageNodes.get(msg);
+    if (!node) {
+        node = createMessageNode(msg);
+        messageNodes.set(msg, node);
+    }
+    return node;
+}
+
+function createMessageNode(msg) {
+    const node = document.createElement('div');
+    node.className = msg.sender === 'user' ? 'message user-message' : 'message ai-message';
+
+    if (msg.sender !== 'user') {
+        const img = document.createElement('img');
+        img.className = 'message-avatar';
+        img.alt = 'Avatar';
+        img.dataset.fallback = avatarFallbackUrl;
+        img.onerror = () => imageFallback(img);
+        img.src = avatarImageUrl;
+        node.appendChild(img);
+    }
+
+    const content = document.createElement('div');
+    content.className = 'message-content';
+    node.appendChild(content);
+    fillMessageContent(content, msg);
+    return node;
+}
+
+function fillMessageContent(content, msg) {
+    if (msg.isTyping) {
+        content.innerHTML = TYPING_INDICATOR_HTML;
+        return;
+    }
+
+    let p = content.firstElementChild;
+    if (!p || p.tagName !== 'P') {
+        content.textContent = '';
+        p = document.createElement('p');
+        content.appendChild(p);
+    }
+    p.textContent = msg.message;
+}
+
+function isNearBottom() {
+    return messagesContainer.scrollHeight - messagesContainer.scrollTop - messagesContainer.clientHeight < 120;
+}
+
+function scheduleRender() {
+    if (renderScheduled) return;
+    renderScheduled = true;
+    requestAnimationFrame(() => renderWindow());
+}
+
+// 按当前滚动位置（atBottom 时按列表末尾）决定哪些消息放进 DOM
+function renderWindow(atBottom = false) {
+    renderScheduled = false;
+    const total = chatHistory.length;
+    let viewTop = messagesContainer.scrollTop;
+    if (atBottom) {
+        const listHeight = chatHistory.reduce((sum, msg) => sum + heightOf(msg), 0);
+        viewTop = Math.max(0, listHeight - messagesContainer.clientHeight);
+    }
+    const viewBottom = viewTop + messagesContainer.clientHeight;
+
+    let y = 0;
+    let first = total;
+    let last = total;
+    for (let i = 0; i < total; i++) {
+        const height = heightOf(chatHistory[i]);
+        if (first === total && y + height > viewTop) first = i;
+        if (y >= viewBottom) {
+            last = i;
+            break;
+        }
+        y += height;
+    }
+    first = Math.min(first, Math.max(total - 1, 0));
+
+    const start = Math.max(0, first - OVERSCAN);
+    const end = Math.min(total, last + OVERSCAN);
+    const visible = chatHistory.slice(start, end);
+
+    // 移出窗口的节点从 DOM 中摘下（节点本身保留，滚动回来时直接复用）
+    const keep = new Set(visible);
+    renderedMessages.forEach(msg => {
+        if (!keep.has(msg)) messageNodes.get(msg).remove();
+    });
+
+    let anchor = topSpacer.nextSibling;
+    visible.forEach(msg => {
+        const node = nodeFor(msg);
+        if (node === anchor) {
+            anchor = anchor.nextSibling;
+        } else {
+            messagesContainer.insertBefore(node, anchor);
+        }
+    });
+    renderedMessages = visible;
+
+    let above = 0;
+    for (let i = 0; i < start; i++) above += heightOf(chatHistory[i]);
+    let below = 0;
+    for (let i = end; i < total; i++) below += heightOf(chatHistory[i]);
+    topSpacer.style.height = `${above}px`;
+    bottomSpacer.style.height = `${below}px`;
+
+    // 用实测高度替换估算值；可视区域上方的高度变化通过调整 scrollTop 抵消，避免内容跳动
+    let shift = 0;
+    for (let i = start; i < end; i++) {
+        const msg = chatHistory[i];
+        const next = i + 1 < end ? messageNodes.get(chatHistory[i + 1]) : bottomSpacer;
+        const height = next.offsetTop - messageNodes.get(msg).offsetTop;
+        if (height <= 0) continue;
+        if (i < first) shift += height - heightOf(msg);
+        messageHeights.set(msg, height);
+    }
+    if (shift) messagesContainer.scrollTop += shift;
+}
+
+function scrollToBottom() {
+    renderWindow(true);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+// 切换 Avatar / 重新加载历史后显示整个列表（停在最新消息处）
+function resetMessageList() {
+    renderedMessages.forEach(msg => messageNodes.get(msg).remove());
+    renderedMessages = [];
+    scrollToBottom();
+}
+
+function appendMessage(msg) {
+    const follow = msg.sender === 'user' || isNearBottom();
+    chatHistory.push(msg);
+    if (follow) {
+        scrollToBottom();
+    } else {
+        scheduleRender();
+    }
+}
+
+// 消息内容变化（打字指示器 -> 回复、流式追加文本）时只修改这一条消息的节点
+function updateMessage(msg) {
+    const follow = isNearBottom();
+    fillMessageContent(nodeFor(msg).lastElementChild, msg);
+    if (follow) messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    scheduleRender();
+}
+
+document.getElementById('chatForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const input = document.getElementById('messageInput');
+    const message = input.value.trim();
+
+    if (!message || !currentAvatarId) return;
+
+    input.value = '';
+
+    const userMsg = {
+        sender: 'user',
+        message: message,
+        timestamp: new Date().toISOString()
+    };
+    appendMessage(userMsg);
+
+    const loadingMsg = {
+        sender: 'ai',
+        message: '',
+        timestamp: new Date().toISOString(),
+        isTyping: true
+    };
+    appendMessage(loadingMsg);
+
+    try {
+        if (window.ReadableStream && window.TextDecoder) {
+            await streamReply(message, userMsg, loadingMsg);
+        } else {
+            await sendReply(message, userMsg, loadingMsg);
+        }
+    } catch (error) {
+        if (loadingMsg.isTyping || !loadingMsg.message) {
+            loadingMsg.message = 'Network error, please try again.';
+        }
+        loadingMsg.isTyping = false;
+        updateMessage(loadingMsg);
+    }
+});
+
+// 一次性获取完整回复（不支持流式读取的浏览器）
+async function sendReply(message, userMsg, loadingMsg) {
+    const response = await fetch('/api/chat/send', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ message, avatar_id: currentAvatarId })
+    });
+
+    const data = await response.json();
+    loadingMsg.isTyping = false;
+
+    if (data.success) {
+        // 记录服务端消息 id，之后切换回来时从这里继续拉取新消息
+        userMsg.id = data.user_message_id;
+        loadingMsg.id = data.ai_message_id;
+        loadingMsg.message = data.ai_message;
+    } else {
+        loadingMsg.message = 'Sorry, I cannot reply right now.';
+    }
+
+    updateMessage(loadingMsg);
+}
+
+// 通过 Server-Sent Events 逐段显示回复
+async function streamReply(message, userMsg, loadingMsg) {
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ message, avatar_id: currentAvatarId })
+    });
+
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        loadingMsg.isTyping = false;
+        loadingMsg.message = data.error || 'Sorry, I cannot reply right now.';
+        updateMessage(loadingMsg);
+        return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    const handleEvent = (event, data) => {
+        if (event === 'done') {
+            // 用户消息和回复在生成结束后一起保存，这里才拿到两条消息的 id
+            userMsg.id = data.user_message_id;
+            loadingMsg.id = data.ai_message_id;
+            loadingMsg.isTyping = false;
+            loadingMsg.message = data.ai_message;
+            updateMessage(loadingMsg);
+        } else if (data.delta) {
+            // 收到第一段文本时打字指示器被替换成消息气泡
+            loadingMsg.isTyping = false;
+            loadingMsg.message += data.delta;
+            updateMessage(loadingMsg);
+        }
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        events.forEach(raw => {
+            let event = 'message';
+            let payload = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) payload += line.slice(6);
+            });
+            if (payload) handleEvent(event, JSON.parse(payload));
+        });
+    }
+
+    if (loadingMsg.isTyping) {
+        loadingMsg.isTyping = false;
+        loadingMsg.message = loadingMsg.message || 'Sorry, I cannot reply right now.';
+        updateMessage(loadingMsg);
+    }
+}
+
+init();
@@ -0,0 +1,52 @@
+async function demoLogin() {
+    const btn = document.getElementById('demoLoginBtn');
+    const loading = document.getElementById('loading');
+    const messageEl = document.getElementById('message');
+
+    btn.disabled = true;
+    loading.classList.add('active');
+    messageEl.innerHTML = '';
+
+    try {
+        // 第一步：清空测试账号数据
+        console.log('Clearing demo data...');
+        const clearResponse = await fetch('/api/demo/clear', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' }
+        });
+
+        if (!clearResponse.ok) {
+            throw new Error('Failed to prepare demo environment');
+        }
+
+        // 第二步：登录
+        console.log('Logging in...');
+        const loginResponse = await fetch('/api/auth/login', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'include',
+            body: JSON.stringify({
+                login_id: 'test',
+                password: 'test'
+            })
+        });
+
+        const data = await loginResponse.json();
+
+        if (data.success) {
+            messageEl.innerHTML = '<div class="message success">✅ Demo ready! Redirecting to profile...</div>';
+
+            // 跳转到个人资料页面（让用户先填写基本信息）
+            setTimeout(() => {
+                window.location.href = '/profile';
+            }, 1000);
+        } else {
+            throw new Error(data.error || 'Login failed');
+        }
+    } catch (error) {
+        console.error('Demo login error:', error);
+        messageEl.innerHTML = `<div class="message error">❌ ${error.message}</div>`;
+        btn.disabled = false;
+        loading.classList.remove('active');
+    }
+}
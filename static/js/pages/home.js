@@ -0,0 +1,34 @@
+async function loadTodayStats() {
+    const today = new Date().toISOString().split('T')[0];
+
+    // 加载今日消息数
+    try {
+        const response = await fetch('/api/chat/history?limit=100');
+        const data = await response.json();
+
+        if (data.success) {
+            const todayMessages = data.history.filter(msg => 
+                msg.timestamp.startsWith(today) && msg.sender === 'user'
+            ).length;
+            document.getElementById('todayMessages').textContent = todayMessages;
+        }
+    } catch (error) {
+        console.error('加载消息统计失败:', error);
+    }
+
+    // 加载今日心情
+    try {
+        const response = await fetch(`/api/mood/get?date=${today}`);
+        const data = await response.json();
+
+        if (data.success && data.mood) {
+            document.getElementById('todayMood').textContent = data.mood.mood_emoji;
+        } else {
+            document.getElementById('todayMood').textContent = '未记录';
+        }
+    } catch (error) {
+        console.error('加载心情统计失败:', error);
+    }
+}
+
+loadTodayStats();
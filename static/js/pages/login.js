@@ -0,0 +1,38 @@
+document.getElementById('loginForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const login_id = document.getElementById('login_id').value;
+    const password = document.getElementById('password').value;
+
+    try {
+        const response = await fetch('/api/auth/login', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ login_id, password })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            // 存储 token 到 localStorage
+            localStorage.setItem('auth_token', data.token);
+            localStorage.setItem('user_id', data.user_id);
+            localStorage.setItem('username', data.username);
+
+            // 跳转到主页
+            window.location.href = '/home';
+        } else {
+            showMessage(data.error || '登录失败', 'error');
+        }
+    } catch (error) {
+        showMessage('网络错误，请重试', 'error');
+    }
+});
+
+function showMessage(text, type) {
+    const messageEl = document.getElementById('message');
+    messageEl.textContent = text;
+    messageEl.className = 'message ' + type;
+}
@@ -0,0 +1,66 @@
+// 提交表单
+document.getElementById('profileForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const formData = new FormData(e.target);
+
+    try {
+        const response = await fetch('/api/profile/', {
+            method: 'POST',
+            body: formData
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            showMessage('Saved successfully!', 'success');
+        } else {
+            showMessage(data.error || 'Save failed', 'error');
+        }
+    } catch (error) {
+        showMessage('Network error, please try again', 'error');
+    }
+});
+
+function showMessage(text, type) {
+    const messageEl = document.getElementById('message');
+    messageEl.textContent = text;
+    messageEl.className = 'message ' + type;
+}
+
+// 登出功能
+function logout() {
+    if (confirm('Are you sure you want to log out?')) {
+        console.log('[Logout] Starting logout process...');
+
+        // 立即清除本地数据
+        sessionStorage.clear();
+        localStorage.removeItem('auth_token');
+        localStorage.removeItem('user_id');
+        localStorage.removeItem('username');
+
+        console.log('[Logout] Local storage cleared');
+
+        // 调用后端登出 API（不等待响应）
+        const token = localStorage.getItem('auth_token');
+        const headers = {
+            'Content-Type': 'application/json'
+        };
+
+        if (token) {
+            headers['Authorization'] = `Bearer ${token}`;
+        }
+
+        // 异步调用，不阻塞跳转
+        fetch('/api/auth/logout', {
+            method: 'POST',
+            headers: headers
+        }).catch(error => {
+            console.error('[Logout] API error (ignored):', error);
+        });
+
+        // 立即跳转到登录页
+        console.log('[Logout] Redirecting to login page...');
+        window.location.replace('/login');
+    }
+}
@@ -0,0 +1,133 @@
+// 显示基本信息
+document.getElementById('currentUrl').textContent = window.location.href;
+document.getElementById('userAgent').textContent = navigator.userAgent;
+
+function updateCookie() {
+    const cookie = document.cookie;
+    const cookieEl = document.getElementById('cookieValue');
+    if (cookie) {
+        cookieEl.textContent = cookie;
+        document.getElementById('cookieInfo').className = 'info success';
+    } else {
+        cookieEl.textContent = '无';
+        document.getElementById('cookieInfo').className = 'info warning';
+    }
+}
+
+function log(message, type = 'info') {
+    const logEl = document.getElementById('log');
+    const time = new Date().toLocaleTimeString();
+    const entry = document.createElement('div');
+    entry.className = 'log-entry ' + type;
+    entry.innerHTML = `<strong>[${time}]</strong> ${message}`;
+    logEl.insertBefore(entry, logEl.firstChild);
+}
+
+async function checkSession() {
+    log('正在检查 Session 状态...');
+
+    try {
+        const response = await fetch('/api/auth/check', {
+            method: 'GET',
+            credentials: 'include'
+        });
+
+        const data = await response.json();
+        const statusEl = document.getElementById('sessionStatus');
+
+        if (data.authenticated) {
+            statusEl.textContent = `已登录 (用户: ${data.user.username})`;
+            document.getElementById('sessionInfo').className = 'info success';
+            log(`✅ Session 有效！用户: ${data.user.username}`, 'success');
+        } else {
+            statusEl.textContent = '未登录';
+            document.getElementById('sessionInfo').className = 'info error';
+            log('❌ 未登录', 'error');
+        }
+
+        updateCookie();
+    } catch (error) {
+        log(`❌ 检查失败: ${error.message}`, 'error');
+    }
+}
+
+document.getElementById('testLoginForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const login_id = document.getElementById('login_id').value;
+    const password = document.getElementById('password').value;
+
+    log(`🔄 开始测试登录: ${login_id}`);
+
+    try {
+        log('📤 发送登录请求...');
+
+        const response = await fetch('/api/auth/login', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            credentials: 'include',  // 关键！
+            body: JSON.stringify({ login_id, password })
+        });
+
+        log(`📥 收到响应: HTTP ${response.status}`);
+
+        // 检查响应头
+        const headers = {};
+        response.headers.forEach((value, key) => {
+            headers[key] = value;
+            if (key.toLowerCase() === 'set-cookie') {
+                log(`🍪 Set-Cookie: ${value}`, 'success');
+            }
+        });
+
+        const data = await response.json();
+        log(`📦 响应数据: ${JSON.stringify(data)}`);
+
+        if (data.success) {
+            log(`✅ 登录成功！用户: ${data.username}`, 'success');
+
+            // 等待一下，然后检查 Cookie
+            setTimeout(() => {
+                updateCookie();
+                checkSession();
+                log('🎉 登录流程完成，3秒后跳转到主页...');
+                setTimeout(() => {
+                    window.location.href = '/home';
+                }, 3000);
+            }, 500);
+        } else {
+            log(`❌ 登录失败: ${data.error}`, 'error');
+        }
+    } catch (error) {
+        log(`❌ 请求失败: ${error.message}`, 'error');
+    }
+});
+
+function clearAll() {
+    if (confirm('确定要清除所有 Cookie 和缓存吗？')) {
+        // 清除所有 Cookie
+        document.cookie.split(";").forEach(function(c) {
+            document.cookie = c.replace(/^ +/, "").replace(/=.*/, "=;expires=" + new Date().toUTCString() + ";path=/");
+        });
+
+        // 清除 localStorage
+        localStorage.clear();
+
+        // 清除 sessionStorage
+        sessionStorage.clear();
+
+        log('🗑️ 已清除所有本地数据', 'success');
+        updateCookie();
+
+        setTimeout(() => {
+            location.reload();
+        }, 1000);
+    }
+}
+
+// 页面加载时检查 Session
+updateCookie();
+checkSession();
+log('📱 测试页面已加载');
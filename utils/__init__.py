@@ -1,4 +1,5 @@
 from .gpt_service import GPTService
-from .file_handler import save_uploaded_file, allowed_file
+from .file_handler import allowed_file
+from .image_pipeline import save_uploaded_image, image_urls
 
-__all__ = ['GPTService', 'save_uploaded_file', 'allowed_file']
+__all__ = ['GPTService', 'allowed_file', 'save_uploaded_image', 'image_urls']
@@ -0,0 +1,315 @@
+"""
+静态资源构建（带内容哈希的文件名 + 长期缓存）
+- 启动时把 static/ 下的 JS / CSS / 图片构建到内存：JS、CSS 压缩空白和注释，文件名加上内容哈希
+  （js/pages/chat.js -> js/pages/chat.3f9a0c1b2d4e.js），并预先做好 gzip / br 压缩
+- JS / CSS 里引用的 /static/... 资源地址同时替换成带哈希的地址
+- 模板里用 asset_url('js/main.js') 生成地址；/assets/ 下的文件内容不会变化，
+  浏览器缓存一年且不再重新验证（immutable），之后翻页只需要下载 HTML
+- 调试模式下 asset_url 返回未压缩的原始文件地址（修改后刷新即可生效）
+
+用法:
+    register_assets(app)                                  # 在 create_app() 里调用
+    <script src="{{ asset_url('js/pages/chat.js') }}"></script>
+
+    python -m utils.assets dist                           # 导出到 dist/（附 manifest.json），供 CDN / nginx 使用
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import current_app, url_for
+
+from .compression import COMPRESSIBLE_MIMETYPES, STATIC_LEVEL, CompressedVariants
+
+ASSET_DIRS = ('images', 'css', 'js')  # 按依赖顺序构建：CSS / JS 可能引用图片
+ASSET_SUFFIXES = ('.js', '.css', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico')
+
+# 出现在这些字符之后的 / 是正则表达式的开始，而不是除号
+REGEX_PREFIX_CHARS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_PREFIX_WORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new',
+                      'delete', 'void', 'throw', 'instanceof', 'yield', 'await'}
+# 换行前后是这些字符时可以安全去掉换行（不影响自动分号插入）
+NEWLINE_AFTER_SAFE = set('{;,([=:&|?*!<>%^~')
+NEWLINE_BEFORE_SAFE = set('})];,.?:=&|*<>%^')
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch in '_$' or ord(ch) > 127
+
+
+def _skip_string(source, i):
+    """返回从 source[i] 开始的字符串字面量（' 或 "）结束后的位置"""
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == '\\' else 1
+    return i + 1
+
+
+def _skip_template(source, i):
+    """返回从 source[i] 开始的模板字符串结束后的位置（处理 ${} 中嵌套的字符串和模板）"""
+    i += 1
+    while i < len(source):
+        ch = source[i]
+        if ch == '\\':
+            i += 2
+        elif ch == '`':
+            return i + 1
+        elif source.startswith('${', i):
+            i += 2
+            depth = 1
+            while i < len(source) and depth:
+                ch = source[i]
+                if ch in '\'"':
+                    i = _skip_string(source, i)
+                    continue
+                if ch == '`':
+                    i = _skip_template(source, i)
+                    continue
+                if ch == '{':
+                    depth += 1
+                elif ch == '}':
+                    depth -= 1
+                i += 1
+        else:
+            i += 1
+    return i
+
+
+def _skip_regex(source, i):
+    """返回从 source[i] 开始的正则表达式字面量（不含标志）结束后的位置"""
+    i += 1
+    in_class = False
+    while i < len(source):
+        ch = source[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '[':
+            in_class = True
+        elif ch == ']':
+            in_class = False
+        elif ch == '/' and not in_class:
+            return i + 1
+        elif ch == '\n':
+            break
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """
+    去掉 JS 的注释和多余空白
+
+    只做不改变语义的变换：字符串、模板字符串和正则原样保留，
+    可能触发自动分号插入的换行保留为一个换行。
+    """
+    out = []
+    prev = ''        # 上一个输出的有效字符
+    word = ''        # 正在输出的标识符 / 关键字
+    last_word = ''   # 上一个完整的标识符 / 关键字
+    pending = None   # 待定的空白：' ' 或 '\n'
+    i, n = 0, len(source)
+
+    def flush_space(next_char):
+        if pending == '\n':
+            if prev and prev not in NEWLINE_AFTER_SAFE and next_char not in NEWLINE_BEFORE_SAFE:
+                out.append('\n')
+        elif pending == ' ':
+            if prev and (_is_word(prev) and _is_word(next_char)
+                         or prev == next_char and next_char in '+-'):
+                out.append(' ')
+
+    while i < n:
+        ch = source[i]
+
+        if ch in ' \t\r\n':
+            if ch == '\n':
+                pending = '\n'
+            elif pending is None:
+                pending = ' '
+            i += 1
+            continue
+
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+            continue
+
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            if '\n' in source[i:end]:
+                pending = '\n'
+            elif pending is None:
+                pending = ' '
+            i = end
+            continue
+
+        if word and not _is_word(ch):
+            last_word, word = word, ''
+
+        regex = ch == '/' and (not prev or prev in REGEX_PREFIX_CHARS
+                               or (_is_word(prev) and last_word in REGEX_PREFIX_WORDS))
+        if ch in '\'"`' or regex:
+            flush_space(ch)
+            pending = None
+            if ch == '`':
+                end = _skip_template(source, i)
+            elif regex:
+                end = _skip_regex(source, i)
+            else:
+                end = _skip_string(source, i)
+            out.append(source[i:end])
+            prev = source[end - 1]
+            last_word = ''
+            i = end
+            continue
+
+        flush_space(ch)
+        pending = None
+        out.append(ch)
+        if _is_word(ch):
+            word += ch
+        else:
+            last_word = ''
+        prev = ch
+        i += 1
+
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """去掉 CSS 的注释和多余空白（字符串原样保留）"""
+    out = []
+    pending = False
+    i, n = 0, len(source)
+    while i < n:
+        ch = source[i]
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending = True
+            continue
+        if ch.isspace():
+            pending = True
+            i += 1
+            continue
+        if pending and out and out[-1][-1] not in '{};,>:' and ch not in '{};,>':
+            out.append(' ')
+        pending = False
+        if ch in '\'"':
+            end = _skip_string(source, i)
+            out.append(source[i:end])
+            i = end
+            continue
+        if ch == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(ch)
+        i += 1
+    return ''.join(out).strip() + '\n'
+
+
+class Asset:
+    def __init__(self, name, data, mimetype):
+        self.name = name  # 带哈希的文件名（相对于 /assets/）
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = name.rsplit('.', 2)[-2]
+        self.variants = None
+        if mimetype in COMPRESSIBLE_MIMETYPES:
+            self.variants = CompressedVariants(data, STATIC_LEVEL)
+            self.variants.warm()
+
+
+class AssetManifest:
+    def __init__(self, static_folder, url_prefix='/assets'):
+        self.static_folder = static_folder
+        self.url_prefix = url_prefix
+        self.names = {}    # 原始路径 -> 带哈希的文件名
+        self.assets = {}   # 带哈希的文件名 -> Asset
+
+    def build(self):
+        """读取、压缩并按内容哈希重命名所有资源"""
+        names, assets = {}, {}
+        for directory in ASSET_DIRS:
+            for logical in self._walk(directory):
+                with open(os.path.join(self.static_folder, logical), 'rb') as f:
+                    data = f.read()
+                if logical.endswith(('.js', '.css')):
+                    text = self._rewrite_urls(data.decode('utf-8'), names)
+                    text = minify_js(text) if logical.endswith('.js') else minify_css(text)
+                    data = text.encode('utf-8')
+
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, ext = os.path.splitext(logical)
+                name = f"{stem}.{digest}{ext}"
+                mimetype = mimetypes.guess_type(logical)[0] or 'application/octet-stream'
+                names[logical] = name
+                assets[name] = Asset(name, data, mimetype)
+
+        self.names, self.assets = names, assets
+        return len(assets)
+
+    def _walk(self, directory):
+        root = os.path.join(self.static_folder, directory)
+        for dirpath, dirs, files in os.walk(root):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(ASSET_SUFFIXES):
+                    path = os.path.join(dirpath, name)
+                    yield os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+
+    def _rewrite_urls(self, text, names):
+        if not names:
+            return text
+        pattern = re.compile('/static/(' + '|'.join(re.escape(logical) for logical in names) + ')')
+        return pattern.sub(lambda m: f"{self.url_prefix}/{names[m.group(1)]}", text)
+
+    def url(self, logical):
+        name = self.names.get(logical)
+        if name is None:
+            return None
+        return f"{self.url_prefix}/{name}"
+
+    def get(self, name):
+        return self.assets.get(name)
+
+    def write(self, out_dir):
+        """导出带哈希的文件和 manifest.json（原始路径 -> 带哈希的文件名）"""
+        for name, asset in self.assets.items():
+            path = os.path.join(out_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(asset.data)
+        with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.names, f, indent=2, ensure_ascii=False)
+
+
+def asset_url(logical):
+    """模板中使用：资源的长期缓存地址（调试模式或未构建的资源返回原始 /static 地址）"""
+    manifest = current_app.extensions.get('assets')
+    if manifest is not None and not current_app.debug:
+        url = manifest.url(logical)
+        if url:
+            return url
+    return url_for('static', filename=logical)
+
+
+def register_assets(app):
+    manifest = AssetManifest(app.static_folder)
+    manifest.build()
+    app.extensions['assets'] = manifest
+    app.add_template_global(asset_url)
+
+
+if __name__ == '__main__':
+    import sys
+
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else 'dist'
+    manifest = AssetManifest(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static'))
+    count = manifest.build()
+    manifest.write(out_dir)
+    print(f"已构建 {count} 个资源 -> {out_dir}")
@@ -0,0 +1,103 @@
+"""
+路由认证
+- 每个视图函数用 @public 或 @login_required 声明认证要求（未声明的默认需要登录）
+- 应用启动时 register_auth(app) 把 endpoint -> 认证要求 编译成一张字典，
+  每个请求只做一次字典查找：公开页面和静态资源直接跳过，不读 session、不解析 token
+- token 只从 Authorization: Bearer 头或 auth_token Cookie 读取，不再解析请求体或 URL 参数
+
+用法:
+    @chat_bp.route('/send', methods=['POST'])
+    @login_required
+    def send_message():
+        user_id = current_user_id()
+"""
+
+from flask import g, request, session, jsonify, redirect, url_for
+from extensions import token_store
+
+PUBLIC = 'public'
+LOGIN = 'login'
+
+TOKEN_COOKIE_NAME = 'auth_token'
+
+
+def public(f):
+    """标记视图无需登录"""
+    f.auth_policy = PUBLIC
+    return f
+
+
+def login_required(f):
+    """标记视图需要登录（由 register_auth 注册的请求钩子统一检查，不包装视图函数）"""
+    f.auth_policy = LOGIN
+    return f
+
+
+def current_user_id():
+    """
+    当前请求的登录用户 id（未登录返回 None）
+
+    需要登录的路由由 check_auth 填入 g.user_id（来自 session 或 token）；
+    公开路由不做认证检查，只看 session。
+    """
+    user_id = g.get('user_id')
+    if user_id is None:
+        user_id = session.get('user_id')
+    return user_id
+
+
+def get_token_from_request():
+    """从 Authorization 头或 Cookie 中读取 token"""
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header[7:]
+    return request.cookies.get(TOKEN_COOKIE_NAME)
+
+
+def verify_token(token):
+    """验证 token 并返回 user_id（无效或过期返回 None）"""
+    return token_store.verify(token)
+
+
+def build_auth_table(app):
+    """
+    编译认证表: endpoint -> (是否需要登录, 是否 API)
+
+    API（蓝图中的 endpoint，如 chat.send_message）未登录时返回 401，页面重定向到登录页。
+    """
+    table = {}
+    for endpoint, view in app.view_functions.items():
+        policy = getattr(view, 'auth_policy', LOGIN)
+        if endpoint == 'static':
+            policy = PUBLIC
+        table[endpoint] = (policy == LOGIN, '.' in endpoint)
+    return table
+
+
+def register_auth(app):
+    """在所有路由注册完成后调用"""
+    auth_table = build_auth_table(app)
+    app.extensions['auth_table'] = auth_table
+
+    @app.before_request
+    def check_auth():
+        # 404 / 405（没有匹配的 endpoint）和公开路由直接跳过
+        required, is_api = auth_table.get(request.endpoint, (False, False))
+        if not required or request.method == 'OPTIONS':
+            return
+
+        user_id = session.get('user_id')
+        if not user_id:
+            token = get_token_from_request()
+            if token:
+                user_id = verify_token(token)
+
+        if user_id:
+            # token 认证只在本次请求内有效，不写入 session：
+            # 不保存 Cookie 的 API 客户端不会每个请求都创建一个服务端 session
+            g.user_id = user_id
+            return
+
+        if is_api:
+            return jsonify({"success": False, "error": "未登录"}), 401
+        return redirect(url_for('login'))
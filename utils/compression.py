@@ -0,0 +1,237 @@
+"""
+响应压缩（gzip，安装了 brotli 时优先 br）
+- 只压缩文本类型（HTML / CSS / JS / JSON / SVG / SSE），小于 COMPRESS_MIN_SIZE 字节的响应不压缩
+- 流式响应（SSE、导出）逐块压缩并立即 flush，客户端仍能实时收到每个事件
+- 静态文件在启动时预压缩，之后按 (路径, 修改时间) 复用；render_page() 渲染的页面只渲染和压缩一次
+- 已经带 Content-Encoding 的响应、非 200 响应（304 等）和图片等二进制文件原样返回
+
+用法:
+    register_compression(app)               # 在 create_app() 里调用
+    return render_page('chat.html', show_nav=True, active_page='chat')
+"""
+
+import gzip
+import os
+import threading
+import zlib
+from flask import current_app, render_template, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/event-stream',
+    'text/javascript', 'application/javascript', 'application/json', 'image/svg+xml',
+}
+STATIC_SUFFIXES = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+
+# 动态内容用中等压缩级别（压缩耗时与压缩率的折中），预压缩内容用最高级别
+DYNAMIC_LEVEL = {'gzip': 6, 'br': 5}
+STATIC_LEVEL = {'gzip': 9, 'br': 11}
+
+
+def choose_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择编码（br 优先），不支持压缩时返回 None"""
+    accepted = {name for name, q in _parse_accept_encoding(accept_encoding) if q > 0}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _parse_accept_encoding(accept_encoding):
+    """逐项返回 (编码, q 值)；没有 q 参数时为 1，q 无法解析时按 0（不接受）处理"""
+    for token in (accept_encoding or '').split(','):
+        name, *params = token.split(';')
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        yield name.strip().lower(), q
+
+
+def compress(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level or DYNAMIC_LEVEL['br'])
+    return gzip.compress(data, compresslevel=level or DYNAMIC_LEVEL['gzip'], mtime=0)
+
+
+class StreamCompressor:
+    """逐块压缩：每块之后 flush，保证 SSE 事件不会滞留在压缩缓冲区里"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=DYNAMIC_LEVEL['br'])
+        else:
+            self._compressor = zlib.compressobj(DYNAMIC_LEVEL['gzip'], zlib.DEFLATED, 31)  # 31: gzip 格式
+
+    def compress(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        # 客户端断开时服务器关闭的是外层生成器，需要把关闭传递给原始的响应迭代器
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class CompressedVariants:
+    """同一份内容的各编码压缩结果（首次用到某种编码时压缩，之后复用）"""
+
+    def __init__(self, data, level=None):
+        self.data = data
+        self.level = level or {}
+        self._variants = {}
+
+    def warm(self):
+        """预先压缩所有可用的编码"""
+        for encoding in ('br', 'gzip') if brotli is not None else ('gzip',):
+            self.get(encoding)
+
+    def get(self, encoding):
+        variant = self._variants.get(encoding)
+        if variant is None:
+            variant = compress(self.data, encoding, self.level.get(encoding))
+            self._variants[encoding] = variant
+        return variant
+
+
+class StaticCache:
+    """静态文件预压缩缓存：文件修改后按新的 mtime 重新压缩"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._entries = {}  # filename -> (mtime, CompressedVariants)
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """启动时压缩所有可压缩的静态文件（上传目录除外）"""
+        count = 0
+        for root, dirs, files in os.walk(self.folder):
+            dirs[:] = [d for d in dirs if d != 'uploads']
+            for name in files:
+                if not name.endswith(STATIC_SUFFIXES):
+                    continue
+                filename = os.path.relpath(os.path.join(root, name), self.folder).replace(os.sep, '/')
+                variants = self.get(filename)
+                if variants is not None:
+                    variants.warm()
+                    count += 1
+        return count
+
+    def get(self, filename):
+        path = os.path.join(self.folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        entry = self._entries.get(filename)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+
+        with open(path, 'rb') as f:
+            variants = CompressedVariants(f.read(), STATIC_LEVEL)
+        with self._lock:
+            self._entries[filename] = (mtime, variants)
+        return variants
+
+
+_page_cache = {}
+_page_cache_lock = threading.Lock()
+
+
+def render_page(template_name, **context):
+    """
+    渲染不依赖当前用户数据的页面：每组参数只渲染一次，压缩结果也一并缓存
+
+    调试模式下不缓存（模板修改后立即生效）。
+    """
+    if current_app.debug:
+        return render_template(template_name, **context)
+
+    key = (template_name, tuple(sorted(context.items())))
+    variants = _page_cache.get(key)
+    if variants is None:
+        html = render_template(template_name, **context).encode('utf-8')
+        variants = CompressedVariants(html, STATIC_LEVEL)
+        with _page_cache_lock:
+            _page_cache[key] = variants
+
+    response = current_app.response_class(variants.data, mimetype='text/html')
+    response.compressed_variants = variants
+    return response
+
+
+def register_compression(app):
+    static_cache = StaticCache(app.static_folder)
+    if os.getenv('COMPRESS_PRECOMPRESS_STATIC', 'True') == 'True':
+        static_cache.warm()
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        variants = getattr(response, 'compressed_variants', None)
+        if variants is None and request.endpoint == 'static' and response.direct_passthrough:
+            variants = static_cache.get(request.view_args['filename'])
+
+        if variants is not None:
+            if len(variants.data) < MIN_SIZE:
+                return response
+            if response.direct_passthrough and hasattr(response.response, 'close'):
+                response.response.close()  # send_file 打开的文件
+            response.direct_passthrough = False
+            response.set_data(variants.get(encoding))
+            _mark_encoded(response, encoding)
+        elif response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+            _mark_encoded(response, encoding)
+        elif not response.direct_passthrough:
+            data = response.get_data()
+            if len(data) < MIN_SIZE:
+                return response
+            response.set_data(compress(data, encoding))
+            _mark_encoded(response, encoding)
+        return response
+
+
+def _mark_encoded(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后字节不同，强 ETag 改为弱 ETag（If-None-Match 按弱比较，仍能命中 304）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
@@ -0,0 +1,48 @@
+"""
+日期工具
+- 所有“今天是哪一天”的判断都以应用时区为准（APP_TIMEZONE，如 Asia/Shanghai）
+- 未配置时使用服务器本地时区
+- ChatHistory.timestamp 由 SQLite 的 CURRENT_TIMESTAMP 写入，是 UTC 时间
+"""
+
+import calendar
+import os
+from datetime import datetime
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+
+def _app_timezone():
+    name = os.getenv('APP_TIMEZONE')
+    if name and ZoneInfo:
+        return ZoneInfo(name)
+    return None  # 服务器本地时区
+
+
+APP_TZ = _app_timezone()
+
+
+def now():
+    """当前时间（应用时区）"""
+    if APP_TZ:
+        return datetime.now(APP_TZ)
+    return datetime.now()
+
+
+def today():
+    """今天的日期字符串 YYYY-MM-DD（应用时区）"""
+    return now().strftime('%Y-%m-%d')
+
+
+def utc_offset_seconds(moment):
+    """应用时区在某个时刻（带时区的 datetime）相对 UTC 的偏移秒数"""
+    return int(moment.astimezone(APP_TZ).utcoffset().total_seconds())
+
+
+def month_range(year, month):
+    """返回某个月的首日和末日 (YYYY-MM-01, YYYY-MM-DD)"""
+    last_day = calendar.monthrange(year, month)[1]
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}"
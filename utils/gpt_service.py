@@ -1,47 +1,15 @@
 import os
-from openai import OpenAI
+import threading
+from collections import OrderedDict
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from utils.dates import now
+from utils.tokens import count_tokens, count_message_tokens, truncate_to_tokens, MESSAGE_OVERHEAD, REPLY_OVERHEAD
 
 load_dotenv()
 
-class GPTService:
-    def __init__(self):
-        api_key = os.getenv('OPENAI_API_KEY')
-        
-        print(f"[DEBUG] OPENAI_API_KEY 已加载: {api_key[:10]}..." if api_key else "[ERROR] OPENAI_API_KEY 未找到")
-        
-        if not api_key or api_key == 'your_openai_api_key_here' or 'DEMO' in api_key:
-            print("警告：未配置有效的 OPENAI_API_KEY，请在 .env 文件中配置")
-        
-        # 创建 OpenAI 客户端，支持自定义 base_url
-        base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
-        print(f"[DEBUG] OPENAI_BASE_URL: {base_url}")
-        
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=base_url
-        )
-        
-        # 根据 base_url 自动选择模型
-        if 'deepseek' in base_url.lower():
-            self.model = "deepseek-chat"  # DeepSeek 模型
-            print(f"[INFO] 使用 DeepSeek 模型: {self.model}")
-        else:
-            self.model = "gpt-3.5-turbo"  # OpenAI 模型
-            print(f"[INFO] 使用 OpenAI 模型: {self.model}")
-    
-    def generate_response(self, user_message, chat_history, system_prompt, user_profile=None):
-        """
-        生成 AI 回复
-        
-        Args:
-            user_message: 用户当前的消息
-            chat_history: 聊天历史记录列表
-            system_prompt: Avatar 的系统提示（Persona）
-            user_profile: 用户资料（可选，用于个性化）
-        """
-        # 构建增强的系统提示 - 先强调核心原则，再加入性格设定
-        core_principles = """CORE COMMUNICATION RULES (HIGHEST PRIORITY - MUST FOLLOW):
+# 核心沟通原则（放在系统提示最前面，所有 Avatar 共用）
+CORE_PRINCIPLES = """CORE COMMUNICATION RULES (HIGHEST PRIORITY - MUST FOLLOW):
 
 0. LANGUAGE REQUIREMENT:
    - ALWAYS respond in English, regardless of the user's language
@@ -87,14 +55,120 @@ Remember: You are a REAL FRIEND, not a poetry writer or a customer service bot.
 ---
 
 """
+
+# 参与拼接系统提示的用户资料字段
+PROFILE_PROMPT_FIELDS = ('name', 'gender', 'goal', 'date_birth', 'self_description')
+
+# 每个进程缓存的系统提示前缀数量
+PROMPT_PREFIX_CACHE_SIZE = 1024
+
+class GPTService:
+    def __init__(self):
+        api_key = os.getenv('OPENAI_API_KEY')
         
-        # 将核心原则放在最前面，然后是 Persona 设定
-        enhanced_prompt = core_principles + system_prompt
+        print(f"[DEBUG] OPENAI_API_KEY 已加载: {api_key[:10]}..." if api_key else "[ERROR] OPENAI_API_KEY 未找到")
+        
+        if not api_key or api_key == 'your_openai_api_key_here' or 'DEMO' in api_key:
+            print("警告：未配置有效的 OPENAI_API_KEY，请在 .env 文件中配置")
+        
+        # 创建 OpenAI 客户端，支持自定义 base_url
+        base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+        print(f"[DEBUG] OPENAI_BASE_URL: {base_url}")
+        
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url
+        )
+        # 异步客户端只在 ASGI 模式（asgi.py）下用到，首次访问时才创建
+        self._async_client = None
+        
+        # 提示词预算：系统提示 + 历史 + 当前消息的总 token 上限；单条消息超过上限会被截断
+        self.input_token_budget = int(os.getenv('CHAT_INPUT_TOKEN_BUDGET', 3000))
+        self.max_message_tokens = int(os.getenv('CHAT_MAX_MESSAGE_TOKENS', 800))
+        
+        # 系统提示前缀缓存: cache_key -> (原始内容, 前缀字符串, token 数)
+        self._prefix_cache = OrderedDict()
+        self._prefix_lock = threading.Lock()
+        
+        # 根据 base_url 自动选择模型
+        if 'deepseek' in base_url.lower():
+            self.model = "deepseek-chat"  # DeepSeek 模型
+            print(f"[INFO] 使用 DeepSeek 模型: {self.model}")
+        else:
+            self.model = "gpt-3.5-turbo"  # OpenAI 模型
+            print(f"[INFO] 使用 OpenAI 模型: {self.model}")
+    
+    @property
+    def async_client(self):
+        """AsyncOpenAI 客户端，同一事件循环上的所有请求共享一个连接池"""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url
+            )
+        return self._async_client
+    
+    def _build_messages(self, user_message, chat_history, system_prompt, user_profile=None, cache_key=None):
+        """
+        组装发送给模型的消息列表
+        
+        顺序：稳定前缀（核心原则 + Persona + 用户资料）→ 历史 → 日期时间 → 当前消息。
+        易变的日期信息放在历史之后，保证同一个 Avatar 每次请求的前缀逐字节相同，
+        可以命中服务商的前缀缓存（prompt caching）。
+        """
+        prefix, prefix_tokens = self._prompt_prefix(system_prompt, user_profile, cache_key)
+        system_message = {"role": "system", "content": prefix}
         
         # 添加当前日期和时间信息
-        from datetime import datetime
-        current_datetime = datetime.now()
-        date_info = f"\n\nCURRENT DATE & TIME:\nToday is {current_datetime.strftime('%A, %B %d, %Y')} at {current_datetime.strftime('%I:%M %p')}\nUse this information when discussing time-related topics.\n"
+        current_datetime = now()
+        date_message = {
+            "role": "system",
+            "content": f"CURRENT DATE & TIME:\nToday is {current_datetime.strftime('%A, %B %d, %Y')} at {current_datetime.strftime('%I:%M %p')}\nUse this information when discussing time-related topics."
+        }
+        
+        # 当前用户消息（过长时截断）
+        current_text, truncated = truncate_to_tokens(user_message, self.max_message_tokens)
+        if truncated:
+            print(f"[INFO] 当前消息超过 {self.max_message_tokens} tokens，已截断")
+        current_message = {"role": "user", "content": current_text}
+        
+        # 从最新到最旧填充历史，直到用完输入预算
+        used = (MESSAGE_OVERHEAD + prefix_tokens + count_message_tokens(date_message)
+                + count_message_tokens(current_message) + REPLY_OVERHEAD)
+        selected = []
+        for msg in reversed(chat_history):
+            content, _ = truncate_to_tokens(msg['message'], self.max_message_tokens)
+            item = {"role": "user" if msg['sender'] == 'user' else "assistant", "content": content}
+            cost = count_message_tokens(item)
+            if used + cost > self.input_token_budget:
+                break
+            selected.append(item)
+            used += cost
+        
+        messages = [system_message] + selected[::-1] + [date_message, current_message]
+        return messages, used
+    
+    def _prompt_prefix(self, system_prompt, user_profile=None, cache_key=None):
+        """
+        返回稳定的系统提示前缀及其 token 数
+        
+        cache_key 通常为 (avatar_id, Avatar 更新时间, 资料更新时间)，命中时直接复用
+        之前拼好的字符串；同时比对原始内容，避免同一秒内的修改读到旧前缀。
+        """
+        profile_values = tuple((user_profile or {}).get(field) for field in PROFILE_PROMPT_FIELDS)
+        source = (system_prompt, profile_values)
+        
+        if cache_key is not None:
+            with self._prefix_lock:
+                entry = self._prefix_cache.get(cache_key)
+                if entry is not None and entry[0] == source:
+                    self._prefix_cache.move_to_end(cache_key)
+                    return entry[1], entry[2]
+        
+        # 将核心原则放在最前面，然后是 Persona 设定
+        enhanced_prompt = CORE_PRINCIPLES + system_prompt
         
         if user_profile:
             profile_info = []
@@ -115,24 +189,54 @@ Remember: You are a REAL FRIEND, not a poetry writer or a customer service bot.
                 enhanced_prompt += "\n\n用户信息：\n" + "\n".join(profile_info)
                 enhanced_prompt += "\n\n请在对话中适当地参考这些信息，让对话更加个性化和贴心。"
         
-        # 添加日期信息（所有情况都添加）
-        enhanced_prompt += date_info
-        
-        # 构建消息列表
-        messages = [
-            {"role": "system", "content": enhanced_prompt}
-        ]
+        tokens = count_tokens(enhanced_prompt)
         
-        # 添加历史消息（限制数量以避免超出 token 限制）
-        max_history = 10
-        recent_history = chat_history[-max_history:] if len(chat_history) > max_history else chat_history
+        if cache_key is not None:
+            with self._prefix_lock:
+                self._prefix_cache[cache_key] = (source, enhanced_prompt, tokens)
+                self._prefix_cache.move_to_end(cache_key)
+                while len(self._prefix_cache) > PROMPT_PREFIX_CACHE_SIZE:
+                    self._prefix_cache.popitem(last=False)
         
-        for msg in recent_history:
-            role = "user" if msg['sender'] == 'user' else "assistant"
-            messages.append({"role": role, "content": msg['message']})
+        return enhanced_prompt, tokens
+    
+    def _cached_tokens(self, usage):
+        """命中前缀缓存的 prompt token 数（OpenAI: prompt_tokens_details.cached_tokens，DeepSeek: prompt_cache_hit_tokens）"""
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None) if details is not None else None
+        if cached is None:
+            cached = getattr(usage, 'prompt_cache_hit_tokens', None)
+        return cached or 0
+    
+    def _log_usage(self, messages, estimated, usage=None):
+        """记录每次调用的提示词 token 数（usage 为接口返回的实际用量）"""
+        history_count = len(messages) - 3  # 去掉系统前缀、日期和当前消息
+        if usage is not None:
+            print(f"[INFO] prompt tokens: {usage.prompt_tokens}（估算 {estimated}，缓存命中 {self._cached_tokens(usage)}），"
+                  f"completion tokens: {usage.completion_tokens}，历史 {history_count} 条")
+        else:
+            print(f"[INFO] prompt tokens（估算）: {estimated}，历史 {history_count} 条")
+    
+    def _usage_info(self, estimated, usage=None):
+        """返回给调用方的 token 用量"""
+        info = {"estimated_prompt_tokens": estimated}
+        if usage is not None:
+            info["prompt_tokens"] = usage.prompt_tokens
+            info["cached_prompt_tokens"] = self._cached_tokens(usage)
+            info["completion_tokens"] = usage.completion_tokens
+        return info
+    
+    def generate_response(self, user_message, chat_history, system_prompt, user_profile=None, cache_key=None):
+        """
+        生成 AI 回复
         
-        # 添加当前用户消息
-        messages.append({"role": "user", "content": user_message})
+        Args:
+            user_message: 用户当前的消息
+            chat_history: 聊天历史记录列表
+            system_prompt: Avatar 的系统提示（Persona）
+            user_profile: 用户资料（可选，用于个性化）
+        """
+        messages, estimated = self._build_messages(user_message, chat_history, system_prompt, user_profile, cache_key)
         
         try:
             response = self.client.chat.completions.create(
@@ -142,26 +246,16 @@ Remember: You are a REAL FRIEND, not a poetry writer or a customer service bot.
                 max_tokens=200  # 更低的 token 限制，强制简短直接的回答
             )
             
+            usage = getattr(response, 'usage', None)
+            self._log_usage(messages, estimated, usage)
+            
             return {
                 "success": True,
-                "message": response.choices[0].message.content
+                "message": response.choices[0].message.content,
+                "usage": self._usage_info(estimated, usage)
             }
         except Exception as e:
-            error_msg = str(e)
-            print(f"[ERROR] GPT API 调用失败: {error_msg}")
-            print(f"[DEBUG] 完整错误信息: {repr(e)}")
-            
-            # 提供更友好的错误提示
-            if "api_key" in error_msg.lower() or "authentication" in error_msg.lower() or "401" in error_msg:
-                user_msg = f"API 密钥无效，请检查配置\n错误详情: {error_msg}"
-            elif "rate_limit" in error_msg.lower():
-                user_msg = "API 调用次数限制，请稍后再试"
-            elif "model" in error_msg.lower():
-                user_msg = f"模型 {self.model} 不可用，请检查配置"
-            elif "connection" in error_msg.lower() or "timeout" in error_msg.lower():
-                user_msg = "网络连接失败，请检查网络或稍后重试"
-            else:
-                user_msg = f"抱歉，我现在无法回复。\n错误: {error_msg}"
+            user_msg = self._friendly_error(e)
             
             return {
                 "success": False,
@@ -169,30 +263,164 @@ Remember: You are a REAL FRIEND, not a poetry writer or a customer service bot.
                 "message": user_msg  # 添加 message 字段用于直接显示
             }
     
-    def analyze_mood_from_text(self, text):
+    def stream_response(self, user_message, chat_history, system_prompt, user_profile=None, cache_key=None):
         """
-        从文本中分析心情
-        返回一个 emoji 表情
+        流式生成 AI 回复，逐段 yield 文本
+        
+        参数与 generate_response 相同。调用失败时 yield 一条友好的错误提示，
+        因此调用方拼接所有片段即可得到最终要保存的回复。
         """
+        messages, estimated = self._build_messages(user_message, chat_history, system_prompt, user_profile, cache_key)
+        
+        stream = None
         try:
-            response = self.client.chat.completions.create(
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.6,
+                max_tokens=200,
+                stream=True,
+                stream_options={"include_usage": True}  # 最后一个 chunk 携带用量
+            )
+            
+            usage = None
+            for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+            self._log_usage(messages, estimated, usage)
+        except Exception as e:
+            yield self._friendly_error(e)
+        finally:
+            # 调用方提前关闭生成器（客户端断开）时同时关闭上游连接，不再继续生成
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+    
+    async def agenerate_response(self, user_message, chat_history, system_prompt, user_profile=None, cache_key=None):
+        """generate_response 的异步版本，等待模型时不占用线程"""
+        messages, estimated = self._build_messages(user_message, chat_history, system_prompt, user_profile, cache_key)
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.6,
+                max_tokens=200
+            )
+            
+            usage = getattr(response, 'usage', None)
+            self._log_usage(messages, estimated, usage)
+            
+            return {
+                "success": True,
+                "message": response.choices[0].message.content,
+                "usage": self._usage_info(estimated, usage)
+            }
+        except Exception as e:
+            user_msg = self._friendly_error(e)
+            
+            return {
+                "success": False,
+                "error": user_msg,
+                "message": user_msg
+            }
+    
+    async def astream_response(self, user_message, chat_history, system_prompt, user_profile=None, cache_key=None):
+        """stream_response 的异步版本（异步生成器）"""
+        messages, estimated = self._build_messages(user_message, chat_history, system_prompt, user_profile, cache_key)
+        
+        stream = None
+        try:
+            stream = await self.async_client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个情绪分析助手。根据用户的文本内容，判断用户的整体心情，并返回一个最合适的 emoji 表情。只返回一个 emoji，不要返回其他内容。可选的 emoji：😊（开心）、😢（难过）、😌（平静）、😤（生气）、😰（焦虑）、🤔（思考）、😴（疲惫）、🥳（兴奋）"
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=10
+                messages=messages,
+                temperature=0.6,
+                max_tokens=200,
+                stream=True,
+                stream_options={"include_usage": True}  # 最后一个 chunk 携带用量
             )
             
-            emoji = response.choices[0].message.content.strip()
-            return emoji
+            usage = None
+            async for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+            self._log_usage(messages, estimated, usage)
+        except Exception as e:
+            yield self._friendly_error(e)
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                await close()
+    
+    async def aclose(self):
+        """关闭异步客户端的连接池（在创建它的事件循环上调用）"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+    
+    def _friendly_error(self, e):
+        """记录 API 错误并转换为给用户看的提示"""
+        error_msg = str(e)
+        print(f"[ERROR] GPT API 调用失败: {error_msg}")
+        print(f"[DEBUG] 完整错误信息: {repr(e)}")
+        
+        # 提供更友好的错误提示
+        if "api_key" in error_msg.lower() or "authentication" in error_msg.lower() or "401" in error_msg:
+            user_msg = f"API 密钥无效，请检查配置\n错误详情: {error_msg}"
+        elif "rate_limit" in error_msg.lower():
+            user_msg = "API 调用次数限制，请稍后再试"
+        elif "model" in error_msg.lower():
+            user_msg = f"模型 {self.model} 不可用，请检查配置"
+        elif "connection" in error_msg.lower() or "timeout" in error_msg.lower():
+            user_msg = "网络连接失败，请检查网络或稍后重试"
+        else:
+            user_msg = f"抱歉，我现在无法回复。\n错误: {error_msg}"
+        
+        return user_msg
+    
+    def classify_mood(self, text):
+        """
+        从文本中分析心情，返回一个 emoji 表情
+        模型调用失败或没有返回内容时抛出异常（后台任务据此重试，而不是保存默认心情）
+        """
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "你是一个情绪分析助手。根据用户的文本内容，判断用户的整体心情，并返回一个最合适的 emoji 表情。只返回一个 emoji，不要返回其他内容。可选的 emoji：😊（开心）、😢（难过）、😌（平静）、😤（生气）、😰（焦虑）、🤔（思考）、😴（疲惫）、🥳（兴奋）"
+                },
+                {
+                    "role": "user",
+                    "content": text
+                }
+            ],
+            temperature=0.3,
+            max_tokens=10
+        )
+        
+        emoji = (response.choices[0].message.content or "").strip()
+        if not emoji:
+            raise ValueError("心情分析没有返回结果")
+        return emoji
+
+    def analyze_mood_from_text(self, text):
+        """
+        从文本中分析心情
+        返回一个 emoji 表情（失败时返回默认的 😊）
+        """
+        try:
+            return self.classify_mood(text)
         except Exception as e:
             print(f"心情分析失败: {str(e)}")
             return "😊"  # 默认返回开心
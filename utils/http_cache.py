@@ -0,0 +1,81 @@
+"""
+读接口的 HTTP 条件请求
+- 每个接口提供一个廉价的版本函数：一次走索引的查询，取出行版本（COUNT / MAX(id) / MAX(updated_at)），
+  查询写在对应的模型里（如 Avatar.avatars_version）
+- 版本 + 用户 + 查询参数 算出 ETag；请求带 If-None-Match 且未变化时直接返回 304，
+  不执行视图、不查询数据、不序列化 JSON
+- 版本函数还可以给出最后修改时间，用于 Last-Modified / If-Modified-Since（只在没有 If-None-Match 时使用）
+- 按接口设置 Cache-Control：默认 private, no-cache（浏览器缓存但每次重新验证）
+
+用法:
+    @avatar_bp.route('/list')
+    @login_required
+    @conditional(avatar_model.avatars_version)     # version(user_id) -> (版本, 最后修改时间或 None)
+    def get_all_avatars():
+        ...
+"""
+
+import functools
+import hashlib
+from datetime import datetime, timezone
+from flask import current_app, make_response, request
+from utils.auth import current_user_id
+
+
+def parse_timestamp(value):
+    """SQLite 的 CURRENT_TIMESTAMP / strftime('%Y-%m-%d %H:%M:%f') 文本（UTC）-> datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def conditional(version, max_age=0):
+    """
+    条件 GET 装饰器
+
+    Args:
+        version: version(user_id) -> (版本元组, 最后修改时间或 None)
+        max_age: 浏览器可以不经验证直接使用缓存的秒数（0 表示每次都重新验证）
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            user_id = current_user_id()
+            validators, last_modified = version(user_id)
+
+            key = repr((request.path, user_id, request.query_string, validators))
+            etag = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+            last_modified = parse_timestamp(last_modified)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(
+                    last_modified and request.if_modified_since
+                    and last_modified.replace(microsecond=0) <= request.if_modified_since
+                )
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # JSON 会被压缩等内容编码改写字节，用弱 ETag
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            response.vary.add('Authorization')
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,168 @@
+"""
+上传图片处理流水线
+- 请求线程只做必要的事：把上传内容读进内存、校验格式和大小、写入按内容寻址的图片存储（image_store），
+  然后立即返回原图路径（作为占位图）；同样的图片已经存在时既不写盘也不重新生成变体
+- 缩放和编码放到后台任务队列（image_variants 任务）中执行，不占用请求线程
+- 后台任务只解码一次：JPEG 用 Image.draft 在解码时直接按 1/2、1/4、1/8 缩小，
+  再从大到小依次生成 full / medium / thumb 三个尺寸（WebP，不支持时用 JPEG）
+- 变体文件名约定：<原文件名去掉扩展名>.<尺寸>.webp，页面用 image_urls() 得到各尺寸地址，
+  变体尚未生成时图片加载失败，回退到原图；不在图片存储中的旧路径没有变体，各尺寸都是原图地址
+- 存储中的图片通过 /media 路由以 Cache-Control: immutable 提供，旧的 avatar_images/ 路径仍走 /static
+
+用法:
+    path = save_uploaded_image(file)   # 立即返回，如 images/ab/abcd....jpg
+    urls = image_urls(path)   # {"original": ..., "thumb": ..., "medium": ..., "full": ...}
+"""
+
+import io
+import math
+import os
+from PIL import Image, ImageOps, features
+from .file_handler import allowed_file, MAX_FILE_SIZE
+from .job_queue import job_handler
+from .image_store import IMAGE_DIR
+
+# 尺寸名 -> 最长边像素（thumb 用于聊天气泡和列表，按 2 倍屏准备）
+VARIANTS = {
+    'full': 1024,
+    'medium': 320,
+    'thumb': 96,
+}
+
+if features.check('webp'):
+    VARIANT_FORMAT, VARIANT_EXT = 'WEBP', 'webp'
+else:
+    VARIANT_FORMAT, VARIANT_EXT = 'JPEG', 'jpg'
+
+
+def variant_path(path, size):
+    """原图路径对应的变体路径"""
+    return f"{os.path.splitext(path)[0]}.{size}.{VARIANT_EXT}"
+
+
+def image_urls(path):
+    """
+    上传图片各尺寸的 URL
+
+    Args:
+        path: 数据库中保存的相对路径（相对于 static/uploads，如 images/ab/abcd....jpg 或旧的 avatar_images/avatar_1_x.jpg）
+    """
+    if not path:
+        return None
+    if path.startswith(('http://', 'https://')):
+        return {'original': path, **{size: path for size in VARIANTS}}
+
+    path = path.strip().lstrip('/')
+    if path.startswith(IMAGE_DIR + '/'):
+        urls = {'original': f"/media/{path}"}
+        for size in VARIANTS:
+            urls[size] = f"/media/{variant_path(path, size)}"
+        return urls
+
+    if path.startswith('static/'):
+        path = path[len('static/'):]
+    elif not path.startswith('uploads/'):
+        path = 'uploads/' + path
+
+    # 旧的 avatar_images/ 等路径不在图片存储中，没有生成过变体：各尺寸都直接使用原图
+    url = f"/static/{path}"
+    return {'original': url, **{size: url for size in VARIANTS}}
+
+
+def save_uploaded_image(file):
+    """
+    保存上传的图片并安排生成缩略图（不在请求线程里缩放）
+
+    Returns:
+        图片在存储中的路径（相对于 static/uploads）或 None
+    """
+    if not file or file.filename == '':
+        return None
+
+    if not allowed_file(file.filename):
+        return None
+
+    data = file.read(MAX_FILE_SIZE + 1)
+    if len(data) > MAX_FILE_SIZE:
+        return None
+
+    # 只解析文件头校验是否是图片，不解码像素
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+    except Exception as e:
+        print(f"[WARNING] 不是有效的图片: {e}")
+        return None
+
+    from extensions import image_store, job_queue
+
+    ext = os.path.splitext(file.filename)[1].lower()
+    path, created = image_store.put(data, '.jpg' if ext == '.jpeg' else ext)
+
+    filepath = image_store.file_path(path)
+    if created or not os.path.exists(variant_path(filepath, 'thumb')):
+        job_queue.enqueue('image_variants', {"path": filepath}, dedupe_key=f"image:{path}")
+
+    return path
+
+
+def decode_image(data, max_size):
+    """
+    解码图片（JPEG 在解码时直接缩小到不小于 max_size 的最小比例）
+
+    Returns:
+        RGB / RGBA 模式、已按 EXIF 方向旋转的 Image
+    """
+    img = Image.open(io.BytesIO(data))
+    if img.format == 'JPEG':
+        # draft 要求两边都不小于请求的尺寸，所以按宽高比换算出缩放后的目标尺寸
+        scale = min(max_size / img.width, max_size / img.height, 1)
+        img.draft('RGB', (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode not in ('RGB', 'RGBA'):
+        has_alpha = img.mode in ('LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    return img
+
+
+def generate_variants(path):
+    """为原图生成所有尺寸的变体，返回生成的文件路径列表"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    sizes = sorted(VARIANTS.items(), key=lambda item: item[1], reverse=True)
+    img = decode_image(data, sizes[0][1])
+
+    written = []
+    for size, max_side in sizes:
+        # 从上一个（更大的）变体继续缩小，每一步的输入都比原图小
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        out = img if VARIANT_FORMAT == 'WEBP' or img.mode == 'RGB' else img.convert('RGB')
+
+        target = variant_path(path, size)
+        tmp = f"{target}.tmp"
+        if VARIANT_FORMAT == 'WEBP':
+            out.save(tmp, VARIANT_FORMAT, quality=80, method=4)
+        else:
+            out.save(tmp, VARIANT_FORMAT, quality=85, optimize=True)
+        os.replace(tmp, target)  # 原子替换，页面不会读到写了一半的文件
+        written.append(target)
+    return written
+
+
+@job_handler('image_variants')
+def image_variants_job(payload):
+    """后台任务：生成上传图片的各尺寸变体"""
+    path = payload['path']
+    if not os.path.exists(path):
+        return  # 排队期间图片已被删除
+    written = generate_variants(path)
+
+    if not os.path.exists(path):
+        # 生成期间图片被回收，删掉刚写入的变体
+        for target in written:
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,142 @@
+"""
+按内容寻址的图片存储
+- 文件名就是内容的 SHA-256：images/<前两位>/<hash>.<ext>，相同图片只保存一份
+- 文件一经写入永不修改，可以用 Cache-Control: immutable 长期缓存（/media 路由）
+- Images 表记录每张图片被引用的次数：Avatar 创建 / 更新 / 删除时在同一个事务里 acquire / release，
+  提交后对不再被引用的图片调用 collect() 删除文件（原图和所有尺寸变体）
+- 上传后还没被任何记录引用的图片有一段保护期（grace），避免与正在创建的 Avatar 竞争；
+  过了保护期仍无人引用的图片由后台清理线程删除
+
+用法:
+    path = image_store.put(data, '.jpg')          # 返回 images/ab/abcd....jpg
+    with db.get_connection() as conn:
+        ...
+        image_store.acquire(new_path)
+        image_store.release(old_path)
+    image_store.collect(old_path)
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from .sweeper import PeriodicSweeper
+
+IMAGE_DIR = 'images'
+
+
+class ImageStore:
+    def __init__(self, db, root=os.path.join('static', 'uploads'), grace=60, sweep_interval=600):
+        self.db = db
+        self.root = root
+        self.grace = grace
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+
+    @staticmethod
+    def is_managed(path):
+        """是否是本存储管理的图片（旧的 avatar_images/... 路径不计引用）"""
+        return bool(path) and path.startswith(IMAGE_DIR + '/')
+
+    def file_path(self, path):
+        return os.path.join(self.root, path)
+
+    def put(self, data, ext):
+        """
+        保存图片内容
+
+        Returns:
+            (path, created)：path 相对于 root；created 表示这次是否新写入了文件
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = f"{IMAGE_DIR}/{digest[:2]}/{digest}{ext.lower()}"
+
+        # 刷新上传时间：保护期从最近一次上传算起
+        with self.db.get_connection() as conn:
+            conn.execute(
+                """INSERT INTO Images (path, uploaded_at) VALUES (?, ?)
+                   ON CONFLICT(path) DO UPDATE SET uploaded_at = excluded.uploaded_at""",
+                (path, time.time())
+            )
+
+        filepath = self.file_path(path)
+        if os.path.exists(filepath):
+            return path, False
+
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, filepath)
+        return path, True
+
+    def acquire(self, path):
+        """增加引用（在写入引用记录的事务里调用）"""
+        if not self.is_managed(path):
+            return
+        with self.db.get_connection() as conn:
+            conn.execute(
+                """INSERT INTO Images (path, ref_count, uploaded_at) VALUES (?, 1, ?)
+                   ON CONFLICT(path) DO UPDATE SET ref_count = ref_count + 1""",
+                (path, time.time())
+            )
+
+    def release(self, path):
+        """减少引用（在删除引用记录的事务里调用）；文件由提交后的 collect() 删除"""
+        if not self.is_managed(path):
+            return
+        with self.db.get_connection() as conn:
+            conn.execute(
+                "UPDATE Images SET ref_count = ref_count - 1 WHERE path = ? AND ref_count > 0",
+                (path,)
+            )
+
+    def collect(self, *paths):
+        """删除已不再被引用（且过了上传保护期）的图片，返回删除的图片数"""
+        paths = [path for path in paths if self.is_managed(path)]
+        if not paths:
+            return 0
+
+        orphans = []
+        with self.db.get_connection() as conn:
+            for path in paths:
+                deleted = conn.execute(
+                    "DELETE FROM Images WHERE path = ? AND ref_count = 0 AND uploaded_at < ?",
+                    (path, time.time() - self.grace)
+                ).rowcount
+                if deleted:
+                    # 在持有写锁时删除文件：并发的 put() 要等本事务提交后才能写入记录，
+                    # 之后它会发现文件不存在并重新写入
+                    self._remove_files(path)
+                    orphans.append(path)
+        return len(orphans)
+
+    def _remove_files(self, path):
+        from .image_pipeline import VARIANTS, variant_path
+
+        filepath = self.file_path(path)
+        for target in [filepath] + [variant_path(filepath, size) for size in VARIANTS]:
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+
+    def sweep(self):
+        """删除所有过了保护期仍无人引用的图片，返回删除数量"""
+        with self.db.get_connection() as conn:
+            orphans = [row['path'] for row in conn.execute(
+                "SELECT path FROM Images WHERE ref_count = 0 AND uploaded_at < ?",
+                (time.time() - self.grace,)
+            ).fetchall()]
+        return self.collect(*orphans)
+
+    def start(self):
+        """启动孤儿图片清理线程"""
+        self._sweeper = PeriodicSweeper(self.sweep, self.sweep_interval, "image-sweeper", "未被引用的图片", unit='张')
+        self._sweeper.start()
+
+    def close(self):
+        if self._sweeper is not None:
+            self._sweeper.close()
+            self._sweeper = None
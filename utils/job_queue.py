@@ -0,0 +1,163 @@
+"""
+持久化后台任务队列
+- 任务存储在 SQLite 的 Jobs 表中，进程重启后不会丢失
+- dedupe_key 保证同一件事（例如某用户某天的心情分析）同时只有一个任务
+- 每个进程启动若干工作线程，通过条件 UPDATE 抢占任务，多个 gunicorn worker 之间不会重复执行
+
+用法:
+    @job_handler('mood_analysis')
+    def analyze(payload):
+        ...
+
+    job_queue.enqueue('mood_analysis', {"user_id": 1}, dedupe_key="mood:1:2024-01-01")
+"""
+
+import json
+import threading
+import traceback
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """注册任务处理函数，handler(payload) 抛出异常视为失败"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class JobQueue:
+    def __init__(self, db, workers=2, poll_interval=2.0, max_attempts=3, stale_after=300):
+        self.db = db
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after  # 超过该秒数仍处于 running 的任务视为进程崩溃遗留
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """启动工作线程（并把崩溃遗留的 running 任务放回队列）"""
+        with self.db.get_connection() as conn:
+            conn.execute(
+                """UPDATE Jobs SET status = 'pending', updated_at = CURRENT_TIMESTAMP
+                   WHERE status = 'running'
+                   AND updated_at < datetime('now', ?)""",
+                (f"-{int(self.stale_after)} seconds",)
+            )
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self):
+        """停止工作线程"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def enqueue(self, kind, payload, dedupe_key=None):
+        """
+        加入一个任务
+
+        相同 dedupe_key 的任务正在排队或执行时不会重复加入；
+        之前的同名任务已完成或失败时会重新排队。
+
+        Returns:
+            {"job_id": ..., "status": ...}
+        """
+        with self.db.get_connection() as conn:
+            conn.execute(
+                """INSERT INTO Jobs (kind, dedupe_key, payload) VALUES (?, ?, ?)
+                   ON CONFLICT(dedupe_key) DO UPDATE SET
+                       status = 'pending',
+                       payload = excluded.payload,
+                       attempts = 0,
+                       last_error = NULL,
+                       updated_at = CURRENT_TIMESTAMP
+                   WHERE Jobs.status IN ('done', 'failed')""",
+                (kind, dedupe_key, json.dumps(payload))
+            )
+            if dedupe_key is None:
+                row = conn.execute("SELECT id, status FROM Jobs WHERE id = last_insert_rowid()").fetchone()
+            else:
+                row = conn.execute("SELECT id, status FROM Jobs WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+
+        self._wakeup.set()
+        return {"job_id": row['id'], "status": row['status']}
+
+    def get_status(self, dedupe_key):
+        """按 dedupe_key 查询任务状态，不存在返回 None"""
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, attempts, last_error, updated_at FROM Jobs WHERE dedupe_key = ?",
+                (dedupe_key,)
+            ).fetchone()
+
+        if row:
+            return dict(row)
+        return None
+
+    def _claim(self):
+        """抢占一个待执行任务，没有则返回 None"""
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM Jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if not row:
+                return None
+
+            conn.execute(
+                """UPDATE Jobs SET status = 'running', attempts = attempts + 1,
+                       updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?""",
+                (row['id'],)
+            )
+            return dict(row)
+
+    def _finish(self, job, error=None):
+        with self.db.get_connection() as conn:
+            if error is None:
+                conn.execute(
+                    "UPDATE Jobs SET status = 'done', last_error = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (job['id'],)
+                )
+            else:
+                # 未超过重试次数则放回队列
+                status = 'pending' if job['attempts'] + 1 < self.max_attempts else 'failed'
+                conn.execute(
+                    "UPDATE Jobs SET status = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (status, error, job['id'])
+                )
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"[ERROR] 获取后台任务失败: {e}")
+                job = None
+
+            if job is None:
+                # 本进程入队时会立即唤醒，其他进程入队的任务靠轮询发现
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            handler = JOB_HANDLERS.get(job['kind'])
+            try:
+                if handler is None:
+                    raise LookupError(f"没有注册任务处理函数: {job['kind']}")
+                handler(json.loads(job['payload']))
+                self._finish(job)
+            except Exception as e:
+                print(f"[ERROR] 后台任务 {job['kind']}#{job['id']} 失败: {e}")
+                traceback.print_exc()
+                self._finish(job, str(e))
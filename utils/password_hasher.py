@@ -0,0 +1,105 @@
+"""
+密码哈希进程池
+- werkzeug 的 scrypt / PBKDF2 计算要几十毫秒且一直持有 GIL，放在请求线程里会拖慢同一进程的所有请求
+- 哈希和校验交给独立的进程池执行，请求线程只是等待结果（等待期间释放 GIL）
+- 排队深度有上限（PASSWORD_HASH_MAX_PENDING），超出时抛出 HasherBusy，由路由返回 503，
+  登录洪峰不会在内存里无限堆积
+- needs_rehash() 判断旧哈希的算法参数是否与当前配置不同，登录成功时透明升级
+- PASSWORD_HASH_WORKERS=0 时在当前线程内直接计算（开发调试用）
+- 工作进程用 forkserver（不支持时用 spawn）启动，不 fork 已经运行着任务队列、缓存失效等线程的应用进程；
+  工作进程意外退出导致进程池不可用（BrokenProcessPool）时自动重建
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """密码哈希队列已满"""
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=32, method='scrypt', timeout=10):
+        self.workers = workers
+        self.method = method
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._method_prefix = None
+
+    def _get_executor(self):
+        executor = self._executor
+        if executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(method)
+                    )
+                executor = self._executor
+        return executor
+
+    def _discard_executor(self, executor):
+        """丢弃已损坏的进程池，下次使用时重建"""
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, func, *args):
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(func, *args)
+        except BrokenProcessPool:
+            # 之前有工作进程意外退出：换一个新的进程池重试一次
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(func, *args)
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("密码校验请求过多，请稍后再试")
+        try:
+            executor, future = self._submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # 名额在任务真正结束时才归还：等待超时后任务仍在进程池里执行
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HasherBusy("密码校验超时，请稍后再试")
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise HasherBusy("密码校验服务暂时不可用，请稍后再试")
+
+    def hash(self, password):
+        """生成密码哈希"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, hashed_password, password):
+        """校验密码"""
+        return self._run(check_password_hash, hashed_password, password)
+
+    def needs_rehash(self, hashed_password):
+        """已保存的哈希是否使用了旧的算法或参数（例如迭代次数变化）"""
+        if self._method_prefix is None:
+            # 用当前配置生成一次哈希，取出规范化的算法前缀，如 scrypt:32768:8:1
+            self._method_prefix = self.hash('').split('$', 1)[0]
+        return hashed_password.split('$', 1)[0] != self._method_prefix
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,58 @@
+"""
+令牌桶限流（进程内）
+- 每个键（IP、账号）一个桶，容量 burst，按 rate 个/秒恢复
+- 桶的数量有上限，超出时淘汰最久未使用的桶（满桶被淘汰与重新创建等价，不影响限流效果）
+
+用法:
+    limiter = RateLimiter(rate=10 / 60, burst=10)   # 每分钟 10 次，最多连续 10 次
+    allowed, retry_after = limiter.allow("ip:1.2.3.4")
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def check(self, key, cost=1):
+        """只检查是否还有 cost 个令牌，不消耗（返回值与 allow 相同）"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        if tokens >= cost:
+            return True, 0
+        return False, (cost - tokens) / self.rate
+
+    def allow(self, key, cost=1):
+        """
+        尝试消耗 cost 个令牌
+
+        Returns:
+            (allowed, retry_after)：不允许时 retry_after 为需要等待的秒数
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        if allowed:
+            return True, 0
+        return False, (cost - tokens) / self.rate
@@ -0,0 +1,83 @@
+"""
+API 响应编码
+- JSONProvider：安装了 orjson 时用它序列化（比标准库 json 快数倍，直接输出 bytes），否则退回标准库；
+  两种情况都不排序键、中文直接输出 UTF-8（\\uXXXX 转义每个字 6 字节，UTF-8 只要 3 字节）
+- 每个接口声明返回的行字段（schema），不返回页面用不到的列（如消息的 user_id、Avatar 的 system_prompt）
+- 客户端可以用 ?fields=a,b 在 schema 内进一步裁剪字段
+- rows_to_dicts 直接从查询结果的元组按列名组装字典，不经过 dict(row) 再筛选
+
+用法:
+    HISTORY_FIELDS = ('id', 'sender', 'message', 'timestamp')
+
+    fields = requested_fields(HISTORY_FIELDS)          # ?fields=id,message -> ('id', 'message')
+    rows = conn.execute(f"SELECT {', '.join(fields)} FROM ...").fetchall()
+    return jsonify({"history": rows_to_dicts(fields, rows)})
+"""
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    ensure_ascii = False
+    sort_keys = False
+
+    if orjson is not None:
+        # datetime 交给 default 处理，保持与 Flask 默认一致的 HTTP 日期格式
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+        def dumps(self, obj, **kwargs):
+            if kwargs:
+                # indent 等 orjson 不支持的参数（如调试模式下的格式化输出）
+                return super().dumps(obj, **kwargs)
+            return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            if (self.compact is None and self._app.debug) or self.compact is False:
+                return super().response(*args, **kwargs)
+
+            obj = self._prepare_response_obj(args, kwargs)
+            body = orjson.dumps(obj, default=self.default, option=self.option | orjson.OPT_APPEND_NEWLINE)
+            return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def requested_fields(schema):
+    """
+    请求 ?fields= 选中的字段（按 schema 中的顺序）
+
+    未指定、或指定的字段都不在 schema 中时返回整个 schema。
+    返回值只会是 schema 的子集，可以安全地拼进 SELECT。
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return schema
+
+    wanted = {name.strip() for name in raw.split(',')}
+    fields = tuple(name for name in schema if name in wanted)
+    return fields or schema
+
+
+def rows_to_dicts(columns, rows):
+    """按列顺序把查询结果（sqlite3.Row 或元组）组装成字典列表"""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def project(items, fields):
+    """只保留 fields 中的键（用于缓存里取出的完整字典）"""
+    return [{name: item.get(name) for name in fields} for item in items]
+
+
+def project_one(item, fields):
+    if item is None:
+        return None
+    return {name: item.get(name) for name in fields}
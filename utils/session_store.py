@@ -0,0 +1,219 @@
+"""
+服务端 session
+- Cookie 里只保存一个随机 session id（43 个字符），session 内容存在 Sessions 表，表里只保存 id 的 SHA-256
+- 前面是进程内 LRU（实体缓存，键 ('session', sid_hash)），命中时读取 session 不访问数据库
+- 只有 session 内容变化时才写库并下发 Set-Cookie；只读 session 的请求不签名、不写库、不回写 Cookie
+- 代替 SESSION_REFRESH_EACH_REQUEST：剩余有效期不足一半时才续期一次
+- 登录用户变化时更换 session id，防止 session 固定
+- 集中吊销：revoke_user(user_id) 删除某用户的全部 session，其他 worker 通过缓存失效通道同步
+- 后台清理线程定期删除过期 session
+
+用法（app.py）:
+    app.session_interface = SQLiteSessionInterface(session_store)
+"""
+
+import hashlib
+import secrets
+import time
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+
+from .sweeper import PeriodicSweeper
+
+serializer = TaggedJSONSerializer()
+
+
+class ServerSession(SecureCookieSession):
+    """与默认 Cookie session 相同的修改跟踪，额外记录 session id 和加载时的状态"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None, stale_cookie=False):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.loaded_user_id = (initial or {}).get('user_id')
+        self.stale_cookie = stale_cookie  # 请求带了无效或已过期的 session id
+
+
+class SessionStore:
+    """Sessions 表 + 进程内 LRU"""
+
+    def __init__(self, db, sweep_interval=600):
+        self.db = db
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+
+    @property
+    def cache(self):
+        from models.cache import get_cache
+        return get_cache(self.db)
+
+    @staticmethod
+    def new_sid():
+        return secrets.token_urlsafe(32)
+
+    @staticmethod
+    def _hash(sid):
+        return hashlib.sha256(sid.encode('utf-8')).hexdigest()
+
+    def _load(self, sid_hash):
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT data, expires_at FROM Sessions WHERE sid_hash = ?",
+                (sid_hash,)
+            ).fetchone()
+
+        if row:
+            return (row['data'], row['expires_at'])
+        return None
+
+    def load(self, sid):
+        """
+        读取 session
+
+        Returns:
+            (data, expires_at)，不存在或已过期返回 None
+        """
+        sid_hash = self._hash(sid)
+        entry = self.cache.get_or_load(('session', sid_hash), lambda: self._load(sid_hash))
+        if entry is None or entry[1] < time.time():
+            return None
+        return serializer.loads(entry[0]), entry[1]
+
+    def save(self, sid, data, expires_at, is_new=False):
+        """写入 session；新 session 不可能在任何缓存里，不需要发失效通知"""
+        sid_hash = self._hash(sid)
+        with self.db.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO Sessions (sid_hash, user_id, data, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(sid_hash) DO UPDATE SET
+                    user_id = excluded.user_id,
+                    data = excluded.data,
+                    expires_at = excluded.expires_at,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (sid_hash, data.get('user_id'), serializer.dumps(data), expires_at))
+        if not is_new:
+            self.cache.invalidate(('session', sid_hash))
+
+    def touch(self, sid, expires_at):
+        """只延长有效期"""
+        sid_hash = self._hash(sid)
+        with self.db.get_connection() as conn:
+            conn.execute(
+                "UPDATE Sessions SET expires_at = ? WHERE sid_hash = ?",
+                (expires_at, sid_hash)
+            )
+        self.cache.invalidate(('session', sid_hash))
+
+    def delete(self, sid):
+        sid_hash = self._hash(sid)
+        with self.db.get_connection() as conn:
+            conn.execute("DELETE FROM Sessions WHERE sid_hash = ?", (sid_hash,))
+        self.cache.invalidate(('session', sid_hash))
+
+    def revoke_user(self, user_id):
+        """删除某用户的全部 session（所有设备强制下线），返回删除数量"""
+        with self.db.get_connection() as conn:
+            hashes = [row['sid_hash'] for row in conn.execute(
+                "SELECT sid_hash FROM Sessions WHERE user_id = ?", (user_id,)
+            ).fetchall()]
+            conn.execute("DELETE FROM Sessions WHERE user_id = ?", (user_id,))
+        if hashes:
+            self.cache.invalidate(*[('session', sid_hash) for sid_hash in hashes])
+        return len(hashes)
+
+    def sweep(self):
+        """删除过期 session，返回删除数量（缓存中的过期项在 load 时按 expires_at 拒绝）"""
+        with self.db.get_connection() as conn:
+            return conn.execute("DELETE FROM Sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def start(self):
+        """启动过期清理线程"""
+        self._sweeper = PeriodicSweeper(self.sweep, self.sweep_interval, "session-sweeper", "过期 session")
+        self._sweeper.start()
+
+    def close(self):
+        if self._sweeper is not None:
+            self._sweeper.close()
+            self._sweeper = None
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """把 Flask session 存到 SessionStore，Cookie 只携带 session id"""
+
+    session_class = ServerSession
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return self.session_class()
+
+        entry = self.store.load(sid)
+        if entry is None:
+            return self.session_class(stale_cookie=True)
+
+        data, expires_at = entry
+        return self.session_class(data, sid=sid, expires_at=expires_at)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+
+        if not session.modified:
+            if session.sid and session.expires_at - now < lifetime / 2:
+                # 续期：每个 session 每半个有效期最多写一次
+                session.expires_at = now + lifetime
+                self.store.touch(session.sid, session.expires_at)
+            elif session.stale_cookie:
+                # 无效的 session id（已过期、已吊销或旧版签名 Cookie），删掉避免每次请求都查库
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly
+                )
+                return
+            else:
+                return
+        elif not session:
+            # session 被清空（登出）
+            if session.sid:
+                self.store.delete(session.sid)
+            if session.sid or session.stale_cookie:
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly
+                )
+                response.vary.add("Cookie")
+            return
+        else:
+            if session.sid and session.get('user_id') != session.loaded_user_id:
+                # 登录用户变化（登录 / 切换账号）时换一个新的 session id
+                self.store.delete(session.sid)
+                session.sid = None
+
+            is_new = session.sid is None
+            if is_new:
+                session.sid = self.store.new_sid()
+            session.expires_at = now + lifetime
+            self.store.save(session.sid, dict(session), session.expires_at, is_new=is_new)
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+        )
+        response.vary.add("Cookie")
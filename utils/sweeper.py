@@ -0,0 +1,44 @@
+"""
+后台定期清理线程
+- token、session、图片存储共用：每隔 interval 秒调用一次 sweep()，sweep() 返回清理的数量
+- 单次清理失败只打印错误，线程继续运行；close() 通知线程退出并等待其结束
+
+用法:
+    self._sweeper = PeriodicSweeper(self.sweep, self.sweep_interval, "session-sweeper", "过期 session")
+    self._sweeper.start()
+    ...
+    self._sweeper.close()
+"""
+
+import threading
+
+
+class PeriodicSweeper:
+    def __init__(self, sweep, interval, name, what, unit='个'):
+        self.sweep = sweep
+        self.interval = interval
+        self.name = name    # 线程名
+        self.what = what    # 日志中清理的对象，如 "过期 token"
+        self.unit = unit    # 量词，如 "个" / "张"
+
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"[INFO] 已清理 {removed} {self.unit}{self.what}")
+            except Exception as e:
+                print(f"[ERROR] {self.name} 清理失败: {e}")
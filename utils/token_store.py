@@ -0,0 +1,180 @@
+"""
+登录 token 存储
+- 所有 worker 共享，进程重启后 token 仍然有效
+- 两种后端（TOKEN_BACKEND）:
+    sqlite  默认。token 的 SHA-256 存在 AuthTokens 表，前面是进程内 LRU（实体缓存），
+            命中时校验不访问数据库；登出时通过缓存失效通道通知其他 worker
+    signed  HMAC 签名 token（SECRET_KEY），签发不写数据库，校验是一次 HMAC 计算加吊销表检查；
+            登出时签名写入 RevokedTokens 吊销表（所有 worker 共享，保留到 token 自然过期），
+            吊销检查的结果在进程内 LRU 中缓存，并通过缓存失效通道通知其他 worker
+- 后台清理线程定期删除过期 token，内存和表都不会无限增长
+
+用法:
+    token = token_store.issue(user_id)
+    user_id = token_store.verify(token)   # 无效或过期返回 None
+    token_store.revoke(token)
+"""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+
+from .sweeper import PeriodicSweeper
+
+TOKEN_TTL = 86400  # 24 小时
+
+
+class TokenStore:
+    """token 存储基类：提供过期清理线程"""
+
+    def __init__(self, ttl=TOKEN_TTL, sweep_interval=600):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+
+    def issue(self, user_id):
+        raise NotImplementedError
+
+    def verify(self, token):
+        raise NotImplementedError
+
+    def revoke(self, token):
+        raise NotImplementedError
+
+    def sweep(self):
+        """删除过期 token，返回删除数量"""
+        raise NotImplementedError
+
+    def start(self):
+        """启动过期清理线程"""
+        self._sweeper = PeriodicSweeper(self.sweep, self.sweep_interval, "token-sweeper", "过期 token")
+        self._sweeper.start()
+
+    def close(self):
+        if self._sweeper is not None:
+            self._sweeper.close()
+            self._sweeper = None
+
+
+class SignedTokenStore(TokenStore):
+    """HMAC 签名 token：<user_id>.<expires_at>.<nonce>.<signature>；吊销的签名存在 RevokedTokens 表"""
+
+    def __init__(self, db, secret_key, ttl=TOKEN_TTL, sweep_interval=600):
+        super().__init__(ttl, sweep_interval)
+        if not secret_key:
+            raise ValueError("签名 token 需要配置 SECRET_KEY")
+        self.db = db
+        self._key = secret_key.encode('utf-8') if isinstance(secret_key, str) else secret_key
+
+    @property
+    def cache(self):
+        from models.cache import get_cache
+        return get_cache(self.db)
+
+    def _sign(self, payload):
+        digest = hmac.new(self._key, payload.encode('ascii'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+    def issue(self, user_id):
+        payload = f"{int(user_id)}.{int(time.time() + self.ttl)}.{secrets.token_urlsafe(8)}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token):
+        if not token or token.count('.') != 3:
+            return None
+
+        payload, signature = token.rsplit('.', 1)
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+
+        user_id, expires_at, _ = payload.split('.')
+        if int(expires_at) < time.time() or self._is_revoked(signature):
+            return None
+        return int(user_id)
+
+    def _is_revoked(self, signature):
+        # loader 返回 True / False（不是 None），未吊销的结果同样会被缓存
+        return self.cache.get_or_load(('revoked', signature), lambda: self._load_revoked(signature))
+
+    def _load_revoked(self, signature):
+        with self.db.get_connection() as conn:
+            row = conn.execute("SELECT 1 FROM RevokedTokens WHERE signature = ?", (signature,)).fetchone()
+        return row is not None
+
+    def revoke(self, token):
+        if self.verify(token) is None:
+            return
+        payload, signature = token.rsplit('.', 1)
+        with self.db.get_connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO RevokedTokens (signature, expires_at) VALUES (?, ?)",
+                (signature, int(payload.split('.')[1]))
+            )
+        self.cache.invalidate(('revoked', signature))
+
+    def sweep(self):
+        # 已过期的 token 在 verify 时按 expires_at 拒绝，吊销记录不再需要
+        with self.db.get_connection() as conn:
+            return conn.execute("DELETE FROM RevokedTokens WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+class SQLiteTokenStore(TokenStore):
+    """AuthTokens 表 + 进程内 LRU；表里只保存 token 的 SHA-256"""
+
+    def __init__(self, db, ttl=TOKEN_TTL, sweep_interval=600):
+        super().__init__(ttl, sweep_interval)
+        self.db = db
+
+    @property
+    def cache(self):
+        from models.cache import get_cache
+        return get_cache(self.db)
+
+    @staticmethod
+    def _hash(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def issue(self, user_id):
+        token = secrets.token_urlsafe(32)
+        with self.db.get_connection() as conn:
+            conn.execute(
+                "INSERT INTO AuthTokens (token_hash, user_id, expires_at) VALUES (?, ?, ?)",
+                (self._hash(token), user_id, time.time() + self.ttl)
+            )
+        return token
+
+    def _load(self, token_hash):
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT user_id, expires_at FROM AuthTokens WHERE token_hash = ?",
+                (token_hash,)
+            ).fetchone()
+
+        if row:
+            return (row['user_id'], row['expires_at'])
+        return None
+
+    def verify(self, token):
+        if not token:
+            return None
+
+        token_hash = self._hash(token)
+        entry = self.cache.get_or_load(('token', token_hash), lambda: self._load(token_hash))
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def revoke(self, token):
+        if not token:
+            return
+        token_hash = self._hash(token)
+        with self.db.get_connection() as conn:
+            conn.execute("DELETE FROM AuthTokens WHERE token_hash = ?", (token_hash,))
+        self.cache.invalidate(('token', token_hash))
+
+    def sweep(self):
+        # 过期的缓存项在 verify 时按 expires_at 拒绝，并随 LRU / TTL 淘汰
+        with self.db.get_connection() as conn:
+            return conn.execute("DELETE FROM AuthTokens WHERE expires_at < ?", (time.time(),)).rowcount
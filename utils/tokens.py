@@ -0,0 +1,88 @@
+"""
+Token 计数工具
+- 安装了 tiktoken 且能加载编码时使用 cl100k_base 精确计数
+- 否则使用本地估算：中日韩字符按 1 个 token 计，其余字符约 4 个字符 1 个 token
+  （对 DeepSeek / GPT-3.5 的分词器都偏保守，只用于控制预算，不要求精确）
+"""
+
+import os
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 每条消息的固定开销（role、分隔符等）
+MESSAGE_OVERHEAD = 4
+# 回复的引导开销
+REPLY_OVERHEAD = 3
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """延迟加载 tiktoken 编码，加载失败（例如离线环境无法下载词表）时退回估算"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding(os.getenv('TIKTOKEN_ENCODING', 'cl100k_base'))
+            except Exception as e:
+                print(f"[WARN] tiktoken 编码加载失败，使用估算计数: {e}")
+    return _encoding
+
+
+def _is_cjk(char):
+    code = ord(char)
+    return (
+        0x4E00 <= code <= 0x9FFF      # CJK 统一汉字
+        or 0x3400 <= code <= 0x4DBF   # 扩展 A
+        or 0x3040 <= code <= 0x30FF   # 日文假名
+        or 0xAC00 <= code <= 0xD7AF   # 韩文
+        or 0xFF00 <= code <= 0xFFEF   # 全角符号
+        or 0x3000 <= code <= 0x303F   # 中文标点
+    )
+
+
+def _char_costs(text):
+    """估算模式下每个字符的 token 成本（非 CJK 字符 0.25）"""
+    return [1.0 if _is_cjk(ch) else 0.25 for ch in text]
+
+
+def count_tokens(text):
+    """计算文本的 token 数"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return int(sum(_char_costs(text)) + 0.999)
+
+
+def truncate_to_tokens(text, max_tokens, marker="…"):
+    """
+    把文本截断到 max_tokens 以内（保留开头，末尾加省略标记）
+
+    Returns:
+        (text, truncated)
+    """
+    if not text or count_tokens(text) <= max_tokens:
+        return text, False
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens]) + marker, True
+
+    total = 0.0
+    for index, cost in enumerate(_char_costs(text)):
+        total += cost
+        if total > max_tokens:
+            return text[:index] + marker, True
+    return text, False
+
+
+def count_message_tokens(message):
+    """一条 chat 消息（含固定开销）的 token 数"""
+    return MESSAGE_OVERHEAD + count_tokens(message['content'])